@@ -22,6 +22,8 @@
 # SOFTWARE.
 
 
+import os
+
 from setuptools import setup, find_packages
 
 requirements = [
@@ -35,6 +37,15 @@ version = None
 with open('xcube_cci/version.py') as f:
     exec(f.read())
 
+data_files = [
+    'xcube_cci/data/excluded_data_sources',
+    'xcube_cci/data/dataset_states.json'
+]
+# the catalogue snapshot is generated before building,
+# using "xcube-cci-snapshot"
+if os.path.exists('xcube_cci/data/catalogue_snapshot.json.gz'):
+    data_files.append('xcube_cci/data/catalogue_snapshot.json.gz')
+
 setup(
     name="xcube_cci",
     version=version,
@@ -43,9 +54,11 @@ setup(
     author='xcube Development Team',
     packages=packages,
     include_package_data=True,
-    data_files=[('xcube_cci', [
-        'xcube_cci/data/excluded_data_sources',
-        'xcube_cci/data/dataset_states.json']
-                 )],
+    data_files=[('xcube_cci', data_files)],
     install_requires=requirements,
+    entry_points={
+        'console_scripts': [
+            'xcube-cci-snapshot = xcube_cci.cli:main'
+        ]
+    },
 )
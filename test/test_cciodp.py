@@ -1,11 +1,24 @@
+import asyncio
 import numpy as np
 import os
 import pandas as pd
+import tempfile
+import threading
+import time
 import unittest
+from aiohttp import web
 from unittest import skip, skipIf
 
+from xcube_cci import cli
 from xcube_cci.cciodp import find_datetime_format, _get_res, CciOdp
+from xcube_cci.cciodp import _GranuleExtractor
+from xcube_cci.chunkstore import CciChunkStore
 from xcube_cci.constants import OPENSEARCH_CEDA_URL
+from xcube_cci.dods import DatasetTemplate
+from xcube_cci.dods import VariableTemplate
+from xcube_cci.dods import get_dds_fingerprint
+from xcube_cci.opensearch import PageSizer
+from xcube_cci.snapshot import CatalogueSnapshot
 
 
 class CciOdpTest(unittest.TestCase):
@@ -41,6 +54,27 @@ class CciOdpTest(unittest.TestCase):
         self.assertEqual(16, len(data_array))
         self.assertAlmostEqual(15, data_array[-2])
 
+    @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1', 'XCUBE_DISABLE_WEB_TESTS = 1')
+    def test_get_data_chunks(self):
+        cci_odp = CciOdp()
+        drs_id = 'esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1'
+        id = cci_odp.get_dataset_id(drs_id)
+        requests = []
+        for var_name in ['surface_pressure', 'O3_du_tot']:
+            request = dict(parentIdentifier=id,
+                           startDate='1997-05-01T00:00:00',
+                           endDate='1997-05-02T00:00:00',
+                           varNames=[var_name],
+                           drsId=drs_id)
+            dim_indexes = (slice(None, None), slice(0, 179), slice(0, 359))
+            requests.append((request, dim_indexes))
+        data = cci_odp.get_data_chunks(requests)
+        self.assertEqual(2, len(data))
+        surface_pressure = np.frombuffer(data[0], dtype=np.float32)
+        self.assertEqual(64261, len(surface_pressure))
+        self.assertAlmostEqual(1024.4185, surface_pressure[-1], 4)
+        self.assertEqual(64261, len(np.frombuffer(data[1], dtype=np.float32)))
+
     @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1', 'XCUBE_DISABLE_WEB_TESTS = 1')
     def test_dataset_names(self):
         cci_odp = CciOdp()
@@ -61,6 +95,18 @@ class CciOdpTest(unittest.TestCase):
             'AVHRR19_G.2-1.r1' in dataset_names
         )
 
+    @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1', 'XCUBE_DISABLE_WEB_TESTS = 1')
+    def test_dataset_names_async(self):
+        cci_odp = CciOdp()
+
+        async def get_dataset_names():
+            # awaited on a loop other than the one of the odp
+            return await cci_odp.dataset_names_async()
+
+        dataset_names = asyncio.run(get_dataset_names())
+        self.assertTrue(len(dataset_names) > 250)
+        self.assertEqual(dataset_names, cci_odp.dataset_names)
+
     @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1',
             'XCUBE_DISABLE_WEB_TESTS = 1')
     def test_var_and_coord_names(self):
@@ -520,3 +566,843 @@ class CciOdpTest(unittest.TestCase):
                           (pd.Timestamp('1997-09-28 00:00:00'),
                            pd.Timestamp('1997-10-02 23:59:00'))],
                          second_time_ranges)
+
+
+_SST_DDS = """Dataset {
+    Structure {
+        Int16 sst[time = 1][lat = 2][lon = 3];
+    } sst;
+} granule.nc;"""
+
+
+class _StandInServer:
+    """
+    Serves .dods responses of a fixed array, OpenSearch responses
+    for a fixed list of granules or datasets and fixed documents with
+    an ETag, and records all requests. Datasets are given by their fid
+    or as features, which are filtered by date and by the query
+    parameters matching their properties. The next *num_failures*
+    granule queries are not answered.
+    """
+
+    def __init__(self, values: np.ndarray = None, granules=(), documents=None,
+                 datasets=()):
+        self.requests = []
+        self.queries = []
+        self.granules = list(granules)
+        self.datasets = list(datasets)
+        self.documents = dict(documents or {})
+        self.not_modified = []
+        self.num_failures = 0
+        self._values = values
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self.port = None
+        self._thread = threading.Thread(target=self._loop.run_forever,
+                                        daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(),
+                                         self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests.append(request.path)
+        if request.path == '/opensearch':
+            return self._handle_opensearch(request)
+        if request.path in self.documents:
+            body, etag = self.documents[request.path]
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified.append(request.path)
+                return web.Response(status=304)
+            return web.Response(body=body, headers={'ETag': etag})
+        if not request.path.endswith('.dods'):
+            return web.Response(status=404)
+        values = self._values.ravel()
+        count = np.array([values.size] * 2, dtype='>u4').tobytes()
+        body = _SST_DDS.encode('utf-8') + b'\nData:\n' + count \
+            + values.astype('>i4').tobytes()
+        return web.Response(body=body)
+
+    def _handle_opensearch(self, request: web.Request) -> web.Response:
+        self.queries.append(dict(request.query))
+        if request.query.get('parentIdentifier') == 'cci':
+            features = [
+                dataset if isinstance(dataset, dict)
+                else dict(id=f'uuid={dataset}',
+                          properties=dict(identifier=dataset, title=dataset))
+                for dataset in self.datasets
+            ]
+            features = [feature for feature in features
+                        if _matches_query(feature, request.query)]
+            return web.json_response(dict(totalResults=len(features),
+                                          features=features))
+        if self.num_failures > 0:
+            self.num_failures -= 1
+            return web.Response(status=404)
+        start = pd.Timestamp(request.query.get('startDate', '1000-01-01'))
+        end = pd.Timestamp(request.query.get('endDate', '3000-01-01'))
+        features = [
+            dict(id=url, properties=dict(
+                date=f'{granule_start.isoformat()}/{granule_end.isoformat()}',
+                links=dict(related=[dict(title='Opendap', href=url)])
+            ))
+            for granule_start, granule_end, url in self.granules
+            if granule_start <= end and granule_end >= start
+        ]
+        page_size = int(request.query.get('maximumRecords', 10))
+        first = (int(request.query.get('startPage', 1)) - 1) * page_size
+        return web.json_response(dict(
+            totalResults=len(features),
+            features=features[first:first + page_size]
+        ))
+
+
+def _matches_query(feature: dict, query) -> bool:
+    properties = feature['properties']
+    if 'date' in properties:
+        start, end = [pd.Timestamp(value).tz_localize(None)
+                      for value in properties['date'].split('/')]
+        if 'startDate' in query and end < pd.Timestamp(query['startDate']) \
+                or 'endDate' in query \
+                and start > pd.Timestamp(query['endDate']):
+            return False
+    return all(properties.get(param) == value
+               for param, value in query.items()
+               if param not in ('parentIdentifier', 'startDate', 'endDate',
+                                'bbox', 'startPage', 'maximumRecords',
+                                'httpAccept'))
+
+
+def _daily_granules(start: str, num_days: int):
+    return [(pd.Timestamp(start) + pd.Timedelta(days=i),
+             pd.Timestamp(start) + pd.Timedelta(days=i, hours=23, minutes=59,
+                                                seconds=59),
+             f'https://odp/granule-{i}.nc')
+            for i in range(num_days)]
+
+
+def _feature_list_request(start_date: str, end_date: str) -> dict:
+    return dict(parentIdentifier='abc',
+                drsId='esacci.SST.day.L4.SSTdepth.multi-sensor.'
+                      'multi-platform.OSTIA.1-1.r1',
+                startDate=start_date,
+                endDate=end_date,
+                fileFormat='.nc')
+
+
+def _feature(url: str, date: str = None, title: str = None) -> dict:
+    properties = dict(links=dict(related=[dict(title='Opendap', href=url)]))
+    if date:
+        properties['date'] = date
+    if title:
+        properties['title'] = title
+    return dict(properties=properties)
+
+
+class GranuleExtractorTest(unittest.TestCase):
+
+    def test_extract_from_dates(self):
+        granules = []
+        _GranuleExtractor()(granules, [
+            _feature('https://odp/a.nc',
+                     date='2002-04-01T00:00:00.000Z/2002-04-01T23:59:59Z'),
+            _feature('https://odp/b.nc',
+                     date='2002-04-02T00:00:00+00:00/2002-04-02T23:59:59'),
+            _feature('https://odp/c.nc', date='invalid/2002-04-03T00:00:00'),
+            dict(properties=dict(date='2002-04-04T00:00:00/'
+                                      '2002-04-04T23:59:59'))
+        ])
+        self.assertEqual(
+            [(pd.Timestamp('2002-04-01'), pd.Timestamp('2002-04-01T23:59:59'),
+              'https://odp/a.nc'),
+             (pd.Timestamp('2002-04-02'), pd.Timestamp('2002-04-02T23:59:59'),
+              'https://odp/b.nc')],
+            granules
+        )
+
+    def test_extract_from_titles(self):
+        extractor = _GranuleExtractor()
+        granules = []
+        extractor(granules, [
+            _feature('https://odp/a.nc',
+                     title='20020401-20020406-ESACCI-L3C_AEROSOL-AEX_'
+                           'ENVISAT-AERGOM_5days-fv2.19.nc'),
+            _feature('https://odp/b.nc',
+                     title='20020406-ESACCI-L3C_AEROSOL-AEX_'
+                           'ENVISAT-AERGOM_5days-fv2.19.nc'),
+        ])
+        extractor(granules, [
+            _feature('https://odp/c.nc',
+                     title='20020411-20020416-ESACCI-L3C_AEROSOL-AEX_'
+                           'ENVISAT-AERGOM_5days-fv2.19.nc'),
+        ])
+        self.assertEqual(
+            [(pd.Timestamp('2002-04-01'), pd.Timestamp('2002-04-06'),
+              'https://odp/a.nc'),
+             (pd.Timestamp('2002-04-06'), pd.Timestamp('2002-04-06'),
+              'https://odp/b.nc'),
+             (pd.Timestamp('2002-04-11'), pd.Timestamp('2002-04-16'),
+              'https://odp/c.nc')],
+            granules
+        )
+
+
+class _RecordingPageSizer(PageSizer):
+    """Records the response times of the pages observed."""
+
+    def __init__(self):
+        super().__init__()
+        self.response_times = []
+
+    def observe(self, num_records: int, seconds: float, num_bytes: int):
+        self.response_times.append(seconds)
+        super().observe(num_records, seconds, num_bytes)
+
+
+class CciOdpGranuleIndexTest(unittest.TestCase):
+
+    def test_feature_list_is_fetched_once(self):
+        granules = _daily_granules('2000-01-01', 25)
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules[:20]) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            try:
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-05T00:00:00',
+                                          '2000-01-09T23:59:59')
+                )
+                self.assertEqual(granules[4:9], features)
+                self.assertEqual(1, len(server.requests))
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2000-01-07T23:59:59')
+                )
+                self.assertEqual(granules[:7], features)
+                # only the window before the first lookup is looked up
+                self.assertEqual(2, len(server.requests))
+                self.assertEqual('2000-01-01T00:00:00',
+                                 server.queries[-1]['startDate'])
+            finally:
+                cci_odp.close()
+
+            server.granules.extend(granules[20:])
+            # a new instance reads the index from the cache directory
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            try:
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2000-01-20T23:59:59')
+                )
+                self.assertEqual(granules[:20], features)
+                # only granules after the last indexed one are looked up
+                self.assertEqual(3, len(server.requests))
+                self.assertEqual('2000-01-10T00:00:00',
+                                 server.queries[-1]['startDate'])
+                for _ in range(2):
+                    features = cci_odp._run_with_session(
+                        cci_odp._get_feature_list,
+                        _feature_list_request('2000-01-01T00:00:00',
+                                              '2000-01-31T23:59:59')
+                    )
+                    self.assertEqual(granules, features)
+                    self.assertEqual(4, len(server.requests))
+            finally:
+                cci_odp.close()
+
+    def test_failed_window_is_looked_up_again(self):
+        granules = _daily_granules('2000-01-01', 10)
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules) as server:
+            # all attempts to read the page fail
+            server.num_failures = 2
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            try:
+                request = _feature_list_request('2000-01-01T00:00:00',
+                                                '2000-01-05T23:59:59')
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list, request
+                )
+                self.assertEqual([], features)
+                self.assertEqual(2, len(server.requests))
+                for _ in range(2):
+                    features = cci_odp._run_with_session(
+                        cci_odp._get_feature_list, request
+                    )
+                    self.assertEqual(granules[:5], features)
+                    self.assertEqual(3, len(server.requests))
+            finally:
+                cci_odp.close()
+
+    def test_one_crawl_under_parallel_reads(self):
+        granules = _daily_granules('2000-01-01', 64)
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+
+            async def read_in_parallel(session):
+                # each chunk read looks up the granule of its time step
+                return await asyncio.gather(*[
+                    cci_odp._get_opendap_url(session, _feature_list_request(
+                        start.strftime('%Y-%m-%dT%H:%M:%S'),
+                        end.strftime('%Y-%m-%dT%H:%M:%S')
+                    ))
+                    for start, end, _ in granules
+                ])
+
+            try:
+                urls = cci_odp._run_with_session(read_in_parallel)
+                stats = cci_odp.get_coalescing_stats()['feature_list']
+                # later reads are answered from the index
+                cci_odp._run_with_session(read_in_parallel)
+            finally:
+                cci_odp.close()
+        self.assertEqual([url for _, _, url in granules], urls)
+        self.assertEqual(['/opensearch'], server.requests)
+        self.assertEqual('2000-01-01T00:00:00',
+                         server.queries[0]['startDate'])
+        self.assertEqual('2000-03-04T23:59:59', server.queries[0]['endDate'])
+        self.assertEqual(dict(calls=64, saved=63), stats)
+
+    def test_probe_page_is_kept(self):
+        granules = _daily_granules('2000-01-01', 2500)
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            try:
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2010-01-01T00:00:00')
+                )
+            finally:
+                cci_odp.close()
+        self.assertEqual(granules, features)
+        self.assertEqual(3, len(server.requests))
+
+    def test_large_time_windows_are_split(self):
+        granules = _daily_granules('2000-01-01', 2500)
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            cci_odp._page_sizer = PageSizer(max_size=1000)
+            try:
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2010-01-01T00:00:00')
+                )
+            finally:
+                cci_odp.close()
+        self.assertEqual(granules, features)
+
+    def test_page_response_time_excludes_waits(self):
+        granules = _daily_granules('2000-01-01', 10)
+        with _StandInServer(granules=granules) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None)
+            cci_odp._page_sizer = _RecordingPageSizer()
+            # the request has to wait for the rate limiter first
+            cci_odp._rate_limiter.defer(f'{server.url}/opensearch', 1.0)
+            start_time = time.monotonic()
+            try:
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2000-01-10T23:59:59')
+                )
+            finally:
+                cci_odp.close()
+        self.assertEqual(granules, features)
+        self.assertGreaterEqual(time.monotonic() - start_time, 1.0)
+        self.assertEqual(1, len(cci_odp._page_sizer.response_times))
+        self.assertLess(cci_odp._page_sizer.response_times[0], 0.5)
+
+    def test_time_availability(self):
+        granules = _daily_granules('2000-01-01', 10)
+        request = _feature_list_request('2000-01-01T00:00:00',
+                                        '2000-01-10T23:59:59')
+        starts = np.arange(np.datetime64('2000-01-01'),
+                           np.datetime64('2000-01-13')).astype('datetime64[s]')
+        ends = starts + np.timedelta64(86399, 's')
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(granules=granules[:4] + granules[6:]) as server:
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=cache_dir)
+            cci_odp._data_sources[request['drsId']] = dict(fid='abc')
+            try:
+                availability = cci_odp.get_time_availability(
+                    request['drsId'], starts, ends
+                )
+                self.assertEqual(1, len(server.requests))
+                self.assertEqual(
+                    [True] * 4 + [False] * 2 + [True] * 4 + [False] * 2,
+                    availability.tolist()
+                )
+                cci_odp.get_time_availability(request['drsId'],
+                                              starts[:2], ends[:2])
+                self.assertEqual(1, len(server.requests))
+            finally:
+                cci_odp.close()
+
+
+_ODD = b'''<?xml version="1.0" encoding="UTF-8"?>
+<OpenSearchDescription xmlns="http://a9.com/-/spec/opensearch/1.1/"
+    xmlns:param="http://a9.com/-/spec/opensearch/extensions/parameters/1.0/">
+  <Url type="application/geo+json" template="">
+    <param:Parameter name="drsId" value="{drsId?}">
+      <param:Option value="esacci.A.day.L3.X.a.b.c.1.r1" label="esacci.A (2)"/>
+      <param:Option value="esacci.B.day.L3.X.a.b.c.1.r1" label="esacci.B (3)"/>
+    </param:Parameter>
+  </Url>
+</OpenSearchDescription>'''
+
+
+def _get_odd(drs_id: str, institute: str) -> bytes:
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<OpenSearchDescription xmlns="http://a9.com/-/spec/opensearch/1.1/"
+    xmlns:param="http://a9.com/-/spec/opensearch/extensions/parameters/1.0/">
+  <Url type="application/geo+json" template="">
+    <param:Parameter name="drsId" value="{{drsId?}}">
+      <param:Option value="{drs_id}" label="{drs_id} (2)"/>
+    </param:Parameter>
+    <param:Parameter name="institute" value="{{institute?}}">
+      <param:Option value="{institute}" label="{institute} (2)"/>
+    </param:Parameter>
+  </Url>
+</OpenSearchDescription>'''.encode('utf-8')
+
+
+class CciOdpMetadataCacheTest(unittest.TestCase):
+
+    def test_catalogue_is_cached_and_revalidated(self):
+        drs_ids = ['esacci.A.day.L3.X.a.b.c.1.r1',
+                   'esacci.B.day.L3.X.a.b.c.1.r1']
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                _StandInServer(documents={'/description.xml':
+                                          (_ODD, '"v1"')}) as server:
+            odd_url = f'{server.url}/description.xml'
+            for metadata_ttl in [3600, 3600, 0]:
+                cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                                 endpoint_description_url=odd_url,
+                                 cache_dir=cache_dir,
+                                 metadata_ttl=metadata_ttl)
+                try:
+                    self.assertEqual(drs_ids, cci_odp.dataset_names)
+                    if metadata_ttl == 0:
+                        # the stale catalogue is revalidated in the background
+                        for _ in range(50):
+                            if server.not_modified:
+                                break
+                            time.sleep(0.1)
+                finally:
+                    cci_odp.close()
+        self.assertEqual(['/description.xml'] * 2, server.requests)
+        self.assertEqual(['/description.xml'], server.not_modified)
+
+
+class CciOdpSnapshotTest(unittest.TestCase):
+
+    def test_catalogue_is_read_from_snapshot(self):
+        drs_id = 'esacci.A.day.L3.X.a.b.c.1.r1'
+        data_source = dict(fid='abc', uuid='abc', title='A',
+                           dimensions=dict(time=2, lat=180, lon=360),
+                           variable_infos=dict(sst=dict(dimensions=['time'])),
+                           attributes={})
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer(documents={'/description.xml':
+                                          (_ODD, '"v1"')}) as server:
+            snapshot_path = os.path.join(temp_dir, 'snapshot.json.gz')
+            CatalogueSnapshot(f'{server.url}/opensearch', [drs_id],
+                              {drs_id: data_source}).save(snapshot_path)
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             endpoint_description_url=f'{server.url}'
+                                                      f'/description.xml',
+                             cache_dir=os.path.join(temp_dir, 'cache'),
+                             snapshot_path=snapshot_path)
+            try:
+                self.assertEqual([drs_id], cci_odp.dataset_names)
+                self.assertEqual(data_source,
+                                 cci_odp.get_dataset_metadata(drs_id))
+                self.assertEqual([], server.requests)
+            finally:
+                cci_odp.close()
+
+            # the names in an old snapshot are checked in the background
+            CatalogueSnapshot(f'{server.url}/opensearch', [drs_id],
+                              {drs_id: data_source},
+                              created=0).save(snapshot_path)
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             endpoint_description_url=f'{server.url}'
+                                                      f'/description.xml',
+                             cache_dir=os.path.join(temp_dir, 'cache'),
+                             snapshot_path=snapshot_path)
+            try:
+                self.assertEqual([drs_id], cci_odp.dataset_names)
+                for _ in range(50):
+                    if len(cci_odp.dataset_names) == 2:
+                        break
+                    time.sleep(0.1)
+                self.assertEqual([drs_id, 'esacci.B.day.L3.X.a.b.c.1.r1'],
+                                 cci_odp.dataset_names)
+            finally:
+                cci_odp.close()
+
+    def test_regenerate_snapshot(self):
+        drs_id = 'esacci.A.day.L3.X.a.b.c.1.r1'
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer() as server:
+            snapshot_path = os.path.join(temp_dir, 'snapshot.json.gz')
+            self.assertEqual(0, cli.main([
+                drs_id, '-o', snapshot_path,
+                '--endpoint-url', f'{server.url}/opensearch'
+            ]))
+            snapshot = CatalogueSnapshot.load(snapshot_path)
+        self.assertEqual(f'{server.url}/opensearch', snapshot.endpoint_url)
+        self.assertEqual([drs_id], snapshot.drs_ids)
+        # the stand-in server does not know the dataset
+        self.assertEqual({}, snapshot.data_sources)
+
+
+class CciOdpSearchTest(unittest.TestCase):
+
+    def test_search_with_index(self):
+        sst_id = 'esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform' \
+                 '.OSTIA.1-1.r1'
+        oc_id = 'esacci.OC.5-days.L3S.CHLOR_A.multi-sensor.multi-platform' \
+                '.MERGED.5-0.r1'
+        data_sources = {
+            sst_id: dict(fid='a', institute='Met Office',
+                         sensor_id='multi-sensor',
+                         platform_id='multi-platform',
+                         temporal_coverage_start='1981-09-01T00:00:00',
+                         temporal_coverage_end='2016-12-31T23:59:59',
+                         bbox_minx='-180.0', bbox_miny='-90.0',
+                         bbox_maxx='180.0', bbox_maxy='90.0'),
+            oc_id: dict(fid='b', institute='Plymouth Marine Laboratory',
+                        sensor_id='multi-sensor',
+                        platform_id='multi-platform',
+                        temporal_coverage_start='1997-09-04T00:00:00',
+                        temporal_coverage_end='2020-12-31T23:59:59',
+                        bbox_minx='0.0', bbox_miny='40.0',
+                        bbox_maxx='30.0', bbox_maxy='60.0')
+        }
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer() as server:
+            snapshot_path = os.path.join(temp_dir, 'snapshot.json.gz')
+            CatalogueSnapshot(f'{server.url}/opensearch', [sst_id, oc_id],
+                              data_sources).save(snapshot_path)
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=snapshot_path)
+            try:
+                # descriptions are taken from the snapshot
+                self.assertEqual([], cci_odp.search(
+                    start_date='2018-01-01', end_date='2018-12-31',
+                    cci_attrs=dict(ecv='SST')))
+                self.assertEqual([oc_id], cci_odp.search(
+                    cci_attrs=dict(ecv='OC', frequency='5 days')))
+                self.assertEqual([sst_id], cci_odp.search(
+                    cci_attrs=dict(product_version='1.1')))
+                self.assertEqual([sst_id, oc_id],
+                                 cci_odp.search(cci_attrs={}))
+                self.assertEqual([oc_id], cci_odp.search(
+                    start_date='2018-01-01', cci_attrs={}))
+                self.assertEqual([sst_id], cci_odp.search(
+                    bbox=(-60.0, -30.0, -40.0, 0.0), cci_attrs={}))
+                self.assertEqual([sst_id], cci_odp.search(
+                    end_date='1990-01-01',
+                    cci_attrs=dict(institute='Met Office')))
+                self.assertEqual([], server.requests)
+            finally:
+                cci_odp.close()
+
+    def test_search_queries_missing_datasets_at_once(self):
+        sst_id = 'esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform' \
+                 '.OSTIA.1-1.r1'
+        oc_id = 'esacci.OC.5-days.L3S.CHLOR_A.multi-sensor.multi-platform' \
+                '.MERGED.5-0.r1'
+        lst_id = 'esacci.LST.day.L3C.LST.AATSR.Envisat.ESACCI_L3C_LST.3-00.r1'
+        data_sources = {
+            sst_id: dict(fid='a', sensor_id='multi-sensor',
+                         platform_id='multi-platform',
+                         temporal_coverage_start='1981-09-01T00:00:00',
+                         temporal_coverage_end='2016-12-31T23:59:59')
+        }
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer(datasets=['a']) as server:
+            snapshot_path = os.path.join(temp_dir, 'snapshot.json.gz')
+            CatalogueSnapshot(f'{server.url}/opensearch',
+                              [sst_id, oc_id, lst_id],
+                              data_sources).save(snapshot_path)
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=snapshot_path)
+            try:
+                self.assertEqual([], cci_odp.search(
+                    start_date='2018-01-01', bbox=(0, 10, 20, 30),
+                    cci_attrs=dict(sensor='multi-sensor')))
+                self.assertEqual(['/opensearch'], server.requests)
+                query = server.queries[0]
+                self.assertEqual('cci', query['parentIdentifier'])
+                self.assertEqual('2018-01-01T00:00:00', query['startDate'])
+                self.assertEqual('0.0,10.0,20.0,30.0', query['bbox'])
+                self.assertEqual('multi-sensor', query['sensor'])
+                self.assertNotIn('endDate', query)
+                self.assertEqual([sst_id], cci_odp.search(
+                    end_date='2000-01-01',
+                    cci_attrs=dict(ecv='SST', platform='multi-platform')))
+                self.assertEqual(1, len(server.requests))
+            finally:
+                cci_odp.close()
+
+
+    def test_search_filters_locally_what_is_not_pushed_down(self):
+        sst_id = 'esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform' \
+                 '.OSTIA.1-1.r1'
+        oc_id = 'esacci.OC.5-days.L3S.CHLOR_A.multi-sensor.multi-platform' \
+                '.MERGED.5-0.r1'
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer() as server:
+            # the service writes frequencies and product versions
+            # differently than they are searched for
+            server.datasets.extend([
+                dict(id='uuid=a', bbox=[-180.0, -90.0, 180.0, 90.0],
+                     properties=dict(
+                         identifier='a', frequency='day',
+                         sensor='multi-sensor',
+                         productVersion='1-1',
+                         date='1981-09-01T00:00:00Z/2016-12-31T23:59:59Z',
+                         links=dict(search=[dict(href=f'{server.url}/a.xml')])
+                     )),
+                dict(id='uuid=b', bbox=[0.0, 40.0, 30.0, 60.0],
+                     properties=dict(
+                         identifier='b', frequency='5-days',
+                         sensor='multi-sensor',
+                         productVersion='5-0',
+                         date='1997-09-04T00:00:00Z/2020-12-31T23:59:59Z',
+                         links=dict(search=[dict(href=f'{server.url}/b.xml')])
+                     ))
+            ])
+            server.documents.update({
+                '/a.xml': (_get_odd(sst_id, 'Met Office'), '"1"'),
+                '/b.xml': (_get_odd(oc_id, 'Plymouth Marine Laboratory'),
+                           '"1"')
+            })
+            snapshot_path = os.path.join(temp_dir, 'snapshot.json.gz')
+            CatalogueSnapshot(f'{server.url}/opensearch', [sst_id, oc_id],
+                              {}).save(snapshot_path)
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=snapshot_path)
+            try:
+                self.assertEqual([oc_id], cci_odp.search(
+                    start_date='2018-01-01',
+                    cci_attrs=dict(frequency='5 days', product_version='5.0',
+                                   institute='Plymouth Marine Laboratory',
+                                   sensor='multi-sensor')))
+                # the collection is described from its feature and its
+                # description document only
+                self.assertEqual(['/opensearch', '/b.xml'], server.requests)
+                self.assertEqual(dict(parentIdentifier='cci',
+                                      startDate='2018-01-01T00:00:00',
+                                      sensor='multi-sensor'),
+                                 {param: value for param, value
+                                  in server.queries[0].items()
+                                  if param not in ('startPage',
+                                                   'maximumRecords',
+                                                   'httpAccept')})
+                self.assertEqual([sst_id], cci_odp.search(
+                    end_date='2000-01-01', bbox=(-60.0, -30.0, -40.0, 0.0),
+                    cci_attrs=dict(product_version='1.1')))
+                self.assertEqual(['/opensearch', '/b.xml', '/opensearch',
+                                  '/a.xml'], server.requests)
+                self.assertEqual([sst_id], cci_odp.search(
+                    cci_attrs=dict(institute='Met Office')))
+                self.assertEqual(4, len(server.requests))
+            finally:
+                cci_odp.close()
+
+
+class CciOdpStateTest(unittest.TestCase):
+
+    def test_warm_start_from_state(self):
+        granules = _daily_granules('2000-01-01', 10)
+        template = DatasetTemplate('f00', dict(
+            sst=VariableTemplate('sst', (1, 180, 360),
+                                 (slice(0, 1, 1), slice(0, 180, 1),
+                                  slice(0, 360, 1)))
+        ))
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                _StandInServer(granules=granules) as server:
+            state_path = os.path.join(temp_dir, 'state.npz')
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=None)
+            try:
+                cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2000-01-10T23:59:59')
+                )
+                cci_odp._drs_ids = ['esacci.A']
+                cci_odp._data_sources['esacci.A'] = dict(fid='abc')
+                cci_odp._dataset_templates['esacci.A'] = template
+                cci_odp._result_dicts[granules[0][2]] = \
+                    dict(dds='Dataset {}')
+                cci_odp.save_state(state_path)
+            finally:
+                cci_odp.close()
+            self.assertEqual(1, len(server.requests))
+
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=None,
+                             state_path=state_path)
+            try:
+                self.assertEqual(['esacci.A'], cci_odp.dataset_names)
+                self.assertEqual('abc', cci_odp.get_dataset_id('esacci.A'))
+                self.assertEqual(
+                    template.get_variable('sst'),
+                    cci_odp._dataset_templates['esacci.A']
+                    .get_variable('sst')
+                )
+                self.assertEqual(dict(dds='Dataset {}'),
+                                 cci_odp._result_dicts[granules[0][2]])
+                features = cci_odp._run_with_session(
+                    cci_odp._get_feature_list,
+                    _feature_list_request('2000-01-01T00:00:00',
+                                          '2000-01-05T23:59:59')
+                )
+                self.assertEqual(granules[:5], features)
+                self.assertEqual(1, len(server.requests))
+            finally:
+                cci_odp.close()
+
+            # states of other services are not loaded
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/other',
+                             cache_dir=None, snapshot_path=None)
+            try:
+                with self.assertRaises(ValueError):
+                    cci_odp.load_state(state_path)
+            finally:
+                cci_odp.close()
+
+
+class CciOdpChunkFastPathTest(unittest.TestCase):
+
+    def test_fetch_data_chunks_issues_one_request_per_chunk(self):
+        sst = np.arange(6, dtype=np.int16).reshape((1, 2, 3))
+        variable = VariableTemplate('sst.sst', (1, 2, 3),
+                                    (slice(None), slice(None), slice(None)))
+        dim_indexes = (slice(None), slice(0, 2), slice(0, 3))
+        with _StandInServer(sst) as server:
+            cci_odp = CciOdp()
+            try:
+                requests = [(f'{server.url}/granule-{i}.nc', variable,
+                             dim_indexes, 'int16')
+                            for i in range(4)]
+                chunks = cci_odp.fetch_data_chunks(requests)
+            finally:
+                cci_odp.close()
+        self.assertEqual(4, len(chunks))
+        for chunk in chunks:
+            np.testing.assert_array_equal(sst.ravel(),
+                                          np.frombuffer(chunk, dtype=np.int16))
+        self.assertEqual(4, len(server.requests))
+        self.assertEqual({f'/granule-{i}.nc.dods' for i in range(4)},
+                         set(server.requests))
+
+    def test_chunk_store_issues_one_request_per_chunk(self):
+        sst = np.arange(6, dtype=np.int16).reshape((1, 2, 3))
+        drs_id = 'esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform' \
+                 '.OSTIA.1-1.r1'
+        data_source = dict(
+            fid='abc', uuid='abc',
+            temporal_coverage_start='2000-01-01T00:00:00',
+            temporal_coverage_end='2000-01-05T23:59:59',
+            dimensions=dict(lat=2, lon=3),
+            variables=[dict(var_id='sst')],
+            variable_infos=dict(sst=dict(
+                dimensions=['time', 'lat', 'lon'],
+                file_dimensions=['time', 'lat', 'lon'],
+                data_type='int16', fill_value=-1, size=6, shape=[1, 2, 3],
+                chunk_sizes=[1, 2, 3], file_chunk_sizes=[1, 2, 3]
+            )),
+            attributes=dict(NC_GLOBAL={})
+        )
+        template = DatasetTemplate(get_dds_fingerprint(_SST_DDS), dict(
+            sst=VariableTemplate('sst.sst', (1, 2, 3),
+                                 (slice(0, 1, 1), slice(0, 2, 1),
+                                  slice(0, 3, 1)))
+        ))
+        with _StandInServer(sst) as server:
+            server.granules.extend(
+                (start, end, url.replace('https://odp', server.url))
+                for start, end, url in _daily_granules('2000-01-01', 5)
+            )
+            server.documents.update({f'/granule-{i}.nc.dds': (_SST_DDS, '"1"')
+                                     for i in range(4)})
+            # the last granule has another structure, which cannot be
+            # determined from its metadata either
+            server.documents['/granule-4.nc.dods'] = (
+                _SST_DDS.replace('lat = 2', 'lat = 3').encode('utf-8')
+                + b'\nData:\n' + np.array([9, 9], dtype='>u4').tobytes()
+                + np.zeros(9, dtype='>i4').tobytes(),
+                '"1"'
+            )
+            cci_odp = CciOdp(endpoint_url=f'{server.url}/opensearch',
+                             cache_dir=None, snapshot_path=None)
+            try:
+                cci_odp._drs_ids = [drs_id]
+                cci_odp._data_sources[drs_id] = data_source
+                cci_odp._dataset_templates[drs_id] = template
+                store = CciChunkStore(cci_odp, drs_id, dict(
+                    time_range=(pd.Timestamp('2000-01-01'),
+                                pd.Timestamp('2000-01-05')),
+                    variable_names=['sst']
+                ))
+                keys = [f'sst/{i}.0.0' for i in range(5)]
+                num_requests = len(server.requests)
+                chunks = store.getitems(keys, contexts={})
+                first_requests = server.requests[num_requests:]
+                num_requests = len(server.requests)
+                self.assertEqual(chunks, store.getitems(keys, contexts={}))
+                second_requests = server.requests[num_requests:]
+            finally:
+                cci_odp.close()
+        self.assertEqual(keys[:4], sorted(chunks.keys()))
+        for chunk in chunks.values():
+            np.testing.assert_array_equal(sst.ravel(),
+                                          np.frombuffer(chunk, dtype=np.int16))
+        # each chunk costs a single request, the structure of its granule
+        # is checked by the header of the response, a granule of another
+        # structure takes the full route
+        expected_requests = sorted([f'/granule-{i}.nc.dods' for i in range(5)]
+                                   + ['/granule-4.nc.dds'])
+        self.assertEqual(expected_requests, sorted(first_requests))
+        self.assertEqual(expected_requests, sorted(second_requests))
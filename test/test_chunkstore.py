@@ -37,6 +37,17 @@ class CciChunkStoreTest(unittest.TestCase):
              'O3_du_tot', 'O3_ndens', 'O3_du', 'O3_vmr'},
             set(store._variable_names))
 
+    @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1',
+            'XCUBE_DISABLE_WEB_TESTS = 1')
+    def test_getitems(self):
+        store = self._get_test_store()
+        keys = ['O3_vmr/0.0.0.0', 'O3_vmr/1.0.0.0', '.zgroup', 'O3_vmr/99.0.0.0']
+        values = store.getitems(keys, contexts={})
+        self.assertEqual({'O3_vmr/0.0.0.0', 'O3_vmr/1.0.0.0', '.zgroup'},
+                         set(values.keys()))
+        self.assertEqual(store['O3_vmr/0.0.0.0'], values['O3_vmr/0.0.0.0'])
+        self.assertEqual(store['O3_vmr/1.0.0.0'], values['O3_vmr/1.0.0.0'])
+
     @skipIf(os.environ.get('XCUBE_DISABLE_WEB_TESTS', None) == '1',
             'XCUBE_DISABLE_WEB_TESTS = 1')
     def test_chunk_store_with_region_constraint(self):
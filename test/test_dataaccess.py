@@ -622,6 +622,15 @@ class CciOdpDataStoreTest(unittest.TestCase):
         self.assertTrue('endpoint_url' in cci_store_params_schema['properties'])
         self.assertTrue('endpoint_description_url' in cci_store_params_schema['properties'])
         self.assertTrue('user_agent' in cci_store_params_schema['properties'])
+        self.assertTrue('num_error_retries' in cci_store_params_schema['properties'])
+        self.assertTrue('requests_per_second' in cci_store_params_schema['properties'])
+        self.assertTrue('opensearch_concurrency' in cci_store_params_schema['properties'])
+        self.assertTrue('metadata_concurrency' in cci_store_params_schema['properties'])
+        self.assertTrue('data_concurrency' in cci_store_params_schema['properties'])
+        self.assertTrue('cache_dir' in cci_store_params_schema['properties'])
+        self.assertTrue('metadata_ttl' in cci_store_params_schema['properties'])
+        self.assertTrue('snapshot_path' in cci_store_params_schema['properties'])
+        self.assertTrue('state_path' in cci_store_params_schema['properties'])
 
     def test_get_data_types(self):
         self.assertEqual(('dataset',), CciOdpDataStore.get_data_types())
@@ -0,0 +1,164 @@
+import unittest
+
+import numpy as np
+
+from xcube_cci.dods import DodsArrayDecoder
+from xcube_cci.dods import DatasetTemplate
+from xcube_cci.dods import VariableTemplate
+from xcube_cci.dods import decode_dods_array
+from xcube_cci.dods import get_dds_fingerprint
+from xcube_cci.dods import parse_dods_variables
+
+_GRID_DDS = '''Dataset {
+    Grid {
+     ARRAY:
+        Int16 sst[time = 1][lat = 2][lon = 3];
+     MAPS:
+        Float64 time[time = 1];
+        Float32 lat[lat = 2];
+        Float32 lon[lon = 3];
+    } sst;
+} ESACCI-SST.nc;'''
+
+
+def _encode_array(values: np.ndarray, wire_dtype: str) -> bytes:
+    values = values.ravel()
+    count = np.array([values.size, values.size], dtype='>u4').tobytes()
+    data = values.astype(wire_dtype).tobytes()
+    return count + data + b'\0' * (-len(data) % 4)
+
+
+def _make_response(dds: str, *encoded_arrays: bytes) -> bytes:
+    return dds.encode('utf-8') + b'\nData:\n' + b''.join(encoded_arrays)
+
+
+class DodsTest(unittest.TestCase):
+
+    def test_parse_dods_variables(self):
+        variables = parse_dods_variables(_GRID_DDS)
+        self.assertEqual(['sst', 'time', 'lat', 'lon'],
+                         [variable.name for variable in variables])
+        self.assertEqual((1, 2, 3), variables[0].shape)
+        self.assertEqual(8 + 6 * 4, variables[0].num_bytes)
+        self.assertEqual(np.dtype('int16'), variables[0].dtype)
+        self.assertIsNone(parse_dods_variables(
+            'Dataset {\n    String name;\n} x;'
+        ))
+
+    def test_decode_grid_array(self):
+        sst = np.arange(-3, 3, dtype=np.int16).reshape((1, 2, 3))
+        content = _make_response(
+            _GRID_DDS,
+            _encode_array(sst, '>i4'),
+            _encode_array(np.array([0.0]), '>f8'),
+            _encode_array(np.array([10.5, 11.5]), '>f4'),
+            _encode_array(np.array([1.5, 2.5, 3.5]), '>f4'),
+        )
+        data = decode_dods_array(content, 'sst.sst', 'int16')
+        self.assertIsInstance(data, bytearray)
+        np.testing.assert_array_equal(sst.ravel(),
+                                      np.frombuffer(data, dtype=np.int16))
+        lon = decode_dods_array(content, 'sst.lon')
+        np.testing.assert_array_equal([1.5, 2.5, 3.5],
+                                      np.frombuffer(lon, dtype=np.float32))
+
+    def test_decode_in_blocks(self):
+        sst = np.arange(-500, 500, dtype=np.int16).reshape((1, 20, 50))
+        content = _make_response(
+            _GRID_DDS.replace('[lat = 2][lon = 3]', '[lat = 20][lon = 50]')
+                     .replace('[lat = 2]', '[lat = 20]')
+                     .replace('[lon = 3]', '[lon = 50]'),
+            _encode_array(sst, '>i4'),
+            _encode_array(np.array([0.0]), '>f8'),
+            _encode_array(np.arange(20), '>f4'),
+            _encode_array(np.arange(50), '>f4'),
+        )
+        for block_size in [1, 3, 7, 4096]:
+            decoder = DodsArrayDecoder('sst.sst', 'int16')
+            for i in range(0, len(content), block_size):
+                decoder.feed(content[i:i + block_size])
+            self.assertFalse(decoder.declined)
+            np.testing.assert_array_equal(
+                sst.ravel(), np.frombuffer(decoder.finish(), dtype=np.int16)
+            )
+        lat_decoder = DodsArrayDecoder('sst.lat')
+        for i in range(0, len(content), 5):
+            lat_decoder.feed(content[i:i + 5])
+        np.testing.assert_array_equal(
+            np.arange(20), np.frombuffer(lat_decoder.finish(), np.float32)
+        )
+
+    def test_declined_response_is_kept(self):
+        content = _make_response('Dataset {\n    String name;\n} f.nc;',
+                                  b'\0\0\0\x03abc\0')
+        decoder = DodsArrayDecoder('name')
+        for i in range(0, len(content), 4):
+            decoder.feed(content[i:i + 4])
+        self.assertTrue(decoder.declined)
+        self.assertIsNone(decoder.finish())
+        self.assertEqual(content, decoder.content)
+
+    def test_decode_padded_bytes(self):
+        dds = 'Dataset {\n    Byte flag[x = 5];\n    Float32 v[x = 2];\n} f.nc;'
+        content = _make_response(
+            dds,
+            _encode_array(np.arange(5, dtype=np.uint8), 'u1'),
+            _encode_array(np.array([1.25, -2.5]), '>f4'),
+        )
+        flags = decode_dods_array(content, 'flag')
+        self.assertEqual(bytearray([0, 1, 2, 3, 4]), flags)
+        v = decode_dods_array(content, 'v', 'float64')
+        np.testing.assert_array_equal([1.25, -2.5],
+                                      np.frombuffer(v, dtype=np.float64))
+
+    def test_decode_malformed_responses(self):
+        dds = 'Dataset {\n    Float32 v[x = 4];\n} f.nc;'
+        with self.assertRaises(ValueError):
+            decode_dods_array(dds.encode('utf-8'), 'v')
+        with self.assertRaises(ValueError):
+            decode_dods_array(
+                _make_response(dds, _encode_array(np.zeros(3), '>f4')), 'v'
+            )
+
+    def test_decode_checks_shape(self):
+        dds = 'Dataset {\n    Float32 v[y = 2][x = 3];\n} f.nc;'
+        content = _make_response(dds, _encode_array(np.zeros(6), '>f4'))
+        decoder = DodsArrayDecoder('v', shape=(2, 3))
+        decoder.feed(content)
+        self.assertEqual(bytearray(24), decoder.finish())
+        decoder = DodsArrayDecoder('v', shape=(3, 2))
+        with self.assertRaises(ValueError):
+            decoder.feed(content)
+
+    def test_unsupported_responses_are_declined(self):
+        dds = 'Dataset {\n    String name;\n} f.nc;'
+        self.assertIsNone(decode_dods_array(_make_response(dds, b''), 'name'))
+        dds = 'Dataset {\n    Float32 v[x = 1];\n} f.nc;'
+        content = _make_response(dds, _encode_array(np.zeros(1), '>f4'))
+        self.assertIsNone(decode_dods_array(content, 'w'))
+
+
+class DatasetTemplateTest(unittest.TestCase):
+
+    def test_fingerprint_ignores_dataset_name(self):
+        other_granule = _GRID_DDS.replace('ESACCI-SST.nc',
+                                          'ESACCI-SST-19970502.nc')
+        self.assertEqual(get_dds_fingerprint(_GRID_DDS),
+                         get_dds_fingerprint(other_granule))
+        other_structure = _GRID_DDS.replace('[lat = 2]', '[lat = 4]')
+        self.assertNotEqual(get_dds_fingerprint(_GRID_DDS),
+                            get_dds_fingerprint(other_structure))
+
+    def test_template(self):
+        sst = VariableTemplate('sst.sst', (1, 2, 3), (slice(None),) * 3)
+        template = DatasetTemplate(get_dds_fingerprint(_GRID_DDS),
+                                   dict(sst=sst))
+        self.assertEqual(['sst'], template.variable_names)
+        self.assertEqual(sst, template.get_variable('sst'))
+        self.assertIsNone(template.get_variable('lat'))
+        self.assertTrue(template.matches(
+            _GRID_DDS.replace('ESACCI-SST.nc', 'other.nc')
+        ))
+        self.assertFalse(template.matches(
+            _GRID_DDS.replace('Int16', 'Float32')
+        ))
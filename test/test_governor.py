@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import unittest
+
+from xcube_cci.governor import ConcurrencyGovernor
+from xcube_cci.governor import TRAFFIC_DATA
+from xcube_cci.governor import TRAFFIC_OPENSEARCH
+from xcube_cci.governor import get_governor
+
+
+class ConcurrencyGovernorTest(unittest.TestCase):
+
+    def test_limit_is_shared_across_loops(self):
+        governor = ConcurrencyGovernor({TRAFFIC_DATA: 3})
+        lock = threading.Lock()
+        state = dict(active=0, max_active=0)
+
+        async def request():
+            async with governor.slot('https://data.org/a.dods', TRAFFIC_DATA):
+                with lock:
+                    state['active'] += 1
+                    state['max_active'] = max(state['max_active'],
+                                              state['active'])
+                await asyncio.sleep(0.01)
+                with lock:
+                    state['active'] -= 1
+
+        async def many_requests():
+            await asyncio.gather(*[request() for _ in range(10)])
+
+        threads = [threading.Thread(target=asyncio.run,
+                                    args=(many_requests(),))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, state['max_active'])
+        self.assertEqual(0, state['active'])
+        stats = governor.get_stats()['data.org'][TRAFFIC_DATA]
+        self.assertEqual(dict(limit=3, active=0, waiting=0), stats)
+
+    def test_hosts_and_classes_are_independent(self):
+        governor = ConcurrencyGovernor({TRAFFIC_DATA: 1,
+                                        TRAFFIC_OPENSEARCH: 1})
+
+        async def run():
+            async with governor.slot('https://a.org/x.dods', TRAFFIC_DATA):
+                async with governor.slot('https://b.org/x.dods', TRAFFIC_DATA):
+                    async with governor.slot('https://a.org/request',
+                                             TRAFFIC_OPENSEARCH):
+                        return governor.get_stats()
+
+        stats = asyncio.run(asyncio.wait_for(run(), 1))
+        self.assertEqual(1, stats['a.org'][TRAFFIC_DATA]['active'])
+        self.assertEqual(1, stats['b.org'][TRAFFIC_DATA]['active'])
+        self.assertEqual(1, stats['a.org'][TRAFFIC_OPENSEARCH]['active'])
+
+    def test_queue_depth_and_cancellation(self):
+        governor = ConcurrencyGovernor({TRAFFIC_DATA: 1})
+        url = 'https://a.org/x.dods'
+
+        async def hold(event: asyncio.Event):
+            async with governor.slot(url, TRAFFIC_DATA):
+                await event.wait()
+
+        async def run():
+            event = asyncio.Event()
+            holder = asyncio.create_task(hold(event))
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(hold(event)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            waiting = governor.get_stats()['a.org'][TRAFFIC_DATA]['waiting']
+            waiters[0].cancel()
+            await asyncio.sleep(0.01)
+            event.set()
+            await asyncio.gather(holder, *waiters[1:])
+            return waiting
+
+        self.assertEqual(3, asyncio.run(asyncio.wait_for(run(), 1)))
+        self.assertEqual(dict(limit=1, active=0, waiting=0),
+                         governor.get_stats()['a.org'][TRAFFIC_DATA])
+
+    def test_set_limits(self):
+        governor = ConcurrencyGovernor()
+        governor.set_limits(data=7, opensearch=None)
+        self.assertEqual(7, governor.limits[TRAFFIC_DATA])
+        with self.assertRaises(ValueError):
+            governor.set_limits(data=0)
+        with self.assertRaises(ValueError):
+            governor.set_limits(video=2)
+
+    def test_get_governor_is_process_wide(self):
+        self.assertIs(get_governor(), get_governor())
@@ -0,0 +1,165 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xcube_cci.granuleindex import GranuleIndex
+
+
+def _daily_granules(start: str, num_days: int):
+    return [(pd.Timestamp(start) + pd.Timedelta(days=i),
+             pd.Timestamp(start) + pd.Timedelta(days=i, hours=23, minutes=59,
+                                                seconds=59),
+             f'https://odp/granule-{i}.nc')
+            for i in range(num_days)]
+
+
+class GranuleIndexTest(unittest.TestCase):
+
+    def test_empty_index(self):
+        index = GranuleIndex()
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.first_start)
+        self.assertIsNone(index.last_end)
+        self.assertEqual([], index.find('2000-01-01', '2001-01-01'))
+        self.assertEqual([None], index.find_first_urls(['2000-01-01'],
+                                                       ['2001-01-01']))
+
+    def test_find(self):
+        granules = _daily_granules('2000-01-01', 10)
+        index = GranuleIndex(reversed(granules))
+        self.assertEqual(10, len(index))
+        self.assertEqual(np.dtype('datetime64[s]'), index.starts.dtype)
+        self.assertEqual(pd.Timestamp('2000-01-01'), index.first_start)
+        self.assertEqual(pd.Timestamp('2000-01-10T23:59:59'), index.last_end)
+        self.assertEqual(granules[2:5],
+                         index.find('2000-01-03T12:00:00',
+                                    pd.Timestamp('2000-01-05T00:00:00')))
+        self.assertEqual(granules[:1],
+                         index.find('1999-01-01', '2000-01-01T00:00:00'))
+        self.assertEqual([], index.find('2001-01-01', '2002-01-01'))
+        self.assertEqual((10, 10), index.find_range('2001-01-01', '2002-01-01'))
+
+    def test_find_first_urls(self):
+        index = GranuleIndex(_daily_granules('2000-01-01', 5))
+        urls = index.find_first_urls(
+            ['2000-01-01T00:00:00', '2000-01-03T00:00:00', '2000-02-01'],
+            ['2000-01-01T23:59:59', '2000-01-04T23:59:59', '2000-02-02']
+        )
+        self.assertEqual(['https://odp/granule-0.nc',
+                          'https://odp/granule-2.nc',
+                          None], urls)
+
+    def test_covers(self):
+        granules = _daily_granules('2000-01-01', 5)
+        index = GranuleIndex(granules[:2] + granules[3:])
+        starts = np.arange(np.datetime64('1999-12-31'),
+                           np.datetime64('2000-01-07')).astype('datetime64[s]')
+        ends = starts + np.timedelta64(86399, 's')
+        self.assertEqual([False, True, True, False, True, True, False],
+                         index.covers(starts, ends).tolist())
+        self.assertEqual([True], index.covers(['2000-01-02T12:00:00'],
+                                              ['2000-01-03T12:00:00']).tolist())
+
+    def test_unordered_ends(self):
+        index = GranuleIndex([
+            ('2000-01-01', '2000-12-31', 'year.nc'),
+            ('2000-02-01', '2000-02-28', 'feb.nc'),
+        ])
+        self.assertEqual(['year.nc'],
+                         [url for _, _, url in index.find('2000-06-01',
+                                                          '2000-06-02')])
+        self.assertEqual(['year.nc', 'feb.nc'],
+                         [url for _, _, url in index.find('2000-02-10',
+                                                          '2000-02-11')])
+        self.assertEqual(['year.nc', 'feb.nc'], index.urls)
+
+    def test_merge_deduplicates_by_url(self):
+        granules = _daily_granules('2000-01-01', 10)
+        index = GranuleIndex(granules[3:6])
+        self.assertEqual(3, index.merge(granules[:4]))
+        self.assertEqual(4, index.merge(reversed(granules[5:])))
+        self.assertEqual(0, index.merge(granules))
+        self.assertEqual(10, len(index))
+        self.assertEqual(granules, index.get_granules())
+        self.assertTrue(np.all(index.starts[:-1] <= index.starts[1:]))
+
+    def test_merge_interleaved(self):
+        granules = _daily_granules('2000-01-01', 10)
+        index = GranuleIndex(granules[::2])
+        self.assertEqual(5, index.merge(reversed(granules[1::2])))
+        self.assertEqual(granules, index.get_granules())
+        # granules starting at the same time are kept in order of arrival,
+        # a long granule merged early is found in later windows
+        self.assertEqual(2, index.merge([
+            ('2000-01-03', '2000-01-03T12:00:00', 'https://odp/half.nc'),
+            ('1999-12-31', '2000-12-31', 'https://odp/year.nc')
+        ]))
+        self.assertEqual(['https://odp/year.nc',
+                          'https://odp/granule-0.nc',
+                          'https://odp/granule-1.nc',
+                          'https://odp/granule-2.nc',
+                          'https://odp/half.nc'],
+                         index.urls[:5])
+        self.assertEqual(pd.Timestamp('2000-12-31'), index.last_end)
+        self.assertEqual(['https://odp/year.nc'],
+                         [url for _, _, url in index.find('2000-06-01',
+                                                          '2000-06-02')])
+
+    def test_queried_windows(self):
+        index = GranuleIndex()
+        self.assertEqual([(pd.Timestamp('2000-01-01'),
+                           pd.Timestamp('2000-12-31'))],
+                         index.get_missing_windows('2000-01-01',
+                                                   '2000-12-31'))
+        index.add_queried_window('2000-03-01', '2000-03-31T23:59:59')
+        index.add_queried_window('2000-06-01', '2000-06-30T23:59:59')
+        self.assertEqual(
+            [(pd.Timestamp('2000-01-01'), pd.Timestamp('2000-02-29T23:59:59')),
+             (pd.Timestamp('2000-04-01'), pd.Timestamp('2000-05-31T23:59:59')),
+             (pd.Timestamp('2000-07-01'), pd.Timestamp('2000-12-31'))],
+            index.get_missing_windows('2000-01-01', '2000-12-31')
+        )
+        self.assertEqual([], index.get_missing_windows('2000-03-05',
+                                                       '2000-03-06'))
+        # adjacent windows are joined
+        index.add_queried_window('2000-04-01', '2000-05-31T23:59:59')
+        self.assertEqual(
+            [(pd.Timestamp('2000-03-01'), pd.Timestamp('2000-06-30T23:59:59'))],
+            index.queried_windows
+        )
+        index.add_queried_window('1999-01-01', '2001-01-01')
+        self.assertEqual([], index.get_missing_windows('2000-01-01',
+                                                       '2000-12-31'))
+        self.assertEqual(1, len(index.queried_windows))
+
+    def test_truncate_queried_windows(self):
+        index = GranuleIndex()
+        index.add_queried_window('2000-01-01', '2000-01-31')
+        index.add_queried_window('2000-03-01', '2000-03-31')
+        index.truncate_queried_windows('2000-01-15')
+        self.assertEqual([(pd.Timestamp('2000-01-01'),
+                           pd.Timestamp('2000-01-15'))],
+                         index.queried_windows)
+
+    def test_save_and_load(self):
+        granules = _daily_granules('2000-01-01', 10)
+        index = GranuleIndex(granules)
+        index.add_queried_window('2000-01-01', '2000-01-10T23:59:59')
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'granules', 'index.npz')
+            index.save(path)
+            self.assertEqual(['index.npz'],
+                             os.listdir(os.path.dirname(path)))
+            loaded_index = GranuleIndex.load(path)
+            GranuleIndex().save(path)
+            self.assertEqual(0, len(GranuleIndex.load(path)))
+            invalid_path = os.path.join(temp_dir, 'invalid.npz')
+            np.savez(invalid_path, starts=np.zeros(3))
+            with self.assertRaises(ValueError):
+                GranuleIndex.load(invalid_path)
+        self.assertEqual(granules, loaded_index.get_granules())
+        self.assertEqual(index.queried_windows, loaded_index.queried_windows)
+        self.assertEqual(0, loaded_index.merge(granules))
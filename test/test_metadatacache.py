@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from xcube_cci.metadatacache import MetadataCache
+
+
+class _Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class MetadataCacheTest(unittest.TestCase):
+
+    def test_fresh_stale_and_expired(self):
+        clock = _Clock()
+        cache = MetadataCache(None, ttl=10, stale_ttl=100, clock=clock)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', dict(x=1))
+        entry = cache.get('a')
+        self.assertEqual(dict(x=1), entry.value)
+        self.assertTrue(cache.is_fresh(entry))
+        clock.now += 50
+        entry = cache.get('a')
+        self.assertIsNotNone(entry)
+        self.assertFalse(cache.is_fresh(entry))
+        self.assertTrue(cache.is_fresh(cache.revalidate('a')))
+        clock.now += 111
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNone(cache.revalidate('b'))
+
+    def test_validation_headers(self):
+        cache = MetadataCache(None, ttl=10, stale_ttl=100)
+        self.assertEqual({}, cache.put('a', 'doc').get_validation_headers())
+        entry = cache.put('a', 'doc', etag='"v1"',
+                          last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+        self.assertEqual({'If-None-Match': '"v1"',
+                          'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+                         entry.get_validation_headers())
+
+    def test_shared_on_disk(self):
+        clock = _Clock()
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = MetadataCache(cache_dir, ttl=10, stale_ttl=100, clock=clock)
+            cache.put('https://odp/a', dict(shape=[np.int64(3)],
+                                            size=np.int64(3),
+                                            fill_value=np.float32(np.nan),
+                                            attrs=np.array([1, 2])),
+                      etag='"v1"')
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            other_cache = MetadataCache(cache_dir, ttl=10, stale_ttl=100,
+                                        clock=clock)
+            entry = other_cache.get('https://odp/a')
+            self.assertEqual('"v1"', entry.etag)
+            self.assertEqual([3], entry.value['shape'])
+            self.assertEqual([1, 2], entry.value['attrs'])
+            self.assertTrue(np.isnan(entry.value['fill_value']))
+            self.assertIsNone(other_cache.get('https://odp/b'))
+            with open(os.path.join(cache_dir, os.listdir(cache_dir)[0]),
+                      'w') as fp:
+                fp.write('{')
+            self.assertIsNone(MetadataCache(cache_dir, ttl=10, stale_ttl=100)
+                              .get('https://odp/a'))
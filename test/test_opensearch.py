@@ -0,0 +1,225 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from datetime import timedelta
+from typing import Optional
+
+from xcube_cci.opensearch import FeatureCollectionParser
+from xcube_cci.opensearch import FeatureDeduplicator
+from xcube_cci.opensearch import PageSizer
+from xcube_cci.opensearch import crawl_time_window
+from xcube_cci.opensearch import get_page_plan
+
+
+class PageSizerTest(unittest.TestCase):
+
+    def test_page_size_without_observations(self):
+        self.assertEqual(1000, PageSizer().get_page_size())
+
+    def test_page_size_from_response_time(self):
+        page_sizer = PageSizer(target_seconds=5.0)
+        page_sizer.observe(1000, 1.0, 1000)
+        self.assertEqual(5000, page_sizer.get_page_size())
+        page_sizer.observe(1000, 0.01, 1000)
+        self.assertEqual(7000, page_sizer.get_page_size())
+        page_sizer = PageSizer(target_seconds=5.0)
+        page_sizer.observe(1000, 0.001, 1000)
+        self.assertEqual(10000, page_sizer.get_page_size())
+        page_sizer = PageSizer(target_seconds=5.0)
+        page_sizer.observe(1000, 20.0, 1000)
+        self.assertEqual(1000, page_sizer.get_page_size())
+
+    def test_page_size_from_payload_size(self):
+        page_sizer = PageSizer(target_bytes=2_500_000)
+        page_sizer.observe(1000, 0.1, 1_000_000)
+        self.assertEqual(2000, page_sizer.get_page_size())
+        page_sizer.observe(0, 10.0, 100_000_000)
+        self.assertEqual(2000, page_sizer.get_page_size())
+
+
+class GetPagePlanTest(unittest.TestCase):
+
+    def test_get_page_plan(self):
+        self.assertEqual([(2, 1000), (3, 1000)],
+                         get_page_plan(2500, 1000, 1000))
+        self.assertEqual([(2, 1000), (3, 1000)],
+                         get_page_plan(2500, 1000, 5000))
+        self.assertEqual([(2, 1000), (3, 1000), (4, 1000),
+                          (2, 4000), (3, 4000)],
+                         get_page_plan(12000, 1000, 4000))
+        self.assertEqual([(2, 1000), (3, 1000), (4, 1000),
+                          (2, 4000), (3, 4000), (4, 4000)],
+                         get_page_plan(12001, 1000, 4000))
+        self.assertEqual([], get_page_plan(1000, 1000, 4000))
+
+    def test_get_page_plan_covers_records_once(self):
+        for total_results in (1001, 4999, 5000, 5001, 23456):
+            records = []
+            for start_page, page_size in get_page_plan(total_results,
+                                                       1000, 5000):
+                first = (start_page - 1) * page_size
+                records.extend(range(first,
+                                     min(first + page_size, total_results)))
+            self.assertEqual(list(range(1000, total_results)), records)
+
+    def test_get_page_plan_invalid_page_size(self):
+        with self.assertRaises(ValueError):
+            get_page_plan(2500, 1000, 1500)
+
+
+class _StandInIndex:
+    """Answers time window queries over a list of records, page by page."""
+
+    def __init__(self, records, failing_request: int = None):
+        self.records = records
+        self.failing_request = failing_request
+        self.complete = None
+        self.requests = []
+        self.features = []
+        self._deduplicator = FeatureDeduplicator()
+
+    async def fetch_page(self, start: datetime, end: datetime,
+                         start_page: int, maximum_records: int) \
+            -> Optional[int]:
+        self.requests.append((start, end, start_page, maximum_records))
+        if len(self.requests) - 1 == self.failing_request:
+            return None
+        await asyncio.sleep(0)
+        matches = [dict(id=record_id) for record_start, record_end, record_id
+                   in self.records
+                   if record_start is None
+                   or (record_start <= end and record_end >= start)]
+        first = (start_page - 1) * maximum_records
+        self.features.extend(self._deduplicator.filter(
+            matches[first:first + maximum_records]
+        ))
+        return len(matches)
+
+    def crawl(self, start: datetime, end: datetime, page_size: int):
+        total_results = asyncio.run(self.fetch_page(start, end, 1, page_size))
+        self.complete = True
+        if total_results > page_size:
+            self.complete = asyncio.run(crawl_time_window(self.fetch_page,
+                                                          start, end,
+                                                          total_results,
+                                                          page_size))
+        return sorted(feature['id'] for feature in self.features)
+
+
+def _records(start: datetime, num_records: int, step: timedelta,
+             duration: timedelta, first_id: int = 0):
+    return [(start + i * step, start + i * step + duration, first_id + i)
+            for i in range(num_records)]
+
+
+class CrawlTimeWindowTest(unittest.TestCase):
+
+    def test_crawl_is_complete_and_duplicate_free(self):
+        # a sparse year with a dense burst of overlapping records
+        records = _records(datetime(2000, 1, 1), 365, timedelta(days=1),
+                           timedelta(days=2)) \
+            + _records(datetime(2000, 6, 1), 5000, timedelta(minutes=1),
+                       timedelta(minutes=30), first_id=1000)
+        index = _StandInIndex(records)
+        ids = index.crawl(datetime(2000, 1, 1), datetime(2001, 1, 1), 500)
+        self.assertTrue(index.complete)
+        self.assertEqual(sorted(record[2] for record in records), ids)
+        for _, _, start_page, maximum_records in index.requests:
+            self.assertEqual(1, start_page)
+        # every leaf is read with a single page
+        self.assertLess(len(index.requests), 100)
+
+    def test_crawl_stops_at_failed_count(self):
+        records = _records(datetime(2000, 1, 1), 365, timedelta(days=1),
+                           timedelta(days=1))
+        index = _StandInIndex(records, failing_request=1)
+        index.crawl(datetime(2000, 1, 1), datetime(2001, 1, 1), 100)
+        self.assertFalse(index.complete)
+        # the part whose count failed is not taken for empty, nor crawled
+        failed_start, failed_end, _, _ = index.requests[1]
+        self.assertEqual([], [request for request in index.requests[2:]
+                              if failed_start <= request[0]
+                              and request[1] <= failed_end])
+
+    def test_crawl_records_without_time(self):
+        records = [(None, None, i) for i in range(1200)]
+        index = _StandInIndex(records)
+        ids = index.crawl(datetime(2000, 1, 1), datetime(2001, 1, 1), 500)
+        self.assertEqual(list(range(1200)), ids)
+        self.assertEqual(1 + 2 + 3, len(index.requests))
+
+    def test_crawl_records_at_one_time(self):
+        records = _records(datetime(2000, 1, 1), 1200, timedelta(0),
+                           timedelta(0))
+        index = _StandInIndex(records)
+        ids = index.crawl(datetime(2000, 1, 1), datetime(2000, 1, 1), 500)
+        self.assertEqual(list(range(1200)), ids)
+
+
+_FEATURE_COLLECTION = {
+    'type': 'FeatureCollection',
+    'totalResults': 12345,
+    'features': [
+        {
+            'type': 'Feature',
+            'id': f'feature-{i}',
+            'bbox': [0, 0, 1, 1],
+            'geometry': {'type': 'Polygon',
+                         'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]},
+            'properties': {
+                'title': f'ESACCI-SST-{i}-\u00e9.nc',
+                'date': '2000-01-01T00:00:00/2000-01-01T23:59:59',
+                'filesize': 1234,
+                'links': {'related': [{'title': 'Opendap',
+                                       'href': f'https://odp/{i}.nc'}]}
+            }
+        }
+        for i in range(3)
+    ],
+    'numberMatched': 3
+}
+
+
+def _parse(text: bytes, block_size: int) -> FeatureCollectionParser:
+    parser = FeatureCollectionParser()
+    for i in range(0, len(text), block_size):
+        parser.feed(text[i:i + block_size])
+    parser.finish()
+    return parser
+
+
+class FeatureCollectionParserTest(unittest.TestCase):
+
+    def test_parse(self):
+        text = json.dumps(_FEATURE_COLLECTION, indent=1).encode('utf-8')
+        for block_size in (1, 7, 100, len(text)):
+            parser = _parse(text, block_size)
+            self.assertEqual(12345, parser.total_results)
+            self.assertEqual(dict(type='FeatureCollection',
+                                  totalResults=12345, numberMatched=3),
+                             parser.members)
+            self.assertEqual(3, len(parser.features))
+            self.assertEqual(
+                dict(id='feature-2', bbox=[0, 0, 1, 1], properties=dict(
+                    title='ESACCI-SST-2-\u00e9.nc',
+                    date='2000-01-01T00:00:00/2000-01-01T23:59:59',
+                    links={'related': [{'title': 'Opendap',
+                                        'href': 'https://odp/2.nc'}]}
+                )),
+                parser.features[2]
+            )
+
+    def test_parse_empty_collection(self):
+        parser = _parse(b'{"features": [], "totalResults": 0}', 5)
+        self.assertEqual([], parser.features)
+        self.assertEqual(0, parser.total_results)
+
+    def test_parse_invalid_collection(self):
+        text = json.dumps(_FEATURE_COLLECTION).encode('utf-8')
+        with self.assertRaises(ValueError):
+            _parse(text[:-10], 100)
+        with self.assertRaises(ValueError):
+            _parse(b'[]', 100)
+        with self.assertRaises(ValueError):
+            _parse(text.replace(b'"features":', b'"features";'), 100)
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from xcube_cci.reactor import IoReactor
+
+
+async def _get_session_and_thread(session):
+    await asyncio.sleep(0.01)
+    return session, threading.current_thread()
+
+
+class IoReactorTest(unittest.TestCase):
+
+    def test_session_is_shared_across_threads(self):
+        reactor = IoReactor()
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(
+                    lambda _: reactor.run(_get_session_and_thread), range(32)
+                ))
+            sessions = {id(session) for session, _ in results}
+            threads = {thread for _, thread in results}
+            self.assertEqual(1, len(sessions))
+            self.assertEqual(1, len(threads))
+            self.assertNotEqual(threading.current_thread(), threads.pop())
+        finally:
+            reactor.close()
+
+    def test_close_tears_down_reactor(self):
+        reactor = IoReactor()
+        session, _ = reactor.run(_get_session_and_thread)
+        self.assertTrue(reactor.is_running)
+        reactor.close()
+        self.assertFalse(reactor.is_running)
+        self.assertTrue(session.closed)
+        with self.assertRaises(RuntimeError):
+            reactor.run(_get_session_and_thread)
+        # closing twice is fine
+        reactor.close()
+
+    def test_run_from_reactor_thread_raises(self):
+        reactor = IoReactor()
+
+        async def nested(session):
+            return reactor.run(_get_session_and_thread)
+
+        try:
+            with self.assertRaises(RuntimeError):
+                reactor.run(nested)
+        finally:
+            reactor.close()
+
+    def test_run_async_from_foreign_loop(self):
+        reactor = IoReactor()
+
+        async def await_on_own_loop():
+            results = await asyncio.gather(
+                *[reactor.run_async(_get_session_and_thread)
+                  for _ in range(8)]
+            )
+            return results, threading.current_thread()
+
+        try:
+            results, caller_thread = asyncio.run(await_on_own_loop())
+            self.assertEqual(1, len({id(session) for session, _ in results}))
+            reactor_thread = results[0][1]
+            self.assertNotEqual(caller_thread, reactor_thread)
+        finally:
+            reactor.close()
+
+    def test_close_from_reactor_thread(self):
+        reactor = IoReactor()
+        closed = threading.Event()
+
+        async def close_and_keep_running(session):
+            reactor.close()
+            closed.set()
+            await asyncio.sleep(10)
+
+        session, _ = reactor.run(_get_session_and_thread)
+        reactor.submit(close_and_keep_running)
+        self.assertTrue(closed.wait(1))
+        reactor._thread.join(timeout=2)
+        self.assertFalse(reactor.is_running)
+        self.assertTrue(session.closed)
+        self.assertTrue(reactor._loop.is_closed())
+        with self.assertRaises(RuntimeError):
+            reactor.run(_get_session_and_thread)
+
+    def test_close_unstarted_reactor(self):
+        reactor = IoReactor()
+        reactor.close()
+        self.assertFalse(reactor.is_running)
@@ -0,0 +1,103 @@
+import asyncio
+import time
+import unittest
+from email.utils import formatdate
+
+from xcube_cci.retry import HostRateLimiter
+from xcube_cci.retry import RetryBudget
+from xcube_cci.retry import TokenBucket
+from xcube_cci.retry import backoff
+from xcube_cci.retry import get_backoff_delay
+from xcube_cci.retry import parse_retry_after
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_get_backoff_delay(self):
+        for attempt in range(1, 10):
+            delay = get_backoff_delay(attempt, base_delay=1.0, max_delay=8.0)
+            self.assertTrue(0 <= delay <= min(8.0, 2 ** (attempt - 1)))
+
+    def test_backoff_does_not_block_loop(self):
+        async def run():
+            ticks = []
+
+            async def ticker():
+                for _ in range(5):
+                    ticks.append(time.monotonic())
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(backoff(1, base_delay=0.2, max_delay=0.2),
+                                 ticker())
+            return ticks
+
+        ticks = asyncio.run(run())
+        self.assertEqual(5, len(ticks))
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(3.0, parse_retry_after({'Retry-After': '3'}))
+        self.assertEqual(0.0, parse_retry_after({'Retry-After': '-1'}))
+
+    def test_http_date(self):
+        value = formatdate(time.time() + 60, usegmt=True)
+        delay = parse_retry_after({'Retry-After': value})
+        self.assertTrue(55 < delay <= 60)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after({}))
+        self.assertEqual(0.1, parse_retry_after({}, default=0.1))
+        self.assertEqual(0.1, parse_retry_after({'Retry-After': 'soon'},
+                                                default=0.1))
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(max_rate=10, capacity=3)
+        delays = [bucket.reserve() for _ in range(5)]
+        self.assertEqual([0, 0, 0], [round(d, 2) for d in delays[:3]])
+        self.assertAlmostEqual(0.1, delays[3], delta=0.02)
+        self.assertAlmostEqual(0.2, delays[4], delta=0.02)
+
+    def test_defer_and_recover(self):
+        bucket = TokenBucket(max_rate=10, capacity=1)
+        bucket.defer(0.5)
+        self.assertEqual(5.0, bucket.rate)
+        self.assertAlmostEqual(0.5, bucket.reserve(), delta=0.02)
+        for _ in range(100):
+            bucket.on_success()
+        self.assertEqual(10.0, bucket.rate)
+
+    def test_defer_with_burst_capacity(self):
+        bucket = TokenBucket(max_rate=100)
+        bucket.defer(1.0)
+        self.assertAlmostEqual(1.0, bucket.reserve(), delta=0.02)
+        # requests are resumed at the reduced rate, not in a burst
+        self.assertAlmostEqual(1.02, bucket.reserve(), delta=0.02)
+        bucket.defer(3.0)
+        self.assertAlmostEqual(3.0, bucket.reserve(), delta=0.02)
+
+    def test_host_rate_limiter(self):
+        limiter = HostRateLimiter(max_rate=10)
+        limiter.defer('https://a.org/x', 1.0)
+        self.assertIs(limiter.get_bucket('https://a.org/y'),
+                      limiter.get_bucket('https://a.org/x'))
+        self.assertEqual(5.0, limiter.get_bucket('https://a.org/z').rate)
+        self.assertEqual(10.0, limiter.get_bucket('https://b.org/z').rate)
+
+
+class RetryBudgetTest(unittest.TestCase):
+
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, min_retries_per_second=0.0,
+                             max_balance=2.0)
+        self.assertTrue(budget.try_withdraw())
+        self.assertTrue(budget.try_withdraw())
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertFalse(budget.try_withdraw())
+        budget.deposit()
+        self.assertTrue(budget.try_withdraw())
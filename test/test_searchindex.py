@@ -0,0 +1,94 @@
+import unittest
+
+from xcube_cci.searchindex import SearchIndex
+
+
+def _get_facets(name: str) -> dict:
+    ecv, frequency = name.split('.')
+    return dict(ecv=ecv, frequency=frequency)
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.set_names(['SST.day', 'SST.mon', 'OC.day', 'OC.mon'],
+                             _get_facets)
+        self.index.set_details('SST.day', dict(sensor='AVHRR'),
+                               ('1981-09-01', '2016-12-31'),
+                               (-180.0, -90.0, 180.0, 90.0))
+        self.index.set_details('SST.mon', dict(sensor='AVHRR'),
+                               ('1981-09-01', '2016-12-31'),
+                               (-180.0, -90.0, 180.0, 90.0))
+        self.index.set_details('OC.day', dict(sensor='MERIS'),
+                               ('2002-05-01', '2012-04-30'),
+                               (0.0, 40.0, 30.0, 60.0))
+
+    def test_find(self):
+        self.assertEqual(['SST.day', 'SST.mon', 'OC.day', 'OC.mon'],
+                         self.index.find({}))
+        self.assertEqual(['SST.day', 'OC.day'],
+                         self.index.find(dict(frequency='day')))
+        self.assertEqual(['OC.mon'],
+                         self.index.find(dict(ecv='OC', frequency='mon')))
+        self.assertEqual([], self.index.find(dict(ecv='LST')))
+        self.assertEqual([], self.index.find(dict(platform='Envisat')))
+
+    def test_filter(self):
+        names = self.index.find({})
+        self.assertEqual(['SST.day', 'SST.mon', 'OC.day'],
+                         self.index.filter(names, {}))
+        self.assertEqual(['OC.day'],
+                         self.index.filter(names, dict(sensor='MERIS')))
+        self.assertEqual(['SST.day', 'SST.mon'],
+                         self.index.filter(names, {}, start='2013-01-01'))
+        self.assertEqual(['SST.day', 'SST.mon'],
+                         self.index.filter(names, {}, end='2001-01-01'))
+        self.assertEqual(['SST.day', 'SST.mon', 'OC.day'],
+                         self.index.filter(names, {}, start='2010-01-01',
+                                           end='2010-12-31'))
+        self.assertEqual(['SST.day', 'SST.mon'],
+                         self.index.filter(names, {},
+                                           bbox=(-60.0, -30.0, -40.0, 0.0)))
+        self.assertEqual(['SST.day', 'OC.day'],
+                         self.index.filter(['SST.day', 'OC.day'], {},
+                                           bbox=(10.0, 50.0, 11.0, 51.0)))
+        # boxes touching each other intersect
+        self.assertEqual(['SST.day', 'OC.day'],
+                         self.index.filter(['SST.day', 'OC.day'], {},
+                                           bbox=(30.0, 60.0, 50.0, 70.0)))
+        self.assertEqual([],
+                         self.index.filter(['OC.day'], {},
+                                           bbox=(170.0, 50.0, -170.0, 60.0)))
+
+    def test_incremental_updates(self):
+        names = self.index.find({})
+        self.index.set_details('OC.mon', dict(sensor='MERIS'),
+                               ('2002-05-01', '2012-04-30'),
+                               (float('nan'), 40.0, 30.0, 60.0))
+        self.index.set_details('SST.mon', dict(sensor='ATSR'),
+                               ('1991-08-01', '2012-04-08'),
+                               (-180.0, -90.0, 180.0, 90.0))
+        self.assertEqual(['SST.mon'],
+                         self.index.filter(names, dict(sensor='ATSR')))
+        self.assertEqual(['SST.day', 'OC.day', 'OC.mon'],
+                         self.index.filter(names, {}, start='2013-01-01')
+                         + self.index.filter(names, dict(sensor='MERIS'),
+                                             start='2010-01-01'))
+        # comparisons with NaN coordinates never exclude a dataset
+        self.assertEqual(['SST.day', 'SST.mon', 'OC.mon'],
+                         self.index.filter(names, {},
+                                           bbox=(-60.0, 45.0, -40.0, 50.0)))
+        self.index.remove_details('SST.day')
+        self.assertFalse(self.index.has_details('SST.day'))
+        self.assertEqual(['SST.mon'],
+                         self.index.filter(names, {},
+                                           bbox=(-60.0, -30.0, -40.0, 0.0),
+                                           end='2000-01-01'))
+
+        self.index.set_names(['OC.day', 'LST.day'], _get_facets)
+        self.assertEqual(['OC.day', 'LST.day'],
+                         self.index.find(dict(frequency='day')))
+        self.assertEqual([], self.index.find(dict(ecv='SST')))
+        # details are kept for names which may come back
+        self.assertTrue(self.index.has_details('SST.mon'))
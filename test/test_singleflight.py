@@ -0,0 +1,84 @@
+import asyncio
+import unittest
+
+from xcube_cci.singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_calls_are_coalesced(self):
+        single_flight = SingleFlight()
+        num_fetches = 0
+
+        async def fetch(url):
+            nonlocal num_fetches
+            num_fetches += 1
+            await asyncio.sleep(0.05)
+            return url.upper()
+
+        async def run():
+            return await asyncio.gather(
+                *[single_flight.do(url, fetch, url)
+                  for url in ['a.dds', 'a.das'] * 8]
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(2, num_fetches)
+        self.assertEqual(['A.DDS', 'A.DAS'] * 8,
+                         [result for result, _ in results])
+        self.assertEqual(2, len([shared for _, shared in results
+                                 if not shared]))
+        self.assertEqual(dict(calls=16, saved=14), single_flight.get_stats())
+        self.assertEqual(0, single_flight.num_in_flight)
+
+    def test_finished_calls_are_not_reused(self):
+        single_flight = SingleFlight()
+        num_fetches = 0
+
+        async def fetch():
+            nonlocal num_fetches
+            num_fetches += 1
+            return num_fetches
+
+        async def run():
+            first, _ = await single_flight.do('key', fetch)
+            second, _ = await single_flight.do('key', fetch)
+            return first, second
+
+        self.assertEqual((1, 2), asyncio.run(run()))
+        self.assertEqual(0, single_flight.num_saved)
+
+    def test_exception_is_passed_to_all_waiters(self):
+        single_flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('no dds')
+
+        async def run():
+            return await asyncio.gather(
+                *[single_flight.do('key', fail) for _ in range(3)],
+                return_exceptions=True
+            )
+
+        results = asyncio.run(run())
+        self.assertEqual(3, len(results))
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+        self.assertEqual(2, single_flight.num_saved)
+
+    def test_cancelled_waiter_does_not_cancel_call(self):
+        single_flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return 42
+
+        async def run():
+            first = asyncio.ensure_future(single_flight.do('key', fetch))
+            second = asyncio.ensure_future(single_flight.do('key', fetch))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        self.assertEqual((42, True), asyncio.run(run()))
@@ -0,0 +1,53 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from xcube_cci.snapshot import CatalogueSnapshot
+
+
+class CatalogueSnapshotTest(unittest.TestCase):
+
+    def test_save_and_load(self):
+        data_sources = {
+            'esacci.A.day.L3.X.a.b.c.1.r1': dict(
+                uuid='abc',
+                bbox=[-180.0, -90.0, 180.0, 90.0],
+                temporal_coverage_start='2000-01-01T00:00:00',
+                dimensions=dict(time=np.int64(2), lat=180, lon=360),
+                variable_infos=dict(sst=dict(shape=[np.int64(2), 180, 360],
+                                             fill_value=np.float32(np.nan)))
+            )
+        }
+        snapshot = CatalogueSnapshot('https://odp/opensearch',
+                                     ['esacci.A.day.L3.X.a.b.c.1.r1',
+                                      'esacci.B.day.L3.X.a.b.c.1.r1'],
+                                     data_sources)
+        self.assertLess(snapshot.get_age(), 10)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'data', 'snapshot.json.gz')
+            snapshot.save(path)
+            self.assertEqual(['snapshot.json.gz'],
+                             os.listdir(os.path.dirname(path)))
+            loaded_snapshot = CatalogueSnapshot.load(path)
+            with gzip.open(path, 'wt') as fp:
+                fp.write('{"version": 0}')
+            with self.assertRaises(ValueError):
+                CatalogueSnapshot.load(path)
+            with open(path, 'w') as fp:
+                fp.write('no snapshot')
+            with self.assertRaises(ValueError):
+                CatalogueSnapshot.load(path)
+        self.assertEqual('https://odp/opensearch', loaded_snapshot.endpoint_url)
+        self.assertEqual(snapshot.drs_ids, loaded_snapshot.drs_ids)
+        self.assertEqual(snapshot.created, loaded_snapshot.created)
+        data_source = loaded_snapshot.data_sources[
+            'esacci.A.day.L3.X.a.b.c.1.r1'
+        ]
+        self.assertEqual('abc', data_source['uuid'])
+        self.assertEqual(dict(time=2, lat=180, lon=360),
+                         data_source['dimensions'])
+        self.assertEqual([2, 180, 360],
+                         data_source['variable_infos']['sst']['shape'])
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xcube_cci.dods import DatasetTemplate
+from xcube_cci.dods import VariableTemplate
+from xcube_cci.granuleindex import GranuleIndex
+from xcube_cci.state import OdpState
+
+
+class OdpStateTest(unittest.TestCase):
+
+    def test_save_and_load(self):
+        index_a = GranuleIndex([
+            ('2000-01-02', '2000-01-02T23:59:59', 'https://odp/a2.nc'),
+            ('2000-01-01', '2000-01-01T23:59:59', 'https://odp/a1.nc'),
+        ])
+        index_a.add_queried_window('1999-01-01', '2001-01-01')
+        index_b = GranuleIndex([
+            ('2010-01-01', '2010-01-31T23:59:59', 'https://odp/b1.nc'),
+        ])
+        template = DatasetTemplate('f00', dict(
+            sst=VariableTemplate('sst', (2, 180, 360),
+                                 (slice(0, 2, 1), slice(0, 180, 1),
+                                  slice(0, 360, 1)))
+        ))
+        state = OdpState('https://odp/opensearch',
+                         ['esacci.A', 'esacci.B'],
+                         dict(A=dict(uuid='abc',
+                                     dimensions=dict(time=np.int64(2)))),
+                         {'esacci.A': index_a, 'esacci.B': index_b,
+                          'esacci.C': GranuleIndex()},
+                         {'esacci.A': template},
+                         {'https://odp/a1.nc': dict(dds='Dataset {}')},
+                         created=1000.0)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'state.npz')
+            state.save(path)
+            loaded = OdpState.load(path)
+            with open(path, 'wb') as fp:
+                fp.write(b'no state')
+            with self.assertRaises(ValueError):
+                OdpState.load(path)
+        self.assertEqual('https://odp/opensearch', loaded.endpoint_url)
+        self.assertEqual(['esacci.A', 'esacci.B'], loaded.drs_ids)
+        self.assertEqual(dict(A=dict(uuid='abc', dimensions=dict(time=2))),
+                         loaded.data_sources)
+        self.assertEqual(1000.0, loaded.created)
+        self.assertEqual(['esacci.A', 'esacci.B', 'esacci.C'],
+                         list(loaded.granule_indexes.keys()))
+        self.assertEqual(index_a.get_granules(),
+                         loaded.granule_indexes['esacci.A'].get_granules())
+        self.assertEqual([(pd.Timestamp('1999-01-01'),
+                           pd.Timestamp('2001-01-01'))],
+                         loaded.granule_indexes['esacci.A'].queried_windows)
+        self.assertEqual(index_b.get_granules(),
+                         loaded.granule_indexes['esacci.B'].get_granules())
+        self.assertEqual(0, len(loaded.granule_indexes['esacci.C']))
+        loaded_template = loaded.dataset_templates['esacci.A']
+        self.assertEqual('f00', loaded_template.fingerprint)
+        self.assertEqual(template.get_variable('sst'),
+                         loaded_template.get_variable('sst'))
+        self.assertEqual({'https://odp/a1.nc': dict(dds='Dataset {}')},
+                         loaded.result_dicts)
+
+    def test_save_and_load_empty(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'state.npz')
+            OdpState('https://odp/opensearch', None, {}, {}, {}, {}).save(path)
+            loaded = OdpState.load(path)
+        self.assertIsNone(loaded.drs_ids)
+        self.assertEqual({}, loaded.granule_indexes)
@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from xcube_cci.timeaxis import TimeAxis
+from xcube_cci.timeaxis import get_month_timestamp
+
+
+def _as_strings(time_axis: TimeAxis):
+    return [(start.isoformat(), end.isoformat()) for start, end in time_axis]
+
+
+class TimeAxisTest(unittest.TestCase):
+
+    def test_regular_month(self):
+        time_axis = TimeAxis.regular(pd.to_datetime('2010-02-10', utc=True),
+                                     pd.to_datetime('2010-05-20', utc=True),
+                                     'mon')
+        self.assertEqual([('2010-02-01T00:00:00', '2010-03-01T00:00:00'),
+                          ('2010-03-01T00:00:00', '2010-04-01T00:00:00'),
+                          ('2010-04-01T00:00:00', '2010-05-01T00:00:00'),
+                          ('2010-05-01T00:00:00', '2010-06-01T00:00:00')],
+                         _as_strings(time_axis))
+
+    def test_regular_day_and_year(self):
+        time_axis = TimeAxis.regular('2002-07-04', '2002-07-06T23:59:59', 'day')
+        self.assertEqual([('2002-07-04T00:00:00', '2002-07-05T00:00:00'),
+                          ('2002-07-05T00:00:00', '2002-07-06T00:00:00'),
+                          ('2002-07-06T00:00:00', '2002-07-07T00:00:00')],
+                         _as_strings(time_axis))
+        time_axis = TimeAxis.regular('2000-05-01', '2001-12-31', 'year')
+        self.assertEqual([('2000-01-01T00:00:00', '2001-01-01T00:00:00'),
+                          ('2001-01-01T00:00:00', '2002-01-01T00:00:00')],
+                         _as_strings(time_axis))
+        with self.assertRaises(ValueError):
+            TimeAxis.regular('2000-01-01', '2001-01-01', '5-days')
+
+    def test_long_daily_axis(self):
+        time_axis = TimeAxis.regular('1980-01-01', '2019-12-31', 'day')
+        self.assertEqual(14610, len(time_axis))
+        self.assertEqual((pd.Timestamp('2019-12-31'),
+                          pd.Timestamp('2020-01-01')), time_axis[-1])
+        self.assertEqual(14609, time_axis.index(time_axis[-1]))
+
+    def test_from_ranges(self):
+        time_axis = TimeAxis.from_ranges([
+            (pd.Timestamp('2002-07-24T12:33:21'),
+             pd.Timestamp('2002-07-24T14:13:57')),
+            (pd.Timestamp('2002-07-24T14:13:57'),
+             pd.Timestamp('2002-07-24T15:54:33')),
+            (pd.Timestamp('2002-07-24T14:13:57'),
+             pd.Timestamp('2002-07-24T16:00:00'))
+        ])
+        self.assertEqual(3, len(time_axis))
+        self.assertEqual(np.dtype('datetime64[s]'), time_axis.starts.dtype)
+        self.assertEqual(2, time_axis.index(('2002-07-24T14:13:57',
+                                             '2002-07-24T16:00:00')))
+        with self.assertRaises(ValueError):
+            time_axis.index(('2002-07-24T14:13:57', '2002-07-24T17:00:00'))
+        self.assertEqual(0, len(TimeAxis.from_ranges([])))
+        self.assertFalse(TimeAxis.from_ranges([]))
+
+    def test_slicing_centers_and_bounds(self):
+        time_axis = TimeAxis.regular('2000-01-01', '2000-01-10', 'day')
+        sub_axis = time_axis[2:4]
+        self.assertEqual(TimeAxis.regular('2000-01-03', '2000-01-04', 'day'),
+                         sub_axis)
+        np.testing.assert_array_equal(
+            np.array(['2000-01-03T12:00:00', '2000-01-04T12:00:00'],
+                     dtype='datetime64[s]'),
+            sub_axis.centers)
+        self.assertEqual((2, 2), sub_axis.bounds.shape)
+        self.assertEqual(sub_axis.ends[0], sub_axis.bounds[0, 1])
+
+    def test_climatology(self):
+        time_axis = TimeAxis.climatology()
+        self.assertEqual(12, len(time_axis))
+        self.assertEqual((get_month_timestamp(3), get_month_timestamp(3)),
+                         time_axis[2])
+
+    def test_chunk_axis_and_selection(self):
+        time_axis = TimeAxis.regular('2000-01-01', '2000-01-05', 'day')
+        self.assertEqual([('2000-01-01T00:00:00', '2000-01-03T00:00:00'),
+                          ('2000-01-03T00:00:00', '2000-01-05T00:00:00')],
+                         _as_strings(time_axis.get_chunk_axis(2)))
+        self.assertEqual(time_axis, time_axis.get_chunk_axis(1))
+        selected = time_axis[np.array([True, False, False, True, True])]
+        self.assertEqual([('2000-01-01T00:00:00', '2000-01-02T00:00:00'),
+                          ('2000-01-04T00:00:00', '2000-01-05T00:00:00'),
+                          ('2000-01-05T00:00:00', '2000-01-06T00:00:00')],
+                         _as_strings(selected))
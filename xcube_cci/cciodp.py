@@ -21,25 +21,25 @@
 
 import aiohttp
 import asyncio
-import bisect
 import copy
 import json
 import logging
 import lxml.etree as etree
 import math
-import nest_asyncio
 import numpy as np
 import os
 import random
 import re
+import time
 import pandas as pd
 import pyproj
-import time
 import urllib.parse
 import warnings
+import weakref
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-from typing import List, Dict, Tuple, Optional, Union, Mapping
+from typing import Any, Awaitable, Callable, List, Dict, Tuple, Optional, Union, Mapping, \
+    Sequence
 from urllib.parse import quote
 
 from pydap.handlers.dap import BaseProxy
@@ -57,11 +57,43 @@ from pydap.parsers.das import parse_das, add_attributes
 from six.moves.urllib.parse import urlsplit, urlunsplit
 
 from xcube_cci.constants import CCI_ODD_URL
+from xcube_cci.constants import DEFAULT_CACHE_DIR
+from xcube_cci.constants import DEFAULT_METADATA_STALE_TTL
+from xcube_cci.constants import DEFAULT_METADATA_TTL
+from xcube_cci.constants import DEFAULT_NUM_ERROR_RETRIES
 from xcube_cci.constants import DEFAULT_NUM_RETRIES
 from xcube_cci.constants import DEFAULT_RETRY_BACKOFF_MAX
 from xcube_cci.constants import DEFAULT_RETRY_BACKOFF_BASE
 from xcube_cci.constants import OPENSEARCH_CEDA_URL
 from xcube_cci.constants import COMMON_COORD_VAR_NAMES
+from xcube_cci.constants import DEFAULT_REQUESTS_PER_SECOND
+from xcube_cci.dods import DatasetTemplate
+from xcube_cci.dods import DodsArrayDecoder
+from xcube_cci.dods import VariableTemplate
+from xcube_cci.dods import get_dds_fingerprint
+from xcube_cci.governor import TRAFFIC_DATA
+from xcube_cci.governor import TRAFFIC_METADATA
+from xcube_cci.governor import TRAFFIC_OPENSEARCH
+from xcube_cci.governor import get_governor
+from xcube_cci.granuleindex import GranuleIndex
+from xcube_cci.metadatacache import MetadataCache
+from xcube_cci.metadatacache import MetadataCacheEntry
+from xcube_cci.opensearch import FeatureCollectionParser
+from xcube_cci.opensearch import FeatureDeduplicator
+from xcube_cci.opensearch import PageSizer
+from xcube_cci.opensearch import crawl_time_window
+from xcube_cci.opensearch import get_page_plan
+from xcube_cci.reactor import IoReactor
+from xcube_cci.retry import HostRateLimiter
+from xcube_cci.retry import RetryBudget
+from xcube_cci.retry import backoff
+from xcube_cci.retry import parse_retry_after
+from xcube_cci.searchindex import SearchIndex
+from xcube_cci.singleflight import SingleFlight
+from xcube_cci.snapshot import CatalogueSnapshot
+from xcube_cci.snapshot import DEFAULT_SNAPSHOT_PATH
+from xcube_cci.state import OdpState
+from xcube_cci.timeaxis import get_month_timestamp
 from xcube_cci.timeutil import get_timestrings_from_string
 
 _LOG = logging.getLogger('xcube')
@@ -74,13 +106,26 @@ DESC_NS = {'gmd': 'http://www.isotc211.org/2005/gmd',
            'xlink': 'http://www.w3.org/1999/xlink'
            }
 
-_FEATURE_LIST_LOCK = asyncio.Lock()
-
 _TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 _EARLY_START_TIME = '1000-01-01T00:00:00'
 _LATE_END_TIME = '3000-12-31T23:59:59'
 
-nest_asyncio.apply()
+_PAGE_RETRY_BASE_DELAY = 2.0
+
+# search facets encoded in DRS ids and facets taken from dataset descriptions
+_DRS_SEARCH_FACETS = ('ecv', 'frequency', 'processing_level', 'data_type',
+                      'product_string', 'product_version')
+_DETAIL_SEARCH_FACETS = ('institute', 'sensor', 'platform')
+# the parameters of the OpenSearch service by search facet. Only facets
+# whose values are taken verbatim from DRS ids are passed to the service.
+# Others, such as frequencies, product versions and institutes, are
+# written differently there and are filtered locally only.
+_SEARCH_QUERY_PARAMS = dict(ecv='ecv',
+                            processing_level='processingLevel',
+                            data_type='dataType',
+                            product_string='productString',
+                            sensor='sensor',
+                            platform='platform')
 
 _RE_TO_DATETIME_FORMATS = \
     [(re.compile(14 * '\\d'), '%Y%m%d%H%M%S', relativedelta()),
@@ -119,10 +164,110 @@ def _convert_time_from_drs_id(time_value: str) -> str:
     return time_value
 
 
-async def _run_with_session_executor(async_function, *params, headers):
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=50),
-                                     headers=headers) as session:
-        return await async_function(session, *params)
+def _get_drs_facets(drs_id: str) -> Dict[str, str]:
+    values = drs_id.split('.')
+    if len(values) != 10:
+        return {}
+    _, ecv, frequency, processing_level, data_type, _, _, product_string, \
+        product_version, _ = values
+    return dict(ecv=ecv,
+                frequency=_convert_time_from_drs_id(frequency),
+                processing_level=processing_level,
+                data_type=data_type,
+                product_string=product_string,
+                product_version=product_version.replace('-', '.'))
+
+
+def _get_search_details(data_source: dict) \
+        -> Tuple[Dict[str, str], Optional[Tuple[datetime, datetime]],
+                 Optional[Tuple[float, float, float, float]]]:
+    facets = dict(institute=data_source.get('institute'),
+                  sensor=data_source.get('sensor_id'),
+                  platform=data_source.get('platform_id'))
+    try:
+        time_range = (
+            datetime.strptime(data_source['temporal_coverage_start'],
+                              _TIMESTAMP_FORMAT),
+            datetime.strptime(data_source['temporal_coverage_end'],
+                              _TIMESTAMP_FORMAT)
+        )
+    except (KeyError, TypeError, ValueError):
+        time_range = None
+    try:
+        bbox = (float(data_source['bbox_minx']),
+                float(data_source['bbox_miny']),
+                float(data_source['bbox_maxx']),
+                float(data_source['bbox_maxy']))
+    except (KeyError, TypeError, ValueError):
+        bbox = None
+    return facets, time_range, bbox
+
+
+def _get_search_query_args(start: Optional[datetime],
+                           end: Optional[datetime],
+                           bbox: Optional[Tuple[float, float, float, float]],
+                           cci_attrs: Mapping[str, str]) -> Dict[str, str]:
+    query_args = {_SEARCH_QUERY_PARAMS[attr]: value
+                  for attr, value in cci_attrs.items()
+                  if attr in _SEARCH_QUERY_PARAMS}
+    if start is not None:
+        query_args['startDate'] = start.strftime(_TIMESTAMP_FORMAT)
+    if end is not None:
+        query_args['endDate'] = end.strftime(_TIMESTAMP_FORMAT)
+    if bbox:
+        query_args['bbox'] = ','.join(str(float(value)) for value in bbox)
+    return query_args
+
+
+def _get_search_description_from_feature(feature: dict) -> dict:
+    # the temporal coverage and bounding box of a collection, as far as
+    # they are given with its feature
+    description = {}
+    date = feature.get('properties', {}).get('date')
+    if date and '/' in date:
+        try:
+            start, end = [pd.Timestamp(value).tz_localize(None)
+                          for value in date.split('/', 1)]
+            description.update(
+                temporal_coverage_start=start.strftime(_TIMESTAMP_FORMAT),
+                temporal_coverage_end=end.strftime(_TIMESTAMP_FORMAT)
+            )
+        except (TypeError, ValueError):
+            pass
+    bbox = feature.get('bbox')
+    if bbox and len(bbox) == 4:
+        description.update(zip(('bbox_minx', 'bbox_miny',
+                                'bbox_maxx', 'bbox_maxy'), bbox))
+    return description
+
+
+def _parse_request_time(time_value: Union[str, int, None], default: str) \
+        -> pd.Timestamp:
+    if isinstance(time_value, int) or \
+            isinstance(time_value, str) and time_value.isdigit():
+        # climatologies are requested by month numbers
+        month = int(time_value)
+        if 1 <= month <= 12:
+            return get_month_timestamp(month)
+    try:
+        return pd.Timestamp(datetime.strptime(time_value, _TIMESTAMP_FORMAT))
+    except (TypeError, ValueError):
+        return pd.Timestamp(default)
+
+
+def _join_windows(windows: List[Tuple[pd.Timestamp, pd.Timestamp]]) \
+        -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    # windows which overlap or touch each other are joined
+    one_second = pd.Timedelta(seconds=1)
+    joined_windows = []
+    for window_start, window_end in sorted(windows):
+        if joined_windows and \
+                window_start <= joined_windows[-1][1] + one_second:
+            joined_windows[-1] = (joined_windows[-1][0],
+                                  max(joined_windows[-1][1], window_end))
+        else:
+            joined_windows.append((window_start, window_end))
+    return joined_windows
 
 
 def _get_feature_dict_from_feature(feature: dict) -> Optional[dict]:
@@ -375,6 +520,114 @@ class CciOdpWarning(Warning):
     pass
 
 
+class _GranuleExtractor:
+    """
+    Extracts start time, end time and OPeNDAP URL from the OpenSearch
+    features of one dataset and appends them to a list of granules.
+
+    Times are collected per page and converted all at once. Features
+    without a date are dated by their titles, using the time format found
+    in the first title of the dataset.
+    """
+
+    def __init__(self):
+        self._title_pattern: Optional[Tuple[re.Pattern, str]] = None
+
+    def __call__(self, granules: List[Tuple], feature_list: List[Dict]):
+        date_urls, date_starts, date_ends = [], [], []
+        title_urls, title_starts, title_ends = [], [], []
+        for feature in feature_list:
+            properties = feature.get('properties', {})
+            opendap_url = None
+            links = properties.get('links', {}).get('related', {})
+            for link in links:
+                if link.get('title', '') == 'Opendap':
+                    opendap_url = link.get('href', None)
+            if not opendap_url:
+                continue
+            date_property = properties.get('date', None)
+            if date_property:
+                split_date = date_property.split('/')
+                date_urls.append(opendap_url)
+                date_starts.append(split_date[0])
+                date_ends.append(split_date[-1])
+                continue
+            title = properties.get('title', None)
+            if not title:
+                continue
+            title_times = self._match_title(title)
+            if title_times is not None:
+                title_urls.append(opendap_url)
+                title_starts.append(title_times[0])
+                title_ends.append(title_times[1])
+                continue
+            granule = self._get_granule_from_title(title, opendap_url)
+            if granule is not None:
+                granules.append(granule)
+        # only the first 19 characters are kept, which removes trailing
+        # fractions of seconds and time zones
+        self._append_granules(
+            granules, date_urls,
+            np.array(date_starts, dtype='U19'),
+            np.array(date_ends, dtype='U19'),
+            _TIMESTAMP_FORMAT
+        )
+        if self._title_pattern is not None:
+            self._append_granules(granules, title_urls, title_starts,
+                                  title_ends, self._title_pattern[1])
+
+    def _match_title(self, title: str) -> Optional[Tuple[str, str]]:
+        if self._title_pattern is None:
+            time_format, p1, p2, _ = find_datetime_format(title)
+            if time_format is None:
+                return None
+            regex = next(regex for regex, regex_time_format, _
+                         in _RE_TO_DATETIME_FORMATS
+                         if regex_time_format == time_format)
+            self._title_pattern = regex, time_format
+        regex = self._title_pattern[0]
+        start_match = regex.search(title)
+        if start_match is None:
+            return None
+        end_match = regex.search(title, start_match.end())
+        end_match = end_match if end_match is not None else start_match
+        return start_match.group(), end_match.group()
+
+    @staticmethod
+    def _get_granule_from_title(title: str, opendap_url: str) \
+            -> Optional[Tuple]:
+        start_time, end_time = get_timestrings_from_string(title)
+        if not start_time:
+            return None
+        if isinstance(start_time, int):
+            start_time = get_month_timestamp(start_time)
+        if isinstance(end_time, int):
+            end_time = get_month_timestamp(end_time)
+        try:
+            start_time = pd.Timestamp(start_time)
+            end_time = pd.Timestamp(end_time) if end_time else start_time
+        except ValueError:
+            return None
+        return start_time, end_time, opendap_url
+
+    @staticmethod
+    def _append_granules(granules: List[Tuple], urls: List[str],
+                         start_times: Sequence[str], end_times: Sequence[str],
+                         time_format: str):
+        if len(urls) == 0:
+            return
+        start_times = pd.to_datetime(start_times, format=time_format,
+                                     errors='coerce')
+        end_times = pd.to_datetime(end_times, format=time_format,
+                                   errors='coerce')
+        valid = ~(start_times.isna() | end_times.isna())
+        if not valid.all():
+            _LOG.debug(f'Dropping {np.count_nonzero(~valid)} granules '
+                       f'with invalid times')
+        granules.extend(zip(start_times[valid], end_times[valid],
+                            np.array(urls, dtype=object)[valid]))
+
+
 class CciOdp:
     """
     Represents the ESA CCI Open Data Portal
@@ -382,6 +635,27 @@ class CciOdp:
     :param endpoint_url: The base URL to the opensearch service
     :param endpoint_description_url: The URL to a document describing
     the capabilities of the opensearch service
+    :param opensearch_concurrency: The maximum number of concurrent
+    OpenSearch requests per host. Applies to the whole process.
+    :param metadata_concurrency: The maximum number of concurrent requests
+    for DDS, DAS and other metadata per host. Applies to the whole process.
+    :param data_concurrency: The maximum number of concurrent OPeNDAP data
+    requests per host. Applies to the whole process.
+    :param cache_dir: A local directory in which granule indexes and
+    metadata of datasets are kept across processes. Defaults to the
+    directory given by the environment variable XCUBE_CCI_CACHE_DIR or
+    to '~/.xcube-cci'. If empty or None, nothing is written to disk.
+    :param metadata_ttl: The number of seconds for which cached metadata
+    are used without revalidation. Afterwards, they are still used for a
+    while, but revalidated in the background.
+    :param snapshot_path: The path of a catalogue snapshot from which
+    dataset names and descriptions are taken, if they are not cached yet.
+    Defaults to the snapshot shipped with the package. If empty or None,
+    or if the snapshot has been taken from another OpenSearch service,
+    no snapshot is used.
+    :param state_path: The path of a state file written by
+    :meth:`save_state`. If the file exists, the state is loaded
+    on creation.
     """
 
     def __init__(self,
@@ -391,7 +665,16 @@ class CciOdp:
                  num_retries: int = DEFAULT_NUM_RETRIES,
                  retry_backoff_max: int = DEFAULT_RETRY_BACKOFF_MAX,
                  retry_backoff_base: float = DEFAULT_RETRY_BACKOFF_BASE,
-                 user_agent: str = None
+                 user_agent: str = None,
+                 num_error_retries: int = DEFAULT_NUM_ERROR_RETRIES,
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 opensearch_concurrency: Optional[int] = None,
+                 metadata_concurrency: Optional[int] = None,
+                 data_concurrency: Optional[int] = None,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 metadata_ttl: float = DEFAULT_METADATA_TTL,
+                 snapshot_path: Optional[str] = DEFAULT_SNAPSHOT_PATH,
+                 state_path: Optional[str] = None
                  ):
         self._opensearch_url = endpoint_url
         self._opensearch_description_url = endpoint_description_url
@@ -399,34 +682,96 @@ class CciOdp:
         self._num_retries = num_retries
         self._retry_backoff_max = retry_backoff_max
         self._retry_backoff_base = retry_backoff_base
+        self._num_error_retries = num_error_retries
+        self._rate_limiter = HostRateLimiter(requests_per_second)
+        self._retry_budgets = dict(connection=RetryBudget(),
+                                   server=RetryBudget())
         self._headers = {'User-Agent': user_agent} if user_agent else None
+        self._governor = get_governor()
+        self._governor.set_limits(**{
+            TRAFFIC_OPENSEARCH: opensearch_concurrency,
+            TRAFFIC_METADATA: metadata_concurrency,
+            TRAFFIC_DATA: data_concurrency
+        })
         self._drs_ids = None
         self._data_sources = {}
-        self._features = {}
+        self._cache_dir = cache_dir
+        self._granule_indexes: Dict[str, GranuleIndex] = {}
+        self._granule_extractors: Dict[str, _GranuleExtractor] = {}
+        self._metadata_cache = MetadataCache(
+            os.path.join(cache_dir, 'metadata') if cache_dir else None,
+            ttl=metadata_ttl,
+            stale_ttl=DEFAULT_METADATA_STALE_TTL
+        )
+        self._metadata_ttl = metadata_ttl
+        # keys of stale metadata being revalidated in the background
+        self._revalidation_tasks: Dict[str, asyncio.Future] = {}
+        # the snapshot is read on first use
+        self._snapshot_path = snapshot_path
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._snapshot_loaded = False
+        # the index follows dataset names and descriptions as they change
+        self._search_index = SearchIndex()
+        self._indexed_names: Optional[List[str]] = None
         self._result_dicts = {}
+        self._dataset_templates = {}
+        # identical requests in flight are made only once
+        self._opendap_flight = SingleFlight()
+        self._granule_index_locks: Dict[str, asyncio.Lock] = {}
+        # time windows of lookups waiting for the lock of their dataset
+        self._pending_feature_windows: Dict[
+            str, List[Tuple[pd.Timestamp, pd.Timestamp]]
+        ] = {}
+        self._feature_list_stats = dict(calls=0, saved=0)
+        self._page_sizer = PageSizer()
         eds_file = os.path.join(os.path.dirname(os.path.abspath(__file__)),
                                 'data/excluded_data_sources')
         with open(eds_file, 'r') as eds:
             self._excluded_data_sources = eds.read().split('\n')
+        # all requests of this instance are run on one long-lived event loop
+        # that shares a single pooled session
+        # the connection pool is not limited, the governor is
+        self._reactor = IoReactor(headers=self._headers, connection_limit=0)
+        self._finalizer = weakref.finalize(self, self._reactor.close)
+        if state_path and os.path.exists(state_path):
+            try:
+                self.load_state(state_path)
+            except ValueError as e:
+                _LOG.warning(f'Could not load state {state_path}: {e}')
 
     def close(self):
-        pass
+        self._finalizer()
 
     def _run_with_session(self, async_function, *params):
-        # See https://github.com/aio-libs/aiohttp/blob/master/docs/
-        # client_advanced.rst#graceful-shutdown
-        loop = asyncio.new_event_loop()
-        coro = _run_with_session_executor(async_function, *params, headers=self._headers)
-        result = loop.run_until_complete(coro)
-        # Short sleep to allow underlying connections to close
-        loop.run_until_complete(asyncio.sleep(.1))
-        loop.close()
-        return result
+        return self._reactor.run(async_function, *params)
+
+    async def _run_with_session_async(self, async_function, *params):
+        return await self._reactor.run_async(async_function, *params)
+
+    def get_concurrency_stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Get the limits, the number of active requests and the queue depth
+        per host and traffic class. Values refer to the whole process.
+        """
+        return self._governor.get_stats()
+
+    def get_coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the number of calls and the number of saved calls of the
+        requests for DDS and DAS documents, which are coalesced while in
+        flight, and of the feature list lookups, which run one at a time
+        per dataset.
+        """
+        return dict(opendap=self._opendap_flight.get_stats(),
+                    feature_list=dict(self._feature_list_stats))
 
     @property
     def dataset_names(self) -> List[str]:
         return self._run_with_session(self._fetch_dataset_names)
 
+    async def dataset_names_async(self) -> List[str]:
+        return await self._run_with_session_async(self._fetch_dataset_names)
+
     def get_dataset_info(self, dataset_id: str, dataset_metadata: dict = None) -> dict:
         data_info = {}
         if not dataset_metadata:
@@ -491,7 +836,17 @@ class CciOdp:
 
     def get_datasets_metadata(self, dataset_ids: List[str]) -> List[dict]:
         assert isinstance(dataset_ids, list)
-        self._run_with_session(self._ensure_all_info_in_data_sources, dataset_ids)
+        return self._run_with_session(self._get_datasets_metadata, dataset_ids)
+
+    async def get_datasets_metadata_async(self, dataset_ids: List[str]) \
+            -> List[dict]:
+        assert isinstance(dataset_ids, list)
+        return await self._run_with_session_async(self._get_datasets_metadata,
+                                                  dataset_ids)
+
+    async def _get_datasets_metadata(self, session, dataset_ids: List[str]) \
+            -> List[dict]:
+        await self._ensure_all_info_in_data_sources(session, dataset_ids)
         metadata = []
         for dataset_id in dataset_ids:
             metadata.append(self._data_sources[dataset_id])
@@ -500,15 +855,17 @@ class CciOdp:
     async def _fetch_dataset_names(self, session):
         if self._drs_ids:
             return self._drs_ids
-        meta_info_dict = \
-            await self._extract_metadata_from_odd_url(session, self._opensearch_description_url)
-        if 'drs_ids' in meta_info_dict:
-            self._drs_ids = meta_info_dict['drs_ids']
-            if '_all' in self._drs_ids:
-                self._drs_ids.remove('_all')
-            for excluded_data_source in self._excluded_data_sources:
-                if excluded_data_source in self._drs_ids:
-                    self._drs_ids.remove(excluded_data_source)
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            self._drs_ids = self._remove_excluded_data_sources(snapshot.drs_ids)
+            if snapshot.get_age() > self._metadata_ttl:
+                self._revalidate_in_background('drs_ids',
+                                               self._update_dataset_names,
+                                               session)
+            return self._drs_ids
+        drs_ids = await self._read_dataset_names_from_odd(session)
+        if drs_ids is not None:
+            self._drs_ids = drs_ids
             return self._drs_ids
         if not self._data_sources:
             self._data_sources = {}
@@ -524,7 +881,141 @@ class CciOdp:
                 await asyncio.gather(*tasks)
         return list(self._data_sources.keys())
 
-    async def _create_data_source(self, session, json_dict: dict, datasource_id: str):
+    async def _read_dataset_names_from_odd(self, session) -> Optional[List[str]]:
+        meta_info_dict = \
+            await self._extract_metadata_from_odd_url(session, self._opensearch_description_url)
+        if 'drs_ids' not in meta_info_dict:
+            return None
+        return self._remove_excluded_data_sources(meta_info_dict['drs_ids'])
+
+    async def _update_dataset_names(self, session):
+        drs_ids = await self._read_dataset_names_from_odd(session)
+        if drs_ids is not None:
+            self._drs_ids = drs_ids
+
+    def _remove_excluded_data_sources(self, drs_ids: List[str]) -> List[str]:
+        drs_ids = list(drs_ids)
+        if '_all' in drs_ids:
+            drs_ids.remove('_all')
+        for excluded_data_source in self._excluded_data_sources:
+            if excluded_data_source in drs_ids:
+                drs_ids.remove(excluded_data_source)
+        return drs_ids
+
+    def _get_snapshot(self) -> Optional[CatalogueSnapshot]:
+        if self._snapshot_loaded:
+            return self._snapshot
+        self._snapshot_loaded = True
+        if not self._snapshot_path or not os.path.exists(self._snapshot_path):
+            return None
+        try:
+            snapshot = CatalogueSnapshot.load(self._snapshot_path)
+        except ValueError as e:
+            _LOG.warning(f'Could not read catalogue snapshot '
+                         f'{self._snapshot_path}: {e}')
+            return None
+        # snapshots of other services do not apply
+        if snapshot.endpoint_url == self._opensearch_url:
+            self._snapshot = snapshot
+        return self._snapshot
+
+    def create_snapshot(self, dataset_names: List[str] = None) \
+            -> CatalogueSnapshot:
+        """
+        Take a snapshot of the catalogue. The datasets are described
+        concurrently. Datasets which cannot be described are listed,
+        but come without description.
+
+        :param dataset_names: The DRS ids of the datasets to include.
+            Defaults to all datasets.
+        """
+        return self._run_with_session(self._create_snapshot, dataset_names)
+
+    async def _create_snapshot(self, session,
+                               dataset_names: Optional[List[str]]) \
+            -> CatalogueSnapshot:
+        if dataset_names is None:
+            dataset_names = await self._read_dataset_names_from_odd(session)
+            if dataset_names is None:
+                raise ValueError('Could not read the names of the datasets')
+        results = await asyncio.gather(*[
+            self._ensure_all_info_in_data_sources(session, [dataset_name])
+            for dataset_name in dataset_names
+        ], return_exceptions=True)
+        data_sources = {}
+        for dataset_name, result in zip(dataset_names, results):
+            data_source = self._data_sources.get(dataset_name, {})
+            if isinstance(result, Exception) \
+                    or not data_source.get('variable_infos'):
+                _LOG.warning(f'Could not describe dataset {dataset_name}')
+                continue
+            data_sources[dataset_name] = data_source
+        return CatalogueSnapshot(self._opensearch_url, dataset_names,
+                                 data_sources)
+
+    def save_state(self, path: str):
+        """
+        Write what has been learned about the datasets so far, that is,
+        their descriptions, granule indexes, DDS and DAS and dataset
+        templates, to a file, from which :meth:`load_state` restores it.
+        """
+        self._run_with_session(self._get_state).save(path)
+
+    async def _get_state(self, session) -> OdpState:
+        # the state is collected on the event loop, so that it does not
+        # change meanwhile
+        return OdpState(self._opensearch_url,
+                        self._drs_ids,
+                        {drs_id: copy.deepcopy(data_source)
+                         for drs_id, data_source in self._data_sources.items()},
+                        {ds_id: GranuleIndex.from_arrays(**index.get_arrays())
+                         for ds_id, index in self._granule_indexes.items()},
+                        self._dataset_templates,
+                        {url: dict(res_dict)
+                         for url, res_dict in self._result_dicts.items()})
+
+    def load_state(self, path: str):
+        """
+        Restore a state written by :meth:`save_state`. What is already
+        known is kept. Dataset names and descriptions are only taken from
+        states not older than the metadata TTL. Granules added to a
+        dataset after the state has been saved are still found.
+
+        :raise ValueError: If the file is not a state file or if the state
+            has been built from another OpenSearch service
+        """
+        state = OdpState.load(path)
+        if state.endpoint_url != self._opensearch_url:
+            raise ValueError(f'state has been built from '
+                             f'{state.endpoint_url}, '
+                             f'not from {self._opensearch_url}')
+        self._run_with_session(self._apply_state, state)
+
+    async def _apply_state(self, session, state: OdpState):
+        if time.time() - state.created <= self._metadata_ttl:
+            if state.drs_ids is not None and not self._drs_ids:
+                self._drs_ids = state.drs_ids
+            for drs_id, data_source in state.data_sources.items():
+                if drs_id not in self._data_sources:
+                    self._data_sources[drs_id] = data_source
+                    self._index_data_source(drs_id)
+        for ds_id, index in state.granule_indexes.items():
+            if ds_id in self._granule_indexes:
+                continue
+            # as for indexes read from the cache, granules may have been
+            # added since the state has been saved
+            if index.last_end is not None:
+                index.truncate_queried_windows(index.last_end)
+            self._granule_indexes[ds_id] = index
+        for drs_id, template in state.dataset_templates.items():
+            self._dataset_templates.setdefault(drs_id, template)
+        for url, res_dict in state.result_dicts.items():
+            self._result_dicts.setdefault(url, res_dict)
+
+    async def _create_data_source(self, session, json_dict: dict, datasource_id: str,
+                                  data_sources: Optional[dict] = None):
+        if data_sources is None:
+            data_sources = self._data_sources
         meta_info = await self._fetch_meta_info(session,
                                                 datasource_id,
                                                 json_dict.get('odd_url', None),
@@ -548,7 +1039,9 @@ class CciOdp:
             drs_meta_info['cci_project'] = drs_meta_info['ecv']
             drs_meta_info['fid'] = datasource_id
             drs_meta_info['num_files'] = drs_meta_info['num_files'][drs_id]
-            self._data_sources[drs_id] = drs_meta_info
+            data_sources[drs_id] = drs_meta_info
+            if data_sources is self._data_sources:
+                self._index_data_source(drs_id)
 
     def _adjust_json_dict(self, json_dict: dict, drs_id: str):
         values = drs_id.split('.')
@@ -599,6 +1092,64 @@ class CciOdp:
         data_fid = await self._get_dataset_id(session, dataset_name)
         await self._set_variable_infos(self._opensearch_url, data_fid, dataset_name,
                                        session, data_source)
+        self._store_data_source(dataset_name, data_source)
+
+    def _get_data_source_key(self, dataset_name: str) -> str:
+        return f'data_source:{self._opensearch_url}:{dataset_name}'
+
+    def _load_data_source(self, session, dataset_name: str) -> bool:
+        key = self._get_data_source_key(dataset_name)
+        entry = self._metadata_cache.get(key)
+        if entry is not None:
+            data_source = entry.value
+            is_fresh = self._metadata_cache.is_fresh(entry)
+        else:
+            snapshot = self._get_snapshot()
+            if snapshot is None or dataset_name not in snapshot.data_sources:
+                return False
+            data_source = copy.deepcopy(snapshot.data_sources[dataset_name])
+            is_fresh = snapshot.get_age() <= self._metadata_ttl
+        self._data_sources[dataset_name] = data_source
+        self._index_data_source(dataset_name)
+        if not is_fresh:
+            self._revalidate_in_background(key, self._refresh_data_source,
+                                           session, dataset_name)
+        return True
+
+    def _store_data_source(self, dataset_name: str, data_source: dict):
+        # incomplete descriptions are not kept, they are completed
+        # on next access
+        if data_source.get('variable_infos'):
+            self._metadata_cache.put(self._get_data_source_key(dataset_name),
+                                     data_source)
+
+    def _index_data_source(self, dataset_name: str):
+        self._search_index.set_details(
+            dataset_name,
+            *_get_search_details(self._data_sources[dataset_name])
+        )
+
+    async def _refresh_data_source(self, session, dataset_name: str):
+        catalogue = {}
+        await self._update_catalogue_with_data_source_list(session, catalogue,
+                                                           dataset_name)
+        data_sources = {}
+        await asyncio.gather(*[
+            self._create_data_source(session, catalogue[catalogue_item],
+                                     catalogue_item, data_sources)
+            for catalogue_item in catalogue
+        ])
+        data_source = data_sources.get(dataset_name)
+        if data_source is None:
+            return
+        data_fid = data_source.get('uuid', data_source['fid'])
+        await self._set_variable_infos(self._opensearch_url, data_fid, dataset_name,
+                                       session, data_source)
+        if data_source.get('variable_infos'):
+            # the description in use is replaced as a whole
+            self._data_sources[dataset_name] = data_source
+            self._index_data_source(dataset_name)
+            self._store_data_source(dataset_name, data_source)
 
     @staticmethod
     def _get_data_var_and_coord_names(data_source) \
@@ -627,110 +1178,108 @@ class CciOdp:
                end_date: Optional[str] = None,
                bbox: Optional[Tuple[float, float, float, float]] = None,
                cci_attrs: Optional[Mapping[str, str]] = None) -> List[str]:
-        candidate_names = []
-        if not self._data_sources and 'ecv' not in cci_attrs \
-                and 'frequency' not in cci_attrs \
-                and 'processing_level' not in cci_attrs \
-                and 'data_type' not in cci_attrs \
-                and 'product_string' not in cci_attrs \
-                and 'product_version' not in cci_attrs:
-            self._run_with_session(self._read_all_data_sources)
-            candidate_names = self.dataset_names
-        else:
-            for dataset_name in self.dataset_names:
-                _, ecv, frequency, processing_level, data_type, sensor, \
-                platform, product_string, product_version, _ = \
-                    dataset_name.split('.')
-                if cci_attrs.get('ecv', ecv) != ecv:
-                    continue
-                if cci_attrs.get('processing_level', processing_level) \
-                        != processing_level:
-                    continue
-                if cci_attrs.get('data_type', data_type) != data_type:
-                    continue
-                if cci_attrs.get('product_string', product_string) != \
-                        product_string:
-                    continue
-                product_version = product_version.replace('-', '.')
-                if cci_attrs.get('product_version', product_version) \
-                        != product_version:
-                    continue
-                converted_time = _convert_time_from_drs_id(frequency)
-                if cci_attrs.get('frequency', converted_time) != converted_time:
-                    continue
-                candidate_names.append(dataset_name)
-            if len(candidate_names) == 0:
-                return []
+        return self._run_with_session(self._search, start_date, end_date,
+                                      bbox, cci_attrs or {})
+
+    async def _search(self, session,
+                      start_date: Optional[str],
+                      end_date: Optional[str],
+                      bbox: Optional[Tuple[float, float, float, float]],
+                      cci_attrs: Mapping[str, str]) -> List[str]:
+        # the search index is only used on the event loop, where the
+        # descriptions of datasets are changed
+        drs_facets = {facet: cci_attrs[facet]
+                      for facet in _DRS_SEARCH_FACETS if facet in cci_attrs}
+        detail_facets = {facet: cci_attrs[facet]
+                         for facet in _DETAIL_SEARCH_FACETS
+                         if facet in cci_attrs}
+        dataset_names = await self._fetch_dataset_names(session)
+        if dataset_names is not self._indexed_names:
+            self._search_index.set_names(dataset_names, _get_drs_facets)
+            self._indexed_names = dataset_names
+        candidate_names = self._search_index.find(drs_facets)
+        if not candidate_names:
+            return []
         if not start_date and not end_date and not bbox \
-                and 'institute' not in cci_attrs \
-                and 'sensor' not in cci_attrs \
-                and 'platform' not in cci_attrs:
+                and not detail_facets:
             return candidate_names
-        results = []
-        if start_date:
-            converted_start_date = self._get_datetime_from_string(start_date)
-        if end_date:
-            converted_end_date = self._get_datetime_from_string(end_date)
-        self._run_with_session(self._ensure_in_data_sources, candidate_names)
-        for candidate_name in candidate_names:
-            data_source_info = self._data_sources.get(candidate_name, None)
-            if not data_source_info:
-                continue
-            institute = cci_attrs.get('institute')
-            if institute is not None and \
-                    ('institute' not in data_source_info or
-                     institute != data_source_info['institute']):
-                continue
-            if cci_attrs.get('sensor', data_source_info['sensor_id']) \
-                    != data_source_info['sensor_id']:
-                continue
-            if cci_attrs.get('platform', data_source_info['platform_id']) \
-                    != data_source_info['platform_id']:
+        start = self._get_datetime_from_string(start_date) \
+            if start_date else None
+        end = self._get_datetime_from_string(end_date) if end_date else None
+        missing_names = [
+            candidate_name for candidate_name in candidate_names
+            if not self._search_index.has_details(candidate_name)
+            and candidate_name not in self._data_sources
+            and not self._load_data_source(session, candidate_name)
+        ]
+        if missing_names:
+            # the datasets which have not been described yet are looked up
+            # with one query. All filters are applied locally as well.
+            await self._read_search_details(
+                session,
+                _get_search_query_args(start, end, bbox, cci_attrs)
+            )
+            num_unmatched = sum(
+                not self._search_index.has_details(missing_name)
+                for missing_name in missing_names
+            )
+            if num_unmatched:
+                _LOG.debug(f'{num_unmatched} of {len(missing_names)} '
+                           f'datasets without description have not been '
+                           f'found by the search query')
+        return self._search_index.filter(candidate_names, detail_facets,
+                                         start=start, end=end,
+                                         bbox=bbox or None)
+
+    async def _read_search_details(self, session,
+                                   query_args: Dict[str, str]):
+        def _extender(collections: dict, feature_list: List[Dict]):
+            for feature in feature_list:
+                fid = feature.get('properties', {}).get('identifier')
+                if fid:
+                    collections[fid] = feature
+
+        collections = {}
+        await self._fetch_opensearch_feature_list(
+            session, self._opensearch_url, collections, _extender,
+            dict(parentIdentifier='cci', **query_args)
+        )
+        # all DRS ids of a dataset are described at once, so datasets
+        # with a known description need not be read again
+        known_fids = {data_source.get('fid')
+                      for data_source in self._data_sources.values()}
+        await asyncio.gather(*[
+            self._index_collection(session, fid, feature)
+            for fid, feature in collections.items()
+            if fid not in known_fids
+        ])
+
+    async def _index_collection(self, session, fid: str, feature: dict):
+        # The search details are taken from the feature of the collection.
+        # Only its DRS ids and institute are read from its description
+        # document, which is cached. Datasets are fully described when
+        # they are opened.
+        odd_url = _get_feature_dict_from_feature(feature).get('odd_url')
+        meta_info = await self._extract_metadata_from_odd_url(session,
+                                                              odd_url)
+        description = _get_search_description_from_feature(feature)
+        description.update(fid=fid, institute=meta_info.get('institute'))
+        for drs_id in self._get_as_list(meta_info, 'drs_id', 'drs_ids'):
+            if drs_id in self._data_sources \
+                    or drs_id in self._excluded_data_sources \
+                    or len(drs_id.split('.')) != 10:
                 continue
-            if bbox:
-                if float(data_source_info.get('bbox_minx', np.inf)) > bbox[2]:
-                    continue
-                if float(data_source_info.get('bbox_maxx', np.NINF)) < bbox[0]:
-                    continue
-                if float(data_source_info.get('bbox_miny', np.inf)) > bbox[3]:
-                    continue
-                if float(data_source_info.get('bbox_maxy', np.NINF)) < bbox[1]:
-                    continue
-            if start_date:
-                data_source_end = datetime.strptime(
-                    data_source_info['temporal_coverage_end'],
-                    _TIMESTAMP_FORMAT
-                )
-                # noinspection PyUnboundLocalVariable
-                if converted_start_date > data_source_end:
-                    continue
-            if end_date:
-                data_source_start = datetime.strptime(
-                    data_source_info['temporal_coverage_start'],
-                    _TIMESTAMP_FORMAT
-                )
-                # noinspection PyUnboundLocalVariable
-                if converted_end_date < data_source_start:
-                    continue
-            results.append(candidate_name)
-        return results
-
-    async def _read_all_data_sources(self, session):
-        catalogue = await self._fetch_data_source_list_json(session,
-                                                            self._opensearch_url,
-                                                            dict(parentIdentifier='cci'))
-        if catalogue:
-            tasks = []
-            for catalogue_item in catalogue:
-                tasks.append(self._create_data_source(session,
-                                                      catalogue[catalogue_item],
-                                                      catalogue_item))
-            await asyncio.gather(*tasks)
+            data_source = dict(description)
+            self._adjust_json_dict(data_source, drs_id)
+            self._search_index.set_details(
+                drs_id, *_get_search_details(data_source)
+            )
 
     async def _ensure_in_data_sources(self, session, dataset_names: List[str]):
         dataset_names_to_check = []
         for dataset_name in dataset_names:
-            if dataset_name not in self._data_sources:
+            if dataset_name not in self._data_sources \
+                    and not self._load_data_source(session, dataset_name):
                 dataset_names_to_check.append(dataset_name)
         if len(dataset_names_to_check) == 0:
             return
@@ -775,6 +1324,16 @@ class CciOdp:
                                                 end_time)
         return dimension_data
 
+    async def get_variable_data_async(self, dataset_name: str,
+                                      variable_dict: Dict[str, int],
+                                      start_time: str = '1900-01-01T00:00:00',
+                                      end_time: str = '3001-12-31T00:00:00'):
+        return await self._run_with_session_async(self._get_var_data,
+                                                  dataset_name,
+                                                  variable_dict,
+                                                  start_time,
+                                                  end_time)
+
     async def _get_var_data(self,
                             session,
                             dataset_name: str,
@@ -821,124 +1380,136 @@ class CciOdp:
 
     async def _get_feature_list(self, session, request):
         ds_id = request['drsId']
-        start_date_str = request['startDate']
-        try:
-            start_date = datetime.strptime(start_date_str, _TIMESTAMP_FORMAT)
-        except:
-            start_date = int(start_date_str)
-        end_date_str = request['endDate']
-        try:
-            end_date = datetime.strptime(end_date_str, _TIMESTAMP_FORMAT)
-        except:
-            end_date = int(end_date_str)
+        start_date = _parse_request_time(request.get('startDate'),
+                                         _EARLY_START_TIME)
+        end_date = _parse_request_time(request.get('endDate'),
+                                       _LATE_END_TIME)
+        index = self._granule_indexes.get(ds_id)
+        if index is None or index.get_missing_windows(start_date, end_date):
+            # only one lookup per dataset runs at a time, later lookups
+            # wait for it and find its results in the index
+            self._feature_list_stats['calls'] += 1
+            # lookups made together, such as the ones of concurrent chunk
+            # reads, are answered by one crawl covering all their windows
+            self._pending_feature_windows.setdefault(ds_id, []) \
+                .append((start_date, end_date))
+            await asyncio.sleep(0)
+            async with self._get_granule_index_lock(ds_id):
+                index = await self._update_granule_index(session, request,
+                                                         start_date, end_date)
+        return index.find(start_date, end_date)
+
+    def _get_granule_index_lock(self, ds_id: str) -> asyncio.Lock:
+        lock = self._granule_index_locks.get(ds_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._granule_index_locks[ds_id] = lock
+        return lock
+
+    async def _update_granule_index(self, session, request: Dict,
+                                    start_date: pd.Timestamp,
+                                    end_date: pd.Timestamp) -> GranuleIndex:
+        # must be called holding the lock of the dataset
+        ds_id = request['drsId']
+        index = self._granule_indexes.get(ds_id)
+        if index is None:
+            index = self._load_granule_index(ds_id)
+            self._granule_indexes[ds_id] = index
+        windows = self._pending_feature_windows.pop(ds_id, [])
+        windows.append((start_date, end_date))
+        missing_windows = _join_windows([
+            missing_window
+            for window_start, window_end in windows
+            for missing_window in index.get_missing_windows(window_start,
+                                                            window_end)
+        ])
+        if not missing_windows:
+            self._feature_list_stats['saved'] += 1
+            return index
+        # only time windows which have not been queried before are looked up
+        complete = True
+        for window_start, window_end in missing_windows:
+            complete &= await self._fetch_feature_window(session, request,
+                                                         window_start,
+                                                         window_end)
+        if complete and len(index) == 0 and \
+                index.get_missing_windows(_EARLY_START_TIME, _LATE_END_TIME):
+            # try without dates. For some data sets, this works better
+            await self._fetch_feature_window(session, request, None, None)
+        # the index is written once per lookup, off the event loop. Other
+        # lookups of the dataset wait for the lock, so it does not change
+        # meanwhile.
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._save_granule_index, ds_id, index
+        )
+        return index
+
+    async def _fetch_feature_window(self, session, request: Dict,
+                                    window_start: Optional[pd.Timestamp],
+                                    window_end: Optional[pd.Timestamp]) \
+            -> bool:
+        window_request = dict(request)
+        window_request.pop('startDate', None)
+        window_request.pop('endDate', None)
+        if window_start is not None:
+            window_request['startDate'] = \
+                window_start.strftime(_TIMESTAMP_FORMAT)
+            window_request['endDate'] = window_end.strftime(_TIMESTAMP_FORMAT)
+        ds_id = request['drsId']
+        extractor = self._granule_extractors.get(ds_id)
+        if extractor is None:
+            extractor = _GranuleExtractor()
+            self._granule_extractors[ds_id] = extractor
         feature_list = []
-        if ds_id not in self._features or len(self._features[ds_id]) == 0:
-            self._features[ds_id] = []
-            await self._fetch_opensearch_feature_list(
-                session, self._opensearch_url, feature_list,
-                self._extract_times_and_opendap_url, request
-            )
-            if len(feature_list) == 0:
-                # try without dates. For some data sets, this works better
-                if 'startDate' in request:
-                    request.pop('startDate')
-                if 'endDate' in request:
-                    request.pop('endDate')
-                await self._fetch_opensearch_feature_list(session,
-                                                          self._opensearch_url,
-                                                          feature_list,
-                                                          self._extract_times_and_opendap_url,
-                                                          request)
-            feature_list.sort(key=lambda x: x[0])
-            self._features[ds_id] = feature_list
+        complete = await self._fetch_opensearch_feature_list(
+            session, self._opensearch_url, feature_list, extractor,
+            window_request
+        )
+        index = self._granule_indexes[ds_id]
+        index.merge(feature_list)
+        if not complete:
+            # the granules found are kept, but the window is looked up
+            # again next time
+            _LOG.warning(f'Could not read all granules of {ds_id} between '
+                         f'{window_request.get("startDate")} and '
+                         f'{window_request.get("endDate")}')
+            return False
+        if window_start is None:
+            index.add_queried_window(_EARLY_START_TIME, _LATE_END_TIME)
         else:
-            if start_date < self._features[ds_id][0][0]:
-                request['endDate'] = datetime.strftime(self._features[ds_id][0][0],
-                                                       _TIMESTAMP_FORMAT)
-                await self._fetch_opensearch_feature_list(session,
-                                                          self._opensearch_url,
-                                                          feature_list,
-                                                          self._extract_times_and_opendap_url,
-                                                          request)
-                if len(feature_list) > 0:
-                    feature_list.sort(key=lambda x: x[0])
-                    end_offset = -1
-                    while feature_list[end_offset] in self._features[ds_id] \
-                            and end_offset > 0:
-                        end_offset -= 1
-                    self._features[ds_id] = feature_list[:end_offset] \
-                                            + self._features[ds_id]
-            if end_date > self._features[ds_id][-1][1]:
-                request['startDate'] = datetime.strftime(self._features[ds_id][-1][1],
-                                                         _TIMESTAMP_FORMAT)
-                request['endDate'] = end_date_str
-                await self._fetch_opensearch_feature_list(session,
-                                                          self._opensearch_url,
-                                                          feature_list,
-                                                          self._extract_times_and_opendap_url,
-                                                          request)
-                if len(feature_list) > 0:
-                    feature_list.sort(key=lambda x: x[0])
-                    end_offset = 0
-                    while feature_list[end_offset] in self._features[ds_id] \
-                            and end_offset < len(feature_list) - 1:
-                        end_offset += 1
-                    if feature_list[end_offset] not in self._features[ds_id]:
-                        self._features[ds_id] = self._features[ds_id] \
-                                                + feature_list[end_offset:]
-        start = bisect.bisect_left([feature[1] for feature in self._features[ds_id]], start_date)
-        end = bisect.bisect_right([feature[0] for feature in self._features[ds_id]], end_date)
-        return self._features[ds_id][start:end]
+            index.add_queried_window(window_start, window_end)
+        return True
 
-    @staticmethod
-    def _extract_times_and_opendap_url(features: List[Tuple], feature_list: List[Dict]):
-        for feature in feature_list:
-            start_time = None
-            end_time = None
-            properties = feature.get('properties', {})
-            opendap_url = None
-            links = properties.get('links', {}).get('related', {})
-            for link in links:
-                if link.get('title', '') == 'Opendap':
-                    opendap_url = link.get('href', None)
-            if not opendap_url:
-                continue
-            date_property = properties.get('date', None)
-            if date_property:
-                split_date = date_property.split('/')
-                # remove trailing symbols from times
-                start_time = datetime.strptime(split_date[0].split('.')[0].split('+')[0],
-                                               _TIMESTAMP_FORMAT)
-                end_time = datetime.strptime(split_date[1].split('.')[0].split('+')[0],
-                                             _TIMESTAMP_FORMAT)
-            else:
-                title = properties.get('title', None)
-                if title:
-                    start_time, end_time = get_timestrings_from_string(title)
-                    if start_time:
-                        try:
-                            start_time = datetime.strptime(start_time, _TIMESTAMP_FORMAT)
-                        except TypeError:
-                            # just use the previous start value
-                            pass
-                    if end_time:
-                        try:
-                            end_time = datetime.strptime(end_time, _TIMESTAMP_FORMAT)
-                        except TypeError:
-                            # just use the previous end value
-                            pass
-                    else:
-                        end_time = start_time
-            if start_time:
-                try:
-                    start_time = pd.Timestamp(datetime.strftime(start_time,
-                                                            _TIMESTAMP_FORMAT))
-                    end_time = pd.Timestamp(datetime.strftime(end_time,
-                                                              _TIMESTAMP_FORMAT))
-                except:
-                    # just use the previous values
-                    pass
-                features.append((start_time, end_time, opendap_url))
+    def _get_granule_index_path(self, ds_id: str) -> Optional[str]:
+        if not self._cache_dir:
+            return None
+        return os.path.join(self._cache_dir, 'granules', f'{ds_id}.npz')
+
+    def _load_granule_index(self, ds_id: str) -> GranuleIndex:
+        path = self._get_granule_index_path(ds_id)
+        if path is None or not os.path.exists(path):
+            return GranuleIndex()
+        try:
+            index = GranuleIndex.load(path)
+        except (OSError, ValueError) as e:
+            _LOG.warning(f'Could not read granule index of {ds_id} '
+                         f'from {path}: {e}')
+            return GranuleIndex()
+        # granules may have been added to the dataset since the index has
+        # been saved, so these are looked up again
+        if index.last_end is not None:
+            index.truncate_queried_windows(index.last_end)
+        return index
+
+    def _save_granule_index(self, ds_id: str, index: GranuleIndex):
+        path = self._get_granule_index_path(ds_id)
+        if path is None:
+            return
+        try:
+            index.save(path)
+        except OSError as e:
+            _LOG.warning(f'Could not write granule index of {ds_id} '
+                         f'to {path}: {e}')
 
     def get_time_ranges_from_data(self, dataset_name: str,
                                   start_time: str = _EARLY_START_TIME,
@@ -949,6 +1520,15 @@ class CciOdp:
                                       start_time,
                                       end_time)
 
+    async def get_time_ranges_from_data_async(
+            self, dataset_name: str,
+            start_time: str = _EARLY_START_TIME,
+            end_time: str = _LATE_END_TIME
+    ) -> List[Tuple[datetime, datetime]]:
+        return await self._run_with_session_async(
+            self._get_time_ranges_from_data, dataset_name, start_time, end_time
+        )
+
     async def _get_time_ranges_from_data(self, session, dataset_name: str, start_time: str,
                                          end_time: str) -> List[Tuple[datetime, datetime]]:
         dataset_id = await self._get_dataset_id(session, dataset_name)
@@ -972,32 +1552,176 @@ class CciOdp:
 
     async def _get_opendap_url(self, session, request: Dict):
         request['fileFormat'] = '.nc'
-        # async with _FEATURE_LIST_LOCK:
         feature_list = await self._get_feature_list(session, request)
         if len(feature_list) == 0:
             return
         return feature_list[0][2]
 
+    def get_opendap_urls(self, dataset_name: str,
+                         time_ranges: List[Tuple[str, str]]) \
+            -> List[Optional[str]]:
+        """
+        Get the OPeNDAP URLs of the granules to be read for the given time
+        ranges. All URLs are determined from one feature list lookup.
+
+        :param dataset_name: The DRS id of the dataset
+        :param time_ranges: A list of pairs of start and end time,
+            given as strings in the format '%Y-%m-%dT%H:%M:%S'
+        :return: For each time range, the URL of the first granule
+            overlapping it, or None, if there is no such granule
+        """
+        return self._run_with_session(self._get_opendap_urls,
+                                      dataset_name,
+                                      time_ranges)
+
+    async def _get_opendap_urls(self, session, dataset_name: str,
+                                time_ranges: List[Tuple[str, str]]) \
+            -> List[Optional[str]]:
+        if len(time_ranges) == 0:
+            return []
+        dataset_id = await self._get_dataset_id(session, dataset_name)
+        request = dict(parentIdentifier=dataset_id,
+                       startDate=time_ranges[0][0],
+                       endDate=time_ranges[-1][1],
+                       drsId=dataset_name,
+                       fileFormat='.nc')
+        await self._get_feature_list(session, request)
+        index = self._granule_indexes.get(dataset_name)
+        if index is None:
+            return [None] * len(time_ranges)
+        return index.find_first_urls(
+            [start_time for start_time, _ in time_ranges],
+            [end_time for _, end_time in time_ranges]
+        )
+
+    def get_time_availability(self, dataset_name: str,
+                              starts: np.ndarray,
+                              ends: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Tell for each of the given time ranges whether the dataset
+        has a granule overlapping it.
+
+        :param dataset_name: The DRS id of the dataset
+        :param starts: The start times of the time ranges
+        :param ends: The end times of the time ranges, inclusive
+        :return: A boolean array, or None, if it is not known which
+            granules exist for all of the time ranges
+        """
+        return self._run_with_session(self._get_time_availability,
+                                      dataset_name,
+                                      starts,
+                                      ends)
+
+    async def _get_time_availability(self, session, dataset_name: str,
+                                     starts: np.ndarray,
+                                     ends: np.ndarray) \
+            -> Optional[np.ndarray]:
+        if len(starts) == 0:
+            return np.zeros(0, dtype=bool)
+        start_date = pd.Timestamp(np.min(starts))
+        end_date = pd.Timestamp(np.max(ends))
+        dataset_id = await self._get_dataset_id(session, dataset_name)
+        request = dict(parentIdentifier=dataset_id,
+                       startDate=start_date.strftime(_TIMESTAMP_FORMAT),
+                       endDate=end_date.strftime(_TIMESTAMP_FORMAT),
+                       drsId=dataset_name,
+                       fileFormat='.nc')
+        await self._get_feature_list(session, request)
+        index = self._granule_indexes.get(dataset_name)
+        if index is None or index.get_missing_windows(start_date, end_date):
+            return None
+        return index.covers(starts, ends)
+
+    def get_dataset_template(self, dataset_name: str, opendap_url: str) \
+            -> Optional[DatasetTemplate]:
+        """
+        Get the structural template of a dataset, as found in the
+        given granule.
+        """
+        return self._run_with_session(self._get_dataset_template,
+                                      dataset_name,
+                                      opendap_url)
+
+    def fetch_data_chunks(self,
+                          requests: List[Tuple[str, VariableTemplate,
+                                               Tuple, Optional[str]]]) \
+            -> List[Optional[bytes]]:
+        """
+        Fetch data chunks directly from known granules. Each chunk costs
+        exactly one data request, no metadata is looked up.
+
+        :param requests: A list of tuples of the OPeNDAP URL of the granule,
+            the template of the variable, the dimension indexes and
+            the data type of the result
+        :return: The data of the chunks in the order of the requests.
+            Entries are None for chunks that could not be fetched.
+        """
+        return self._run_with_session(self._fetch_data_chunks, requests)
+
+    async def _fetch_data_chunks(self, session,
+                                 requests: List[Tuple[str, VariableTemplate,
+                                                      Tuple, Optional[str]]]) \
+            -> List[Optional[bytes]]:
+        tasks = []
+        for opendap_url, variable, dim_indexes, data_type in requests:
+            base_url, _ = self._strip_projection(opendap_url)
+            tasks.append(self._get_chunk_data(session, base_url, variable,
+                                              dim_indexes, data_type))
+        return list(await asyncio.gather(*tasks))
+
     def get_data_chunk(self, request: Dict, dim_indexes: Tuple) -> Optional[bytes]:
         data_chunk = self._run_with_session(self._get_data_chunk, request, dim_indexes)
         return data_chunk
 
+    async def get_data_chunk_async(self, request: Dict, dim_indexes: Tuple) \
+            -> Optional[bytes]:
+        return await self._run_with_session_async(self._get_data_chunk,
+                                                  request,
+                                                  dim_indexes)
+
+    def get_data_chunks(self, requests: List[Tuple[Dict, Tuple]]) \
+            -> List[Optional[bytes]]:
+        """
+        Fetch several data chunks concurrently within one session.
+
+        :param requests: A list of pairs of a request dictionary and the
+            dimension indexes, as expected by :meth:`get_data_chunk`
+        :return: The data of the chunks in the order of the requests.
+            Entries are None for chunks that could not be fetched.
+        """
+        return self._run_with_session(self._get_data_chunks, requests)
+
+    async def get_data_chunks_async(self, requests: List[Tuple[Dict, Tuple]]) \
+            -> List[Optional[bytes]]:
+        return await self._run_with_session_async(self._get_data_chunks,
+                                                  requests)
+
+    async def _get_data_chunks(self, session,
+                               requests: List[Tuple[Dict, Tuple]]) \
+            -> List[Optional[bytes]]:
+        tasks = [self._get_data_chunk(session, request, dim_indexes)
+                 for request, dim_indexes in requests]
+        return list(await asyncio.gather(*tasks))
+
     async def _get_data_chunk(self, session, request: Dict, dim_indexes: Tuple) -> Optional[bytes]:
         var_name = request['varNames'][0]
         opendap_url = await self._get_opendap_url(session, request)
         if not opendap_url:
             return None
-        dataset = await self._get_opendap_dataset(session, opendap_url)
-        if not dataset:
+        template = await self._get_dataset_template(session,
+                                                    request['drsId'],
+                                                    opendap_url)
+        if not template:
+            return None
+        variable = template.get_variable(var_name)
+        if variable is None:
             return None
         await self._ensure_all_info_in_data_sources(session, [request.get('drsId')])
         data_type = self._data_sources[request['drsId']].get('variable_infos', {})\
             .get(var_name, {}).get('data_type')
-        data = await self._get_data_from_opendap_dataset(dataset, session, var_name, dim_indexes)
-        if data is None:
-            return None
-        data = np.array(data, copy=False, dtype=data_type)
-        return data.flatten().tobytes()
+        base_url, _ = self._strip_projection(opendap_url)
+        return await self._get_chunk_data(session, base_url, variable,
+                                          dim_indexes, data_type)
 
     async def _fetch_data_source_list_json(self, session, base_url, query_args,
                                            max_wanted_results=100000) -> Dict:
@@ -1014,68 +1738,73 @@ class CciOdp:
         return catalogue
 
     async def _fetch_opensearch_feature_list(self, session, base_url, extension, extender,
-                                             query_args, max_wanted_results=100000):
+                                             query_args, max_wanted_results=100000) \
+            -> bool:
         """
-        Return JSON value read from Opensearch web service.
-        :return:
+        Read features from the Opensearch web service and pass them
+        to the *extender*.
+        :return: Whether all pages have been read
         """
-        start_page = 1
-        initial_maximum_records = min(1000, max_wanted_results)
-        maximum_records = 10000
+        # the same features may be delivered by overlapping queries
+        deduplicator = FeatureDeduplicator()
+
+        def _unique_extender(inner_extension, feature_list: List[Dict]):
+            if extender:
+                extender(inner_extension, deduplicator.filter(feature_list))
+
+        probe_page_size = min(self._page_sizer.min_size, max_wanted_results)
         total_results = await self._fetch_opensearch_feature_part_list(session, base_url,
-                                                                       query_args, start_page,
-                                                                       initial_maximum_records,
-                                                                       extension, extender,
+                                                                       query_args, 1,
+                                                                       probe_page_size,
+                                                                       extension,
+                                                                       _unique_extender,
                                                                        None, None)
-        if total_results < initial_maximum_records or max_wanted_results < 1000:
-            return
-        # num_results = maximum_records
-        num_results = 0
-        extension.clear()
-        while num_results < total_results:
-            if 'startDate' in query_args and 'endDate' in query_args:
-                # we have to clear the extension of any previous values to avoid duplicate values
-                # extension.clear()
-                start_time = datetime.strptime(query_args.pop('startDate'), _TIMESTAMP_FORMAT)
-                end_time = datetime.strptime(query_args.pop('endDate'), _TIMESTAMP_FORMAT)
-                num_days_per_delta = \
-                    max(1,
-                        int(np.ceil((end_time - start_time).days /
-                                    (total_results / 1000))))
-                delta = relativedelta(days=num_days_per_delta, seconds=-1)
-                tasks = []
-                current_time = start_time
-                while current_time < end_time:
-                    task_start = current_time.strftime(_TIMESTAMP_FORMAT)
-                    current_time += delta
-                    if current_time > end_time:
-                        current_time = end_time
-                    task_end = current_time.strftime(_TIMESTAMP_FORMAT)
-                    tasks.append(self._fetch_opensearch_feature_part_list(session, base_url,
-                                                                          query_args, start_page,
-                                                                          maximum_records,
-                                                                          extension,
-                                                                          extender,
-                                                                          task_start, task_end))
-                await asyncio.gather(*tasks)
-                num_results = total_results
-            else:
-                tasks = []
-                # do not have more than 4 open connections at the same time
-                while len(tasks) < 4 and num_results < total_results:
-                    tasks.append(self._fetch_opensearch_feature_part_list(session, base_url,
-                                                                          query_args, start_page,
-                                                                          maximum_records,
-                                                                          extension,
-                                                                          extender, None, None))
-                    start_page += 1
-                    num_results += maximum_records
-                await asyncio.gather(*tasks)
+        if total_results is None:
+            return False
+        wanted_results = min(total_results, max_wanted_results)
+        if wanted_results <= probe_page_size:
+            return True
+        page_size = self._page_sizer.get_page_size()
+        if 'startDate' in query_args and 'endDate' in query_args \
+                and wanted_results > page_size:
+            # time windows with more results than fit on a page are split
+            # into parts which fit on one
+            window_query_args = dict(query_args)
+            start_time = datetime.strptime(window_query_args.pop('startDate'),
+                                           _TIMESTAMP_FORMAT)
+            end_time = datetime.strptime(window_query_args.pop('endDate'),
+                                         _TIMESTAMP_FORMAT)
+
+            async def _fetch_page(page_start_time: datetime,
+                                  page_end_time: datetime,
+                                  start_page: int,
+                                  maximum_records: int) -> Optional[int]:
+                return await self._fetch_opensearch_feature_part_list(
+                    session, base_url, window_query_args, start_page,
+                    maximum_records, extension, _unique_extender,
+                    page_start_time.strftime(_TIMESTAMP_FORMAT),
+                    page_end_time.strftime(_TIMESTAMP_FORMAT)
+                )
+
+            return await crawl_time_window(_fetch_page, start_time, end_time,
+                                           total_results, page_size)
+        # the probe page is kept, further pages are sized from the responses
+        # observed so far. All pages are requested at once, the number of
+        # open connections is limited by the governor.
+        tasks = [self._fetch_opensearch_feature_part_list(session, base_url,
+                                                          query_args, start_page,
+                                                          maximum_records,
+                                                          extension, _unique_extender,
+                                                          None, None)
+                 for start_page, maximum_records
+                 in get_page_plan(wanted_results, probe_page_size, page_size)]
+        totals = await asyncio.gather(*tasks)
+        return all(total is not None for total in totals)
 
     async def _fetch_opensearch_feature_part_list(
             self, session, base_url, query_args, start_page, maximum_records,
             extension, extender, start_date, end_date
-    ) -> int:
+    ) -> Optional[int]:
         paging_query_args = dict(query_args or {})
         paging_query_args.update(startPage=start_page,
                                  maximumRecords=maximum_records,
@@ -1087,15 +1816,43 @@ class CciOdp:
         url = base_url + '?' + urllib.parse.urlencode(paging_query_args)
         num_reattempts = start_page * 2
         attempt = 0
+        parser = None
+        num_bytes = 0
+        # the response time of the server, without the time spent
+        # waiting for the rate limiter or a concurrency slot
+        sent_time = 0.0
+        response_seconds = 0.0
+
+        def start_timer():
+            nonlocal sent_time
+            sent_time = time.monotonic()
+
+        async def parse_stream(resp: aiohttp.ClientResponse):
+            # features are parsed while the page is still downloading
+            nonlocal parser, num_bytes, response_seconds
+            parser = FeatureCollectionParser()
+            num_bytes = 0
+            async for block in resp.content.iter_any():
+                num_bytes += len(block)
+                parser.feed(block)
+            response_seconds = time.monotonic() - sent_time
+
         while attempt < num_reattempts:
-            resp = await self.get_response(session, url)
+            resp = await self.get_response(session, url,
+                                           body_reader=parse_stream,
+                                           on_sent=start_timer)
             if resp:
-                json_text = await resp.read()
-                json_dict = json.loads(json_text.decode('utf-8'))
-                if extender:
-                    feature_list = json_dict.get("features", [])
-                    extender(extension, feature_list)
-                return json_dict['totalResults']
+                try:
+                    feature_list = parser.finish()
+                except ValueError as e:
+                    _LOG.debug(f'Could not parse page {start_page}: {e}')
+                else:
+                    self._page_sizer.observe(len(feature_list),
+                                             response_seconds,
+                                             num_bytes)
+                    if extender:
+                        extender(extension, feature_list)
+                    return parser.total_results
             attempt += 1
             if 'startDate' in paging_query_args and \
                     'endDate' in paging_query_args:
@@ -1106,8 +1863,8 @@ class CciOdp:
             else:
                 _LOG.debug(f'Did not read page {start_page} '
                            f'at attempt {attempt}')
-            time.sleep(4)
-        return 0
+            await backoff(attempt, base_delay=_PAGE_RETRY_BASE_DELAY)
+        return None
 
     async def _set_variable_infos(self, opensearch_url: str, dataset_id: str,
                                   dataset_name: str, session, data_source):
@@ -1220,24 +1977,78 @@ class CciOdp:
     async def _extract_metadata_from_descxml_url(self, session, descxml_url: str = None) -> dict:
         if not descxml_url:
             return {}
-        resp = await self.get_response(session, descxml_url)
-        if resp:
-            descxml = etree.XML(await resp.read())
+
+        def parse_descxml(content: bytes) -> dict:
             try:
-                return _extract_metadata_from_descxml(descxml)
+                return _extract_metadata_from_descxml(etree.XML(content))
             except etree.ParseError:
                 _LOG.info(f'Cannot read metadata from {descxml_url} due to parsing error.')
-        return {}
+                return {}
+
+        metadata = await self._get_cached_document(session, descxml_url,
+                                                   parse_descxml)
+        return copy.deepcopy(metadata) if metadata else {}
 
     async def _extract_metadata_from_odd_url(self, session: aiohttp.ClientSession,
                                              odd_url: str = None) -> dict:
         if not odd_url:
             return {}
-        resp = await self.get_response(session, odd_url)
-        if not resp:
-            return {}
-        xml_text = await resp.read()
-        return _extract_metadata_from_odd(etree.XML(xml_text))
+        metadata = await self._get_cached_document(
+            session, odd_url,
+            lambda content: _extract_metadata_from_odd(etree.XML(content))
+        )
+        # callers modify what they get
+        return copy.deepcopy(metadata) if metadata else {}
+
+    async def _get_cached_document(self, session, url: str,
+                                   parse: Callable[[bytes], Any]) -> Any:
+        """
+        Get the document at *url*, parsed by *parse* into a value that
+        can be converted to JSON. Parsed documents are cached on disk.
+        Stale ones are returned at once and revalidated in the background.
+        Returns None, if the document cannot be read.
+        """
+        entry = self._metadata_cache.get(url)
+        if entry is None:
+            return await self._fetch_document(session, url, parse, None)
+        if not self._metadata_cache.is_fresh(entry):
+            self._revalidate_in_background(url, self._fetch_document,
+                                           session, url, parse, entry)
+        return entry.value
+
+    async def _fetch_document(self, session, url: str,
+                              parse: Callable[[bytes], Any],
+                              entry: Optional[MetadataCacheEntry]) -> Any:
+        headers = entry.get_validation_headers() if entry is not None else None
+        resp = await self.get_response(session, url, headers=headers or None)
+        if resp is None:
+            # a stale document is better than none
+            return entry.value if entry is not None else None
+        if resp.status == 304:
+            self._metadata_cache.revalidate(url)
+            return entry.value
+        value = parse(await resp.read())
+        self._metadata_cache.put(url, value,
+                                 etag=resp.headers.get('ETag'),
+                                 last_modified=resp.headers.get('Last-Modified'))
+        return value
+
+    def _revalidate_in_background(self, key: str,
+                                  async_function: Callable[..., Awaitable],
+                                  *params):
+        # must be called on the event loop of the session
+        if key in self._revalidation_tasks:
+            return
+        task = asyncio.ensure_future(async_function(*params))
+        self._revalidation_tasks[key] = task
+
+        def on_done(done_task: asyncio.Future):
+            self._revalidation_tasks.pop(key, None)
+            if not done_task.cancelled() and done_task.exception() is not None:
+                _LOG.warning(f'Could not revalidate {key}: '
+                             f'{done_task.exception()}')
+
+        task.add_done_callback(on_done)
 
     def _determine_fill_value(self, dtype):
         if np.issubdtype(dtype, np.integer):
@@ -1312,20 +2123,49 @@ class CciOdp:
     def get_opendap_dataset(self, url: str):
         return self._run_with_session(self._get_opendap_dataset, url)
 
-    async def _get_result_dict(self, session, url: str):
-        if url in self._result_dicts:
-            return self._result_dicts[url]
+    async def _get_result_dict(self, session, url: str,
+                               parts: Tuple[str, ...] = ('dds', 'das')):
+        res_dict = self._result_dicts.setdefault(url, {})
+        missing_parts = [part for part in parts if part not in res_dict]
         tasks = []
-        res_dict = {}
-        tasks.append(self._get_content_from_opendap_url(url, 'dds', res_dict, session))
-        tasks.append(self._get_content_from_opendap_url(url, 'das', res_dict, session))
+        for part in missing_parts:
+            tasks.append(self._get_content_from_opendap_url(url, part, res_dict, session))
         await asyncio.gather(*tasks)
-        if 'das' in res_dict:
+        if 'das' in missing_parts and 'das' in res_dict:
             res_dict['das'] = res_dict['das'].replace('        Float32 valid_min -Infinity;\n', '')
             res_dict['das'] = res_dict['das'].replace('        Float32 valid_max Infinity;\n', '')
-        self._result_dicts[url] = res_dict
         return res_dict
 
+    async def _get_dataset_template(self, session, drs_id: str, url: str) \
+            -> Optional[DatasetTemplate]:
+        # All granules of a dataset usually share the same structure,
+        # so the parsed dataset of one granule serves the others as long
+        # as the fingerprint of their DDS is the same.
+        res_dict = await self._get_result_dict(session, url, parts=('dds',))
+        if not res_dict.get('dds'):
+            _LOG.warning('Could not open opendap url. No dds file provided.')
+            return None
+        template = self._dataset_templates.get(drs_id)
+        if template is not None and template.matches(res_dict['dds']):
+            return template
+        dataset = await self._get_opendap_dataset(session, url)
+        if not dataset:
+            return None
+        template = self._create_dataset_template(dataset, res_dict['dds'])
+        self._dataset_templates[drs_id] = template
+        return template
+
+    def _create_dataset_template(self, dataset, dds: str) -> DatasetTemplate:
+        variables = {}
+        for var_name in dataset.keys():
+            try:
+                _, variables[var_name] = \
+                    self._get_variable_template(dataset, var_name)
+            except AttributeError:
+                # sequences cannot be requested as chunks
+                continue
+        return DatasetTemplate(get_dds_fingerprint(dds), variables)
+
     async def _get_opendap_dataset(self, session, url: str):
         res_dict = await self._get_result_dict(session, url)
         if 'dds' not in res_dict or 'das' not in res_dict:
@@ -1338,9 +2178,7 @@ class CciOdp:
         add_attributes(dataset, parse_das(res_dict['das']))
 
         # remove any projection from the url, leaving selections
-        scheme, netloc, path, query, fragment = urlsplit(url)
-        projection, selection = parse_ce(query)
-        url = urlunsplit((scheme, netloc, path, '&'.join(selection), fragment))
+        url, projection = self._strip_projection(url)
 
         # now add data proxies
         for var in walk(dataset, BaseType):
@@ -1374,28 +2212,111 @@ class CciOdp:
     async def _get_content_from_opendap_url(self, url: str, part: str, res_dict: dict, session):
         scheme, netloc, path, query, fragment = urlsplit(url)
         url = urlunsplit((scheme, netloc, path + f'.{part}', query, fragment))
+        # several variables of the same granule are usually requested at once
+        content, _ = await self._opendap_flight.do(
+            url, self._fetch_text, session, url
+        )
+        if content is not None:
+            res_dict[part] = content
+
+    async def _fetch_text(self, session, url: str) -> Optional[str]:
         resp = await self.get_response(session, url)
-        if resp:
-            res_dict[part] = await resp.read()
-            res_dict[part] = str(res_dict[part], 'utf-8')
+        if not resp:
+            return None
+        return str(await resp.read(), 'utf-8')
 
-    async def _get_data_from_opendap_dataset(self, dataset, session, variable_name, slices):
+    @staticmethod
+    def _strip_projection(url: str) -> Tuple[str, List]:
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        projection, selection = parse_ce(query)
+        url = urlunsplit((scheme, netloc, path, '&'.join(selection), fragment))
+        return url, projection
+
+    @staticmethod
+    def _get_variable_template(dataset, variable_name) \
+            -> Tuple[str, VariableTemplate]:
         proxy = dataset[variable_name].data
         if type(proxy) == list:
             proxy = proxy[0]
-        # build download url
-        index = combine_slices(proxy.slice, fix_slice(slices, proxy.shape))
-        scheme, netloc, path, query, fragment = urlsplit(proxy.baseurl)
-        url = urlunsplit((
+        return proxy.baseurl, \
+            VariableTemplate(proxy.id, proxy.shape, proxy.slice)
+
+    @staticmethod
+    def _get_dods_index(variable: VariableTemplate, slices) -> Tuple:
+        return combine_slices(variable.slice,
+                              fix_slice(slices, variable.shape))
+
+    @staticmethod
+    def _get_dods_shape(index: Tuple) -> Optional[Tuple[int, ...]]:
+        if any(s.stop is None for s in index):
+            return None
+        return tuple(len(range(s.start or 0, s.stop, s.step or 1))
+                     for s in index)
+
+    @classmethod
+    def _get_dods_url(cls, base_url: str, variable: VariableTemplate, slices) \
+            -> str:
+        index = cls._get_dods_index(variable, slices)
+        scheme, netloc, path, query, fragment = urlsplit(base_url)
+        return urlunsplit((
             scheme, netloc, path + '.dods',
-            quote(proxy.id) + hyperslab(index) + '&' + query,
+            quote(variable.id) + hyperslab(index) + '&' + query,
             fragment)).rstrip('&')
+
+    async def _get_data_from_opendap_dataset(self, dataset, session, variable_name, slices):
+        base_url, variable = self._get_variable_template(dataset, variable_name)
+        url = self._get_dods_url(base_url, variable, slices)
         # download and unpack data
         resp = await self.get_response(session, url)
         if not resp:
             _LOG.warning(f'Could not read response from "{url}"')
             return None
         content = await resp.read()
+        return self._unpack_dods_with_pydap(content, url, variable.id)
+
+    async def _get_chunk_data(self, session, base_url: str,
+                              variable: VariableTemplate, slices,
+                              data_type) \
+            -> Optional[Union[bytes, bytearray]]:
+        url = self._get_dods_url(base_url, variable, slices)
+        # the header of the response tells whether the granule still has
+        # the structure of the template, the chunk is rejected if not
+        shape = self._get_dods_shape(self._get_dods_index(variable, slices))
+        decoder = None
+
+        async def decode_stream(resp: aiohttp.ClientResponse):
+            # values are decoded while the response is still downloading
+            nonlocal decoder
+            decoder = DodsArrayDecoder(variable.id, data_type, shape)
+            async for block in resp.content.iter_any():
+                decoder.feed(block)
+
+        try:
+            resp = await self.get_response(session, url,
+                                           body_reader=decode_stream)
+            if not resp:
+                _LOG.warning(f'Could not read response from "{url}"')
+                return None
+            data = decoder.finish()
+        except ValueError as e:
+            _LOG.warning(f'Could not read data from "{url}": {e}')
+            return None
+        if not decoder.declined:
+            return data
+        # response holds types the decoder does not support, let pydap do it
+        data = self._unpack_dods_with_pydap(decoder.content, url, variable.id)
+        if data is None:
+            return None
+        data = np.array(data, copy=False, dtype=data_type)
+        if shape is not None and data.shape != shape:
+            _LOG.warning(f'Could not read data from "{url}": shape of '
+                         f'variable "{variable.id}" is {data.shape}, '
+                         f'expected {shape}')
+            return None
+        return data.flatten().tobytes()
+
+    @staticmethod
+    def _unpack_dods_with_pydap(content: bytes, url: str, proxy_id: str):
         dds, data = content.split(b'\nData:\n', 1)
         dds = str(dds, 'utf-8')
         # Parse received dataset:
@@ -1405,35 +2326,105 @@ class CciOdp:
         except ValueError:
             _LOG.warning(f'Could not read data from "{url}"')
             return None
-        return dataset[proxy.id].data
-
-    async def get_response(self, session: aiohttp.ClientSession, url: str) -> \
-            Optional[aiohttp.ClientResponse]:
+        return dataset[proxy_id].data
+
+    async def get_response(self, session: aiohttp.ClientSession, url: str,
+                           body_reader: Optional[Callable[
+                               [aiohttp.ClientResponse], Awaitable[Any]
+                           ]] = None,
+                           headers: Optional[Dict[str, str]] = None,
+                           on_sent: Optional[Callable[[], Any]] = None) \
+            -> Optional[aiohttp.ClientResponse]:
+        """
+        Get the response to a GET request, retrying if necessary.
+        The body of a successful response is read while the request's
+        concurrency slot is held. By default, it is read completely into
+        the response. A *body_reader* may consume it as a stream instead,
+        it is called anew for every attempt.
+        Additional request *headers* may make the request conditional,
+        a response with status 304 (Not Modified) is then returned as well.
+        *on_sent* is called whenever the request is sent, that is, after
+        waiting for the rate limiter and a concurrency slot.
+        """
         num_retries = self._num_retries
         retry_backoff_max = self._retry_backoff_max  # ms
         retry_backoff_base = self._retry_backoff_base
+        num_error_retries = 0
+        traffic_class = self._get_traffic_class(url)
         for i in range(num_retries):
-            resp = await session.request(method='GET', url=url)
+            await self._rate_limiter.acquire(url)
+            for retry_budget in self._retry_budgets.values():
+                retry_budget.deposit()
+            try:
+                async with self._governor.slot(url, traffic_class):
+                    if on_sent is not None:
+                        on_sent()
+                    resp = await session.request(method='GET', url=url,
+                                                 headers=headers)
+                    if resp.status == 200:
+                        # read body while holding the slot, so the slot
+                        # covers the whole transfer
+                        if body_reader is None:
+                            await resp.read()
+                        else:
+                            try:
+                                await body_reader(resp)
+                            except BaseException:
+                                resp.close()
+                                raise
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError,
+                    asyncio.TimeoutError) as e:
+                num_error_retries += 1
+                if not self._may_retry(num_error_retries, 'connection'):
+                    _LOG.warning(f'Cannot access url "{url}": {e}')
+                    return None
+                _LOG.debug(f'Connection error for "{url}": {e}. '
+                           f'Retry {num_error_retries} of '
+                           f'{self._num_error_retries} ...')
+                await backoff(num_error_retries)
+                continue
             if resp.status == 200:
+                self._rate_limiter.on_success(url)
                 return resp
-            elif 500 <= resp.status < 600:
-                if self._enable_warnings:
-                    error_message = f'Error {resp.status}: Cannot access url.'
-                    warnings.warn(error_message)
-                return None
+            resp.release()
+            if resp.status == 304 and headers:
+                self._rate_limiter.on_success(url)
+                return resp
+            if 500 <= resp.status < 600:
+                num_error_retries += 1
+                if not self._may_retry(num_error_retries, 'server'):
+                    if self._enable_warnings:
+                        error_message = f'Error {resp.status}: Cannot access url.'
+                        warnings.warn(error_message)
+                    return None
+                await backoff(num_error_retries)
             elif resp.status == 429:
-                # Retry after 'Retry-After' with exponential backoff
-                retry_min = int(resp.headers.get('Retry-After', '100'))
-                retry_backoff = random.random() * retry_backoff_max
+                # Retry after 'Retry-After' with exponential backoff.
+                # Only this request waits, together with all further
+                # requests to the same host.
+                retry_min = parse_retry_after(resp.headers, default=0.1)
+                retry_backoff = random.random() * retry_backoff_max / 1000.0
                 retry_total = retry_min + retry_backoff
                 if self._enable_warnings:
                     retry_message = f'Error 429: Too Many Requests. ' \
                                     f'Attempt {i + 1} of {num_retries} to retry after ' \
                                     f'{"%.2f" % retry_min} + {"%.2f" % retry_backoff} = ' \
-                                    f'{"%.2f" % retry_total} ms...'
+                                    f'{"%.2f" % retry_total} s...'
                     warnings.warn(retry_message)
-                time.sleep(retry_total / 1000.0)
+                self._rate_limiter.defer(url, retry_total)
                 retry_backoff_max *= retry_backoff_base
             else:
                 break
         return None
+
+    def _get_traffic_class(self, url: str) -> str:
+        if url.startswith(self._opensearch_url) \
+                or url.startswith(OPENSEARCH_CEDA_URL):
+            return TRAFFIC_OPENSEARCH
+        if urlsplit(url).path.endswith('.dods'):
+            return TRAFFIC_DATA
+        return TRAFFIC_METADATA
+
+    def _may_retry(self, num_error_retries: int, error_kind: str) -> bool:
+        return num_error_retries <= self._num_error_retries \
+               and self._retry_budgets[error_kind].try_withdraw()
@@ -20,26 +20,27 @@
 # SOFTWARE.
 
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
 import bisect
 import copy
 import itertools
 import json
 import logging
 import math
+import threading
 import time
 import warnings
 from abc import abstractmethod, ABCMeta
-from collections.abc import MutableMapping
 from numcodecs import Blosc
-from typing import Iterator, Any, List, Dict, Tuple, Callable, Iterable, KeysView, Mapping, Union
+from typing import Iterator, Any, List, Dict, Tuple, Callable, Iterable, KeysView, Mapping, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
+from zarr.storage import BaseStore
 
 from .cciodp import CciOdp
 from .constants import COMMON_COORD_VAR_NAMES
-from .constants import MONTHS
+from .dods import VariableTemplate
+from .timeaxis import TimeAxis
 
 _MIN_CHUNK_SIZE = 512*512
 _MAX_CHUNK_SIZE = 2048*2048
@@ -61,9 +62,11 @@ def _str_to_bytes(s: str):
 
 
 # todo move this to xcube
-class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
+class RemoteChunkStore(BaseStore, metaclass=ABCMeta):
     """
     A remote Zarr Store.
+    Chunks requested together through :meth:`getitems` are fetched
+    concurrently.
 
     :param data_id: The identifier of the data resource
     :param cube_params: A mapping containing additional parameters to define
@@ -107,16 +110,20 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
                                  math.ceil(last_index / self._time_chunking)
                                  * self._time_chunking)
             self._time_ranges = all_ranges[new_first_index:new_last_index]
+        if cube_params.get('drop_missing_time_steps', False) \
+                and self._time_chunking == 1 and not is_climatology:
+            # only time steps for which there are data are kept
+            time_availability = self.get_time_availability(self._time_ranges)
+            if time_availability is not None:
+                self._time_ranges = self._time_ranges[time_availability]
+                if not self._time_ranges:
+                    raise ValueError('Could not determine any valid time stamps')
 
         if is_climatology:
             t_array = np.array(range(1, 13), dtype=np.int8)
         else:
-            t_array = [s.to_pydatetime()
-                       + 0.5 * (e.to_pydatetime() - s.to_pydatetime())
-                       for s, e in self._time_ranges]
-            t_array = np.array(t_array).astype('datetime64[s]').astype(np.int64)
-            t_bnds_array = \
-                np.array(self._time_ranges).astype('datetime64[s]').astype(np.int64)
+            t_array = self._time_ranges.centers.astype(np.int64)
+            t_bnds_array = self._time_ranges.bounds.astype(np.int64)
             time_coverage_start = self._time_ranges[0][0]
             time_coverage_end = self._time_ranges[-1][1]
             cube_params['time_range'] = (self._extract_time_range_as_strings(
@@ -546,9 +553,20 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
         return cls._extract_time_as_string(time_start), cls._extract_time_as_string(time_end)
 
     @abstractmethod
-    def get_time_ranges(self, cube_id: str, cube_params: Mapping[str, Any]) -> List[Tuple]:
+    def get_time_ranges(self, cube_id: str, cube_params: Mapping[str, Any]) -> TimeAxis:
         pass
 
+    def get_time_availability(self, time_axis: TimeAxis) -> Optional[np.ndarray]:
+        """
+        Tell for each step of the time axis whether there are data for it.
+        This default implementation returns None, which means that it is
+        not known.
+
+        :param time_axis: The time axis
+        :return: A boolean array or None
+        """
+        return None
+
     @abstractmethod
     def get_default_time_range(self, ds_id: str) -> Tuple[str, str]:
         return '', ''
@@ -616,8 +634,8 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
     def request_time_range(self, time_index: int) -> Tuple:
         start_index = time_index * self._time_chunking
         end_index = ((time_index + 1) * self._time_chunking) - 1
-        start_time = self._time_ranges[start_index][0]
-        end_time = self._time_ranges[end_index][1]
+        start_time = pd.Timestamp(self._time_ranges.starts[start_index])
+        end_time = pd.Timestamp(self._time_ranges.ends[end_index])
         return start_time, end_time
 
     def _add_static_array(self, name: str, array: np.ndarray, attrs: Dict):
@@ -695,6 +713,64 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
 
         return chunk_data
 
+    def _fetch_chunks(self,
+                      chunk_entries: List[Tuple[str, str, Tuple[int, ...]]]) \
+            -> Dict[str, bytes]:
+        chunk_requests = []
+        for key, var_name, chunk_index in chunk_entries:
+            request_time_range = self.request_time_range(
+                chunk_index[self._time_indexes[var_name]]
+            )
+            chunk_requests.append((key, var_name, chunk_index,
+                                   request_time_range))
+
+        t0 = time.perf_counter()
+        try:
+            exception = None
+            chunks_data = self.fetch_chunks(chunk_requests)
+        except Exception as e:
+            exception = e
+            chunks_data = [None] * len(chunk_requests)
+        duration = time.perf_counter() - t0
+
+        for _, var_name, chunk_index, request_time_range in chunk_requests:
+            for observer in self._observers:
+                observer(var_name=var_name,
+                         chunk_index=chunk_index,
+                         time_range=request_time_range,
+                         duration=duration,
+                         exception=exception)
+
+        if exception:
+            raise exception
+
+        return {chunk_request[0]: chunk_data
+                for chunk_request, chunk_data in zip(chunk_requests, chunks_data)
+                if chunk_data is not None}
+
+    def fetch_chunks(self,
+                     chunk_requests: List[Tuple[str, str, Tuple[int, ...], Tuple]]
+                     ) -> List[Optional[bytes]]:
+        """
+        Fetch the data of several chunks from remote.
+        This default implementation fetches the chunks one after another,
+        subclasses should override it to fetch them concurrently.
+
+        :param chunk_requests: A list of tuples of the arguments
+            of :meth:`fetch_chunk`
+        :return: The chunk data as raw bytes, in the order of the requests.
+            Entries are None for chunks that cannot be fetched.
+        """
+        chunks_data = []
+        for key, var_name, chunk_index, time_range in chunk_requests:
+            try:
+                chunks_data.append(
+                    self.fetch_chunk(key, var_name, chunk_index, time_range)
+                )
+            except KeyError:
+                chunks_data.append(None)
+        return chunks_data
+
     @abstractmethod
     def fetch_chunk(self,
                     key: str,
@@ -718,7 +794,7 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
         return self.__module__ + '.' + self.__class__.__name__
 
     ###############################################################################
-    # Zarr Store (MutableMapping) implementation
+    # Zarr Store (BaseStore) implementation
     ###############################################################################
 
     def keys(self) -> KeysView[str]:
@@ -773,6 +849,32 @@ class RemoteChunkStore(MutableMapping, metaclass=ABCMeta):
             return self._fetch_chunk(key, *value)
         return value
 
+    def getitems(self, keys: Sequence[str], **kwargs) -> Dict[str, bytes]:
+        """
+        Get the values of several keys at once. All chunks among them are
+        fetched concurrently. Keys that do not exist or chunks that cannot
+        be fetched are omitted from the result.
+        Any further keyword arguments passed by zarr (e.g., 'contexts')
+        are ignored.
+        """
+        if self._trace_store_calls:
+            print(f'{self._class_name}.getitems(keys={keys!r})')
+        values = {}
+        chunk_entries = []
+        for key in keys:
+            if key not in self._vfs:
+                self._try_building_vfs_entry(key)
+            value = self._vfs.get(key)
+            if value is None:
+                continue
+            if isinstance(value, tuple):
+                chunk_entries.append((key, *value))
+            else:
+                values[key] = value
+        if chunk_entries:
+            values.update(self._fetch_chunks(chunk_entries))
+        return values
+
     def _try_building_vfs_entry(self, key):
         if '/' in key:
             name, chunk_index_part = key.split('/')
@@ -843,6 +945,15 @@ class CciChunkStore(RemoteChunkStore):
         if dataset_id not in self._cci_odp.dataset_names:
             raise ValueError(f'Data ID {dataset_id} not provided by ODP.')
         self._metadata = self._cci_odp.get_dataset_metadata(dataset_id)
+        # the granule of each time chunk and the structure of the granules
+        # are determined once, on first access
+        self._chunk_sources = None
+        self._chunk_template = None
+        self._chunk_sources_lock = threading.Lock()
+        # which time chunks have granules, if known
+        self._time_chunk_availability = None
+        self._fill_chunks = {}
+        self._slicing_tables = {}
         super().__init__(dataset_id,
                          cube_params,
                          observer=observer,
@@ -854,43 +965,28 @@ class CciChunkStore(RemoteChunkStore):
         end_time = datetime.strptime(iso_end_time, _TIMESTAMP_FORMAT)
         return start_time, end_time, iso_start_time, iso_end_time
 
-    def get_time_ranges(self, dataset_id: str, cube_params: Mapping[str, Any]) -> List[Tuple]:
+    def get_time_ranges(self, dataset_id: str, cube_params: Mapping[str, Any]) -> TimeAxis:
         start_time, end_time, iso_start_time, iso_end_time = \
             self._extract_time_range_as_datetime(
                 cube_params.get('time_range', self.get_default_time_range(dataset_id)))
-        ecv = dataset_id.split('.')[1]
         time_period = dataset_id.split('.')[2]
-        if time_period == 'day':
-            start_time = datetime(year=start_time.year, month=start_time.month, day=start_time.day)
-            end_time = datetime(year=end_time.year, month=end_time.month, day=end_time.day,
-                                hour=23, minute=59, second=59)
-            delta = relativedelta(days=1)
-        elif time_period == 'month' or time_period == 'mon':
-            start_time = datetime(year=start_time.year, month=start_time.month, day=1)
-            end_time = datetime(year=end_time.year, month=end_time.month, day=1)
-            delta = relativedelta(months=1)
-            end_time += delta
-        elif time_period == 'year' or time_period == 'yr':
-            start_time = datetime(year=start_time.year, month=1, day=1)
-            end_time = datetime(year=end_time.year, month=12, day=31)
-            delta = relativedelta(years=1)
-        elif time_period == 'climatology':
-            return [(i + 1, i + 1) for i, month in enumerate(MONTHS)]
-        else:
-            end_time = end_time.replace(hour=23, minute=59, second=59)
-            end_time_str = datetime.strftime(end_time, _TIMESTAMP_FORMAT)
-            iso_end_time = self._extract_time_as_string(end_time_str)
-            request_time_ranges = self._cci_odp.get_time_ranges_from_data(dataset_id, iso_start_time, iso_end_time)
-            return request_time_ranges
-        request_time_ranges = []
-        this = start_time
-        while this < end_time:
-            next = this + delta
-            pd_this = pd.Timestamp(datetime.strftime(this, _TIMESTAMP_FORMAT))
-            pd_next = pd.Timestamp(datetime.strftime(next, _TIMESTAMP_FORMAT))
-            request_time_ranges.append((pd_this, pd_next))
-            this = next
-        return request_time_ranges
+        if time_period in ['day', 'month', 'mon', 'year', 'yr']:
+            return TimeAxis.regular(start_time, end_time, time_period)
+        if time_period == 'climatology':
+            return TimeAxis.climatology()
+        end_time = end_time.replace(hour=23, minute=59, second=59)
+        end_time_str = datetime.strftime(end_time, _TIMESTAMP_FORMAT)
+        iso_end_time = self._extract_time_as_string(end_time_str)
+        return TimeAxis.from_ranges(
+            self._cci_odp.get_time_ranges_from_data(dataset_id, iso_start_time, iso_end_time)
+        )
+
+    def get_time_availability(self, time_axis: TimeAxis) -> Optional[np.ndarray]:
+        if 'climatology' in self._dataset_name:
+            return None
+        return self._cci_odp.get_time_availability(self._dataset_name,
+                                                   time_axis.starts,
+                                                   _get_inclusive_ends(time_axis))
 
     def get_default_time_range(self, ds_id: str):
         temporal_start = self._metadata.get('temporal_coverage_start', None)
@@ -952,9 +1048,138 @@ class CciChunkStore(RemoteChunkStore):
                     var_name: str,
                     chunk_index: Tuple[int, ...],
                     time_range: Tuple) -> bytes:
+        data = self.fetch_chunks([(key, var_name, chunk_index, time_range)])[0]
+        if data is None:
+            raise KeyError(f'{key}: cannot fetch chunk for variable '
+                           f'{var_name!r} and time_range {time_range!r}.')
+        return data
 
+    def fetch_chunks(self,
+                     chunk_requests: List[Tuple[str, str, Tuple[int, ...], Tuple]]
+                     ) -> List[Optional[bytes]]:
+        chunks_data = [None] * len(chunk_requests)
+        # chunks of time steps without granules are filled locally
+        fill_indexes = {i for i, (_, var_name, chunk_index, _)
+                        in enumerate(chunk_requests)
+                        if self._is_missing_time_chunk(var_name, chunk_index)}
+        # chunks of known granules are fetched with a single request each
+        fast_requests = [None if i in fill_indexes
+                         else self._get_fast_chunk_request(var_name, chunk_index)
+                         for i, (_, var_name, chunk_index, _)
+                         in enumerate(chunk_requests)]
+        fast_indexes = [i for i, fast_request in enumerate(fast_requests)
+                        if fast_request is not None]
+        if fast_indexes:
+            fast_chunks_data = self._cci_odp.fetch_data_chunks(
+                [fast_requests[i] for i in fast_indexes]
+            )
+            for i, data in zip(fast_indexes, fast_chunks_data):
+                chunks_data[i] = data
+        # all others take the full route via the feature list and the
+        # metadata of their granule
+        slow_indexes = [i for i, data in enumerate(chunks_data)
+                        if not data and i not in fill_indexes]
+        if slow_indexes:
+            identifier = self._cci_odp.get_dataset_id(self._dataset_name)
+            requests = []
+            for i in slow_indexes:
+                _, var_name, chunk_index, time_range = chunk_requests[i]
+                requests.append(self._get_chunk_request(identifier, var_name,
+                                                        chunk_index,
+                                                        time_range))
+            slow_chunks_data = self._cci_odp.get_data_chunks(requests)
+            for i, data in zip(slow_indexes, slow_chunks_data):
+                chunks_data[i] = data
+        chunks_data = [self._complete_chunk(var_name, chunk_index, data)
+                       if data else None
+                       for (_, var_name, chunk_index, _), data
+                       in zip(chunk_requests, chunks_data)]
+        for i in fill_indexes:
+            chunks_data[i] = self._get_fill_chunk(chunk_requests[i][1])
+        return chunks_data
+
+    def _get_time_chunk_index(self, var_name: str, chunk_index: Tuple[int, ...]) -> int:
+        time_dim_index = self._time_indexes.get(var_name, -1)
+        return chunk_index[time_dim_index] if time_dim_index >= 0 else -1
+
+    def _is_missing_time_chunk(self, var_name: str, chunk_index: Tuple[int, ...]) -> bool:
+        time_index = self._get_time_chunk_index(var_name, chunk_index)
+        if time_index < 0:
+            return False
+        self._get_chunk_sources()
+        time_chunk_availability = self._time_chunk_availability
+        return time_chunk_availability is not None \
+            and time_index < len(time_chunk_availability) \
+            and not time_chunk_availability[time_index]
+
+    def _get_fill_chunk(self, var_name: str) -> bytes:
+        fill_chunk = self._fill_chunks.get(var_name)
+        if fill_chunk is None:
+            chunk_sizes = self.get_attrs(var_name).get('chunk_sizes', [])
+            dtype = np.dtype(self.get_attrs(var_name).get('data_type'))
+            fill_value = self.get_attrs(var_name).get('fill_value')
+            if fill_value is None:
+                fill_value = np.nan if dtype.kind == 'f' else 0
+            fill_chunk = np.full(shape=int(np.prod(chunk_sizes)),
+                                 fill_value=fill_value,
+                                 dtype=dtype).tobytes()
+            self._fill_chunks[var_name] = fill_chunk
+        return fill_chunk
+
+    def _get_fast_chunk_request(self,
+                                var_name: str,
+                                chunk_index: Tuple[int, ...]) \
+            -> Optional[Tuple[str, VariableTemplate, Tuple, Optional[str]]]:
+        time_index = self._get_time_chunk_index(var_name, chunk_index)
+        if time_index < 0:
+            return None
+        chunk_sources = self._get_chunk_sources()
+        if time_index >= len(chunk_sources) \
+                or chunk_sources[time_index] is None \
+                or self._chunk_template is None:
+            return None
+        variable = self._chunk_template.get_variable(var_name)
+        if variable is None:
+            return None
+        return chunk_sources[time_index], \
+            variable, \
+            self._get_dimension_indexes_for_chunk(var_name, chunk_index), \
+            self.get_attrs(var_name).get('data_type')
+
+    def _get_chunk_sources(self) -> List[Optional[str]]:
+        with self._chunk_sources_lock:
+            if self._chunk_sources is None:
+                self._chunk_sources = []
+                if 'climatology' not in self._dataset_name:
+                    self._init_chunk_sources()
+            return self._chunk_sources
+
+    def _init_chunk_sources(self):
+        chunk_axis = self._time_ranges.get_chunk_axis(self._time_chunking)
+        time_ranges = list(zip(
+            np.datetime_as_string(chunk_axis.starts, unit='s').tolist(),
+            np.datetime_as_string(_get_inclusive_ends(chunk_axis),
+                                  unit='s').tolist()
+        ))
+        chunk_sources = self._cci_odp.get_opendap_urls(self._dataset_name,
+                                                       time_ranges)
+        # the granules of the time axis are known now, so this is
+        # answered without remote requests
+        self._time_chunk_availability = self.get_time_availability(chunk_axis)
+        first_source = next((source for source in chunk_sources if source),
+                            None)
+        if first_source is not None:
+            self._chunk_template = self._cci_odp.get_dataset_template(
+                self._dataset_name, first_source
+            )
+        self._chunk_sources = chunk_sources
+
+    def _get_chunk_request(self,
+                           identifier: str,
+                           var_name: str,
+                           chunk_index: Tuple[int, ...],
+                           time_range: Tuple) -> Tuple[Dict, Tuple]:
         start_time, end_time = time_range
-        identifier = self._cci_odp.get_dataset_id(self._dataset_name)
         try:
             start_time = start_time.tz_localize(None).isoformat()
             end_time = end_time.tz_localize(None).isoformat()
@@ -969,10 +1194,12 @@ class CciChunkStore(RemoteChunkStore):
                        drsId=self._dataset_name,
                        fileFormat='.nc'
                        )
-        data = self._cci_odp.get_data_chunk(request, dim_indexes)
-        if not data:
-            raise KeyError(f'{key}: cannot fetch chunk for variable '
-                           f'{var_name!r} and time_range {time_range!r}.')
+        return request, dim_indexes
+
+    def _complete_chunk(self,
+                        var_name: str,
+                        chunk_index: Tuple[int, ...],
+                        data: bytes) -> bytes:
         if self._time_chunking > 1:
             expected_chunk_size, dtype_size = \
                 self._determine_expected_chunk_size(var_name)
@@ -1001,25 +1228,44 @@ class CciChunkStore(RemoteChunkStore):
         return expected_chunk_size * dtype.itemsize, dtype.itemsize
 
     def _get_dimension_indexes_for_chunk(self, var_name: str, chunk_index: Tuple[int, ...]) -> tuple:
-        dim_indexes = []
-        var_dimensions = self.get_attrs(var_name).get('file_dimensions', [])
-        chunk_sizes = self.get_attrs(var_name).get('file_chunk_sizes', [])
+        slicing_table = self._get_slicing_table(var_name)
         offset = 0
         # dealing with the case that time has been added as additional first dimension
-        if len(chunk_index) > len(chunk_sizes):
+        if len(chunk_index) > len(slicing_table):
             offset = 1
+        return tuple(slice(None, None, None) if dim_slices is None
+                     else dim_slices[chunk_index[i + offset]]
+                     for i, dim_slices in enumerate(slicing_table))
+
+    def _get_slicing_table(self, var_name: str) -> List[Optional[List[slice]]]:
+        # for each file dimension, the slices of all chunks along it
+        if var_name in self._slicing_tables:
+            return self._slicing_tables[var_name]
+        slicing_table = []
+        var_dimensions = self.get_attrs(var_name).get('file_dimensions', [])
+        chunk_sizes = self.get_attrs(var_name).get('file_chunk_sizes', [])
         for i, var_dimension in enumerate(var_dimensions):
             if var_dimension == 'time':
-                dim_indexes.append(slice(None, None, None))
+                slicing_table.append(None)
                 continue
             dim_size = self._dimensions.get(var_dimension, -1)
             if dim_size < 0:
                 raise ValueError(f'Could not determine size of dimension {var_dimension}')
             data_offset = self._dimension_chunk_offsets.get(var_dimension, 0)
-            start = data_offset + chunk_index[i + offset] * chunk_sizes[i]
-            end = min(start + chunk_sizes[i], data_offset + dim_size)
-            dim_indexes.append(slice(start, end))
-        return tuple(dim_indexes)
+            dim_slices = []
+            for start in range(data_offset, data_offset + dim_size, chunk_sizes[i]):
+                end = min(start + chunk_sizes[i], data_offset + dim_size)
+                dim_slices.append(slice(start, end))
+            slicing_table.append(dim_slices)
+        self._slicing_tables[var_name] = slicing_table
+        return slicing_table
+
+
+def _get_inclusive_ends(time_axis: TimeAxis) -> np.ndarray:
+    # time steps end where the next ones start, granules starting
+    # at the end of a step must not be taken for it
+    return np.maximum(time_axis.starts,
+                      time_axis.ends - np.timedelta64(1, 's'))
 
 
 def greatest_common_divisor(a: int, b: int, c: int):
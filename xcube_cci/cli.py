@@ -0,0 +1,75 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import sys
+from typing import List, Optional
+
+from xcube_cci.cciodp import CciOdp
+from xcube_cci.constants import CCI_ODD_URL
+from xcube_cci.constants import OPENSEARCH_CEDA_URL
+from xcube_cci.snapshot import DEFAULT_SNAPSHOT_PATH
+
+
+def main(args: Optional[List[str]] = None) -> int:
+    """
+    Regenerate the catalogue snapshot of the ODP.
+    Run as ``xcube-cci-snapshot``.
+    """
+    parser = argparse.ArgumentParser(
+        prog='xcube-cci-snapshot',
+        description='Crawl the catalogue of the ESA CCI Open Data Portal '
+                    'and write a snapshot of it.'
+    )
+    parser.add_argument('dataset_names', metavar='DRS_ID', nargs='*',
+                        help='DRS ids of the datasets to include. '
+                             'Defaults to all datasets.')
+    parser.add_argument('-o', '--output', default=DEFAULT_SNAPSHOT_PATH,
+                        help='Path of the snapshot file to write. '
+                             'Defaults to the snapshot of the package.')
+    parser.add_argument('--endpoint-url', default=OPENSEARCH_CEDA_URL,
+                        help='URL of the OpenSearch service')
+    parser.add_argument('--endpoint-description-url', default=CCI_ODD_URL,
+                        help='URL of the description of the OpenSearch '
+                             'service')
+    parsed_args = parser.parse_args(args)
+
+    # neither cached metadata nor an older snapshot may end up in the
+    # new snapshot
+    cci_odp = CciOdp(endpoint_url=parsed_args.endpoint_url,
+                     endpoint_description_url=parsed_args.endpoint_description_url,
+                     cache_dir=None,
+                     snapshot_path=None)
+    try:
+        snapshot = cci_odp.create_snapshot(parsed_args.dataset_names or None)
+    except ValueError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    finally:
+        cci_odp.close()
+    snapshot.save(parsed_args.output)
+    print(f'Wrote snapshot of {len(snapshot.drs_ids)} datasets '
+          f'({len(snapshot.data_sources)} described) to {parsed_args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -19,6 +19,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
+
 DATA_STORE_ID = 'cciodp'
 DATASET_OPENER_ID = f'dataset:zarr:{DATA_STORE_ID}'
 DATA_ARRAY_NAME = 'var_data'
@@ -35,6 +37,19 @@ DEFAULT_TILE_SIZE = 1000
 DEFAULT_RETRY_BACKOFF_MAX = 40  # milliseconds
 DEFAULT_RETRY_BACKOFF_BASE = 1.001
 DEFAULT_NUM_RETRIES = 200
+DEFAULT_NUM_ERROR_RETRIES = 3
+DEFAULT_REQUESTS_PER_SECOND = 100
+DEFAULT_OPENSEARCH_CONCURRENCY = 4
+DEFAULT_METADATA_CONCURRENCY = 16
+DEFAULT_DATA_CONCURRENCY = 32
+
+CACHE_DIR_ENV_VAR = 'XCUBE_CCI_CACHE_DIR'
+DEFAULT_CACHE_DIR = os.environ.get(
+    CACHE_DIR_ENV_VAR, os.path.join(os.path.expanduser('~'), '.xcube-cci')
+)
+DEFAULT_METADATA_TTL = 24 * 60 * 60  # seconds
+# stale metadata are used while they are revalidated in the background
+DEFAULT_METADATA_STALE_TTL = 7 * 24 * 60 * 60  # seconds
 
 CCI_MAX_IMAGE_SIZE = 2500
 
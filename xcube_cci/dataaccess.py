@@ -46,11 +46,16 @@ from xcube.util.jsonschema import JsonStringSchema
 from xcube_cci.cciodp import CciOdp
 from xcube_cci.chunkstore import CciChunkStore
 from xcube_cci.constants import CCI_ODD_URL
+from xcube_cci.constants import DEFAULT_CACHE_DIR
+from xcube_cci.constants import DEFAULT_METADATA_TTL
 from xcube_cci.constants import DATASET_OPENER_ID
+from xcube_cci.constants import DEFAULT_NUM_ERROR_RETRIES
 from xcube_cci.constants import DEFAULT_NUM_RETRIES
+from xcube_cci.constants import DEFAULT_REQUESTS_PER_SECOND
 from xcube_cci.constants import DEFAULT_RETRY_BACKOFF_BASE
 from xcube_cci.constants import DEFAULT_RETRY_BACKOFF_MAX
 from xcube_cci.constants import OPENSEARCH_CEDA_URL
+from xcube_cci.snapshot import DEFAULT_SNAPSHOT_PATH
 from xcube_cci.normalize import normalize_coord_names
 from xcube_cci.normalize import normalize_dims_description
 from xcube_cci.normalize import normalize_variable_dims_description
@@ -278,6 +283,9 @@ class CciOdpDataOpener(DataOpener):
         # noinspection PyUnresolvedReferences
         dataset_params = dict(
             normalize_data=JsonBooleanSchema(default=True),
+            drop_missing_time_steps=JsonBooleanSchema(
+                default=False,
+                title='Whether to leave out time steps without data'),
             variable_names=JsonArraySchema(items=JsonStringSchema(
                 enum=dsd.data_vars.keys() if dsd and dsd.data_vars else None))
         )
@@ -319,7 +327,8 @@ class CciOdpDataOpener(DataOpener):
         cube_kwargs, open_params = cci_schema.process_kwargs_subset(open_params, (
             'variable_names',
             'time_range',
-            'bbox'
+            'bbox',
+            'drop_missing_time_steps'
         ))
         chunk_store = CciChunkStore(self._cci_odp, data_id, cube_kwargs)
         ds = xr.open_zarr(chunk_store, consolidated=False)
@@ -388,7 +397,16 @@ class CciOdpDataStore(DataStore):
             'num_retries',
             'retry_backoff_max',
             'retry_backoff_base',
-            'user_agent'
+            'user_agent',
+            'num_error_retries',
+            'requests_per_second',
+            'opensearch_concurrency',
+            'metadata_concurrency',
+            'data_concurrency',
+            'cache_dir',
+            'metadata_ttl',
+            'snapshot_path',
+            'state_path'
         ))
         self._dataset_opener = CciOdpDatasetOpener(
             normalize_data=normalize_data,
@@ -410,7 +428,43 @@ class CciOdpDataStore(DataStore):
             retry_backoff_max=JsonIntegerSchema(default=DEFAULT_RETRY_BACKOFF_MAX, minimum=0),
             retry_backoff_base=JsonNumberSchema(default=DEFAULT_RETRY_BACKOFF_BASE,
                                                 exclusive_minimum=1.0),
-            user_agent=JsonStringSchema(default=None)
+            user_agent=JsonStringSchema(default=None),
+            num_error_retries=JsonIntegerSchema(
+                default=DEFAULT_NUM_ERROR_RETRIES, minimum=0,
+                title='Number of retries after connection or server errors'),
+            requests_per_second=JsonNumberSchema(
+                default=DEFAULT_REQUESTS_PER_SECOND, exclusive_minimum=0.0,
+                title='Maximum number of requests per second and host'),
+            opensearch_concurrency=JsonIntegerSchema(
+                minimum=1,
+                title='Maximum number of concurrent OpenSearch requests '
+                      'per host and process'),
+            metadata_concurrency=JsonIntegerSchema(
+                minimum=1,
+                title='Maximum number of concurrent DDS/DAS and other '
+                      'metadata requests per host and process'),
+            data_concurrency=JsonIntegerSchema(
+                minimum=1,
+                title='Maximum number of concurrent OPeNDAP data requests '
+                      'per host and process'),
+            cache_dir=JsonStringSchema(
+                default=DEFAULT_CACHE_DIR,
+                title='Local directory in which dataset granule indexes '
+                      'and metadata are kept. Set to an empty string to '
+                      'disable.'),
+            metadata_ttl=JsonNumberSchema(
+                default=DEFAULT_METADATA_TTL, minimum=0.0,
+                title='Number of seconds for which cached metadata are '
+                      'used without revalidation'),
+            snapshot_path=JsonStringSchema(
+                default=DEFAULT_SNAPSHOT_PATH,
+                title='Path of the catalogue snapshot used before '
+                      'requesting the catalogue. Set to an empty string '
+                      'to disable.'),
+            state_path=JsonStringSchema(
+                default=None,
+                title='Path of a state file written by '
+                      'CciOdp.save_state(), which is loaded on start')
         )
         return JsonObjectSchema(
             properties=dict(**cciodp_params),
@@ -470,7 +524,11 @@ class CciOdpDataStore(DataStore):
     @classmethod
     def get_search_params_schema(cls, data_type: str = None) -> JsonObjectSchema:
         cls._assert_valid_data_type(data_type)
-        data_ids = CciOdp().dataset_names
+        cci_odp = CciOdp()
+        try:
+            data_ids = cci_odp.dataset_names
+        finally:
+            cci_odp.close()
         ecvs = set([data_id.split('.')[1] for data_id in data_ids])
         frequencies = set([data_id.split('.')[2].replace('-days', ' days').replace('mon', 'month')
                           .replace('-yrs', ' years').replace('yr', 'year')
@@ -0,0 +1,398 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Decoding of DAP2 data responses (.dods) of numeric arrays and structural
+templates of DAP2 datasets.
+
+A .dods response consists of a DDS describing the returned variables,
+the separator ``Data:`` and the XDR encoded values of the variables
+in the order of their declaration. Each array is preceded by its length,
+which is given twice. All values are big-endian, 16-bit integers are sent
+as 32-bit integers and bytes are padded to a multiple of four.
+"""
+
+import hashlib
+import math
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+DATA_SEPARATOR = b'\nData:\n'
+
+_MAX_HEADER_SIZE = 1024 * 1024
+
+# states of the array decoder
+_HEADER = 'header'
+_SKIP = 'skip'
+_COUNTS = 'counts'
+_VALUES = 'values'
+_DONE = 'done'
+_DECLINED = 'declined'
+
+# DAP2 type -> (dtype on the wire, dtype of the values)
+_DAP_TYPES = {
+    'Byte': (np.dtype('u1'), np.dtype('uint8')),
+    'Int16': (np.dtype('>i4'), np.dtype('int16')),
+    'UInt16': (np.dtype('>u4'), np.dtype('uint16')),
+    'Int32': (np.dtype('>i4'), np.dtype('int32')),
+    'UInt32': (np.dtype('>u4'), np.dtype('uint32')),
+    'Float32': (np.dtype('>f4'), np.dtype('float32')),
+    'Float64': (np.dtype('>f8'), np.dtype('float64')),
+}
+
+_UNSUPPORTED_DECLARATION = re.compile(r'\b(Sequence|String|Url)\b')
+_DECLARATION = re.compile(
+    r'^\s*(' + '|'.join(_DAP_TYPES.keys()) + r')\s+([^\s\[;]+)\s*((?:\[[^\]]*\]\s*)*);',
+    re.MULTILINE
+)
+_DIMENSION = re.compile(r'\[\s*(?:[^=\]]*=\s*)?(\d+)\s*\]')
+_DATASET_NAME = re.compile(r'\}\s*[^{};]*;\s*$')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class DodsVariable(NamedTuple):
+    dap_type: str
+    name: str
+    shape: Tuple[int, ...]
+
+    @property
+    def size(self) -> int:
+        return math.prod(self.shape)
+
+    @property
+    def wire_dtype(self) -> np.dtype:
+        return _DAP_TYPES[self.dap_type][0]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return _DAP_TYPES[self.dap_type][1]
+
+    @property
+    def num_bytes(self) -> int:
+        """The number of bytes of the variable's XDR encoding."""
+        if self.dap_type == 'Byte':
+            num_bytes = _pad(self.size)
+        else:
+            num_bytes = self.size * self.wire_dtype.itemsize
+        if self.shape:
+            # arrays are preceded by their length, given twice
+            num_bytes += 8
+        return num_bytes
+
+
+def _pad(num_bytes: int) -> int:
+    return num_bytes + (-num_bytes % 4)
+
+
+def parse_dods_variables(dds: str) -> Optional[List[DodsVariable]]:
+    """
+    Parse the variables declared in the DDS of a data response.
+
+    :param dds: The DDS, as found in front of the data
+    :return: The declared variables in order, or None, if the DDS declares
+        any variables which cannot be decoded by this module
+    """
+    if _UNSUPPORTED_DECLARATION.search(dds):
+        return None
+    variables = []
+    for dap_type, name, dims in _DECLARATION.findall(dds):
+        shape = tuple(int(size) for size in _DIMENSION.findall(dims))
+        variables.append(DodsVariable(dap_type, name, shape))
+    return variables or None
+
+
+def find_dods_variable(variables: List[DodsVariable],
+                       var_name: Optional[str] = None) \
+        -> Tuple[Optional[DodsVariable], int]:
+    """
+    Find a variable and the offset of its encoding within the data.
+    If no name is given, the first array is chosen.
+
+    :return: A tuple of the variable and its offset,
+        the variable is None if it cannot be found
+    """
+    name = var_name.split('.')[-1] if var_name else None
+    offset = 0
+    for variable in variables:
+        if variable.name == name or (name is None and variable.shape):
+            return variable, offset
+        offset += variable.num_bytes
+    return None, offset
+
+
+class DodsArrayDecoder:
+    """
+    Decodes a numeric array from a .dods response that is fed in blocks,
+    as they arrive from the network. Values are converted, including the
+    change of byte order, straight into a preallocated buffer as soon as
+    they are complete, so no copy of the response is kept.
+
+    If the response contains variables that cannot be decoded,
+    the decoder keeps the raw response instead, see :attr:`declined`.
+
+    :param var_name: The name of the variable to be decoded.
+        If not given, the first array is decoded.
+    :param dtype: The data type of the result. Defaults to the data type
+        declared in the response.
+    :param shape: The expected shape of the variable. If given, the shape
+        declared in the response must match it.
+    """
+
+    def __init__(self,
+                 var_name: Optional[str] = None,
+                 dtype: Union[None, str, np.dtype] = None,
+                 shape: Optional[Tuple[int, ...]] = None):
+        self._var_name = var_name
+        self._dtype = np.dtype(dtype) if dtype is not None else None
+        self._shape = tuple(shape) if shape is not None else None
+        self._state = _HEADER
+        self._header = bytearray()
+        self._raw = None
+        self._variable = None
+        self._to_skip = 0
+        self._partial = bytearray()
+        self._buffer = None
+        self._values = None
+        self._num_values = 0
+
+    @property
+    def declined(self) -> bool:
+        """Whether the response cannot be decoded by this decoder."""
+        return self._state == _DECLINED
+
+    @property
+    def content(self) -> Optional[bytes]:
+        """The raw response, if it has been declined."""
+        return bytes(self._raw) if self._raw is not None else None
+
+    def feed(self, data: bytes):
+        """
+        Feed the next block of the response.
+
+        :raise ValueError: If the response is malformed or declares
+            the variable with another than the expected shape
+        """
+        pos = 0
+        if self._state == _HEADER:
+            pos = self._feed_header(data)
+            if pos is None:
+                return
+        if self._state == _DECLINED:
+            self._raw += data[pos:]
+            return
+        num_bytes = len(data)
+        while pos < num_bytes and self._state != _DONE:
+            if self._state == _SKIP:
+                step = min(self._to_skip, num_bytes - pos)
+                self._to_skip -= step
+                pos += step
+                if self._to_skip == 0:
+                    self._state = _COUNTS if self._variable.shape else _VALUES
+            elif self._state == _COUNTS:
+                step = min(8 - len(self._partial), num_bytes - pos)
+                self._partial += data[pos:pos + step]
+                pos += step
+                if len(self._partial) == 8:
+                    self._check_counts()
+            else:
+                pos = self._feed_values(data, pos)
+
+    def finish(self) -> Optional[bytearray]:
+        """
+        Finish decoding.
+
+        :return: A buffer with the flattened values in native byte order,
+            or None, if the response has been declined
+        :raise ValueError: If the response is incomplete
+        """
+        if self._state == _DECLINED:
+            return None
+        if self._state == _HEADER:
+            raise ValueError('Response contains no data')
+        if self._state != _DONE:
+            raise ValueError(f'Response is too short to hold variable '
+                             f'"{self._variable.name}"')
+        return self._buffer
+
+    def _feed_header(self, data: bytes) -> Optional[int]:
+        # the separator may start in a previous block
+        tail = bytes(self._header[-(len(DATA_SEPARATOR) - 1):])
+        index = (tail + data[:len(DATA_SEPARATOR) - 1]).find(DATA_SEPARATOR)
+        if 0 <= index < len(tail):
+            header_end = len(self._header) - len(tail) + index
+            pos = index + len(DATA_SEPARATOR) - len(tail)
+            del self._header[header_end:]
+        else:
+            index = data.find(DATA_SEPARATOR)
+            if index < 0:
+                self._header += data
+                if len(self._header) > _MAX_HEADER_SIZE:
+                    raise ValueError('Response contains no data')
+                return None
+            self._header += data[:index]
+            pos = index + len(DATA_SEPARATOR)
+        self._start(str(self._header, 'utf-8'))
+        if self._state == _DECLINED:
+            self._raw = self._header + DATA_SEPARATOR
+        return pos
+
+    def _start(self, dds: str):
+        variables = parse_dods_variables(dds)
+        if variables is None:
+            self._state = _DECLINED
+            return
+        variable, offset = find_dods_variable(variables, self._var_name)
+        if variable is None:
+            self._state = _DECLINED
+            return
+        if self._shape is not None and variable.shape != self._shape:
+            raise ValueError(f'Shape of variable "{variable.name}" '
+                             f'is {variable.shape}, expected {self._shape}')
+        self._variable = variable
+        dtype = self._dtype if self._dtype is not None else variable.dtype
+        dtype = dtype.newbyteorder('=')
+        self._buffer = bytearray(variable.size * dtype.itemsize)
+        self._values = np.frombuffer(self._buffer, dtype=dtype)
+        self._to_skip = offset
+        if offset > 0:
+            self._state = _SKIP
+        else:
+            self._state = _COUNTS if variable.shape else _VALUES
+
+    def _check_counts(self):
+        counts = np.frombuffer(bytes(self._partial), dtype='>u4')
+        size = self._variable.size
+        if counts[0] != size or counts[1] != size:
+            raise ValueError(f'Length of variable "{self._variable.name}" '
+                             f'is {counts[0]}, expected {size}')
+        self._partial.clear()
+        self._state = _VALUES if size > 0 else _DONE
+
+    def _feed_values(self, data: bytes, pos: int) -> int:
+        wire_dtype = self._variable.wire_dtype
+        item_size = wire_dtype.itemsize
+        num_bytes = len(data)
+        if self._partial:
+            # complete the value split between the previous and this block
+            step = min(item_size - len(self._partial), num_bytes - pos)
+            self._partial += data[pos:pos + step]
+            pos += step
+            if len(self._partial) < item_size:
+                return pos
+            self._put_values(np.frombuffer(bytes(self._partial),
+                                           dtype=wire_dtype))
+            self._partial.clear()
+        num_values = min((num_bytes - pos) // item_size,
+                         self._variable.size - self._num_values)
+        if num_values > 0:
+            self._put_values(np.frombuffer(data,
+                                           dtype=wire_dtype,
+                                           count=num_values,
+                                           offset=pos))
+            pos += num_values * item_size
+        if self._num_values == self._variable.size:
+            # anything behind the values, e.g., padding or maps, is ignored
+            self._state = _DONE
+            return num_bytes
+        self._partial += data[pos:]
+        return num_bytes
+
+    def _put_values(self, values: np.ndarray):
+        end = self._num_values + values.size
+        np.copyto(self._values[self._num_values:end], values, casting='unsafe')
+        self._num_values = end
+
+
+def decode_dods_array(content: Union[bytes, bytearray],
+                      var_name: Optional[str] = None,
+                      dtype: Union[None, str, np.dtype] = None) \
+        -> Optional[bytearray]:
+    """
+    Decode a numeric array from a complete .dods response.
+    The values are read through a view onto *content*.
+
+    :param content: The complete .dods response
+    :param var_name: The name of the variable to be decoded.
+        If not given, the first array is decoded.
+    :param dtype: The data type of the result. Defaults to the data type
+        declared in the response.
+    :return: A buffer with the flattened values in native byte order,
+        or None, if the response contains variables that cannot be decoded
+        by this function
+    :raise ValueError: If the response is malformed
+    """
+    decoder = DodsArrayDecoder(var_name, dtype)
+    decoder.feed(content)
+    return decoder.finish()
+
+
+def get_dds_fingerprint(dds: str) -> str:
+    """
+    Get a fingerprint of the structure declared by a DDS.
+    The name of the dataset, which differs from granule to granule,
+    is not part of the fingerprint.
+    """
+    structure = _DATASET_NAME.sub('}', dds.strip())
+    structure = _WHITESPACE.sub(' ', structure)
+    return hashlib.sha1(structure.encode('utf-8')).hexdigest()
+
+
+class VariableTemplate(NamedTuple):
+    """
+    The structure of a variable as needed to request its data:
+    its id, its shape and the slice a projection may have imposed.
+    """
+    id: str
+    shape: Tuple[int, ...]
+    slice: Tuple[slice, ...]
+
+
+class DatasetTemplate:
+    """
+    The structure of the variables of a dataset, which is shared by all
+    granules whose DDS has the same fingerprint.
+
+    :param fingerprint: The fingerprint of the DDS, as computed by
+        :func:`get_dds_fingerprint`
+    :param variables: A mapping from variable name to template
+    """
+
+    def __init__(self,
+                 fingerprint: str,
+                 variables: Dict[str, VariableTemplate]):
+        self._fingerprint = fingerprint
+        self._variables = dict(variables)
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    @property
+    def variable_names(self) -> List[str]:
+        return list(self._variables.keys())
+
+    def get_variable(self, var_name: str) -> Optional[VariableTemplate]:
+        return self._variables.get(var_name)
+
+    def matches(self, dds: str) -> bool:
+        return get_dds_fingerprint(dds) == self._fingerprint
@@ -0,0 +1,215 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import collections
+import contextlib
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from xcube_cci.constants import DEFAULT_DATA_CONCURRENCY
+from xcube_cci.constants import DEFAULT_METADATA_CONCURRENCY
+from xcube_cci.constants import DEFAULT_OPENSEARCH_CONCURRENCY
+
+TRAFFIC_OPENSEARCH = 'opensearch'
+TRAFFIC_METADATA = 'metadata'
+TRAFFIC_DATA = 'data'
+
+_DEFAULT_LIMITS = {
+    TRAFFIC_OPENSEARCH: DEFAULT_OPENSEARCH_CONCURRENCY,
+    TRAFFIC_METADATA: DEFAULT_METADATA_CONCURRENCY,
+    TRAFFIC_DATA: DEFAULT_DATA_CONCURRENCY,
+}
+
+
+class _Slots:
+    """
+    A counting semaphore that may be shared by coroutines running
+    on different event loops in different threads.
+    Waiters are served in FIFO order.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._active = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def set_limit(self, limit: int):
+        with self._lock:
+            self._limit = limit
+            num_to_wake = max(0, limit - self._active)
+            waiters = [self._waiters.popleft()
+                       for _ in range(min(num_to_wake, len(self._waiters)))]
+            self._active += len(waiters)
+        for waiter in waiters:
+            self._grant(*waiter)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._active < self._limit and not self._waiters:
+                self._active += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    removed = True
+                except ValueError:
+                    removed = False
+            if not removed and future.done() and not future.cancelled():
+                # the slot has been handed over already, pass it on
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters or self._active > self._limit:
+                self._active -= 1
+                return
+            # hand the slot over directly, the number of active slots
+            # does not change
+            waiter = self._waiters.popleft()
+        self._grant(*waiter)
+
+    def _grant(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        try:
+            loop.call_soon_threadsafe(self._set_result, future)
+        except RuntimeError:
+            # loop has been closed in the meantime
+            self.release()
+
+    def _set_result(self, future: asyncio.Future):
+        if future.done():
+            # waiter has been cancelled in the meantime
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class ConcurrencyGovernor:
+    """
+    Limits the number of concurrent requests per host and traffic class.
+    Limits apply to all event loops and threads of the process,
+    so all stores share them.
+
+    :param limits: A mapping from traffic class to the maximum number
+        of concurrent requests per host
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self._limits = dict(_DEFAULT_LIMITS)
+        self._limits.update(limits or {})
+        self._slots: Dict[Tuple[str, str], _Slots] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limits(self) -> Dict[str, int]:
+        return dict(self._limits)
+
+    def set_limits(self, **limits: Optional[int]):
+        """
+        Set the limits of the given traffic classes.
+        Limits given as None are left unchanged.
+        """
+        with self._lock:
+            for traffic_class, limit in limits.items():
+                if traffic_class not in self._limits:
+                    raise ValueError(f'Unknown traffic class '
+                                     f'"{traffic_class}"')
+                if limit is None:
+                    continue
+                if limit < 1:
+                    raise ValueError(f'Limit for "{traffic_class}" '
+                                     f'must be positive, was {limit}')
+                self._limits[traffic_class] = limit
+            slots = list(self._slots.items())
+        for (_, traffic_class), host_slots in slots:
+            host_slots.set_limit(self._limits[traffic_class])
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url: str, traffic_class: str):
+        """
+        Asynchronous context manager holding one of the slots of the host
+        of *url* and the given traffic class.
+        """
+        host_slots = self._get_slots(urlsplit(url).netloc, traffic_class)
+        await host_slots.acquire()
+        try:
+            yield
+        finally:
+            host_slots.release()
+
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """
+        Get the current state of all slots.
+
+        :return: A mapping from host to traffic class to a dictionary
+            giving the 'limit', the number of 'active' requests and the
+            number of requests 'waiting' in the queue.
+        """
+        with self._lock:
+            slots = list(self._slots.items())
+        stats = {}
+        for (host, traffic_class), host_slots in slots:
+            stats.setdefault(host, {})[traffic_class] = dict(
+                limit=host_slots.limit,
+                active=host_slots.active,
+                waiting=host_slots.waiting
+            )
+        return stats
+
+    def _get_slots(self, host: str, traffic_class: str) -> _Slots:
+        key = host, traffic_class
+        with self._lock:
+            if key not in self._slots:
+                if traffic_class not in self._limits:
+                    raise ValueError(f'Unknown traffic class '
+                                     f'"{traffic_class}"')
+                self._slots[key] = _Slots(self._limits[traffic_class])
+            return self._slots[key]
+
+
+_GOVERNOR = ConcurrencyGovernor()
+
+
+def get_governor() -> ConcurrencyGovernor:
+    """Get the process-wide concurrency governor."""
+    return _GOVERNOR
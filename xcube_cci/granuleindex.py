@@ -0,0 +1,372 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+Granule = Tuple[pd.Timestamp, pd.Timestamp, str]
+
+_TIME_DTYPE = 'datetime64[s]'
+
+_FORMAT_VERSION = 1
+
+
+def to_datetime64(time: Any) -> np.datetime64:
+    """
+    Convert a time given as datetime, pandas or numpy time stamp or as
+    ISO string into a ``datetime64[s]``. Time zones are dropped.
+    """
+    if isinstance(time, str):
+        time = pd.Timestamp(time)
+    if isinstance(time, pd.Timestamp) and time.tzinfo is not None:
+        time = time.tz_localize(None)
+    elif isinstance(time, datetime) and time.tzinfo is not None:
+        time = time.replace(tzinfo=None)
+    return np.datetime64(time, 's')
+
+
+def to_datetime64_array(times: Sequence[Any]) -> np.ndarray:
+    """Convert times into a ``datetime64[s]`` array, see :func:`to_datetime64`."""
+    if isinstance(times, np.ndarray) and times.dtype.kind == 'M':
+        return times.astype(_TIME_DTYPE)
+    return np.array([to_datetime64(time) for time in times],
+                    dtype=_TIME_DTYPE)
+
+
+class GranuleIndex:
+    """
+    An index of the granules of a dataset, sorted by start time.
+
+    Start and end times are kept in ``datetime64[s]`` arrays, URLs are
+    interned in a table and referenced by integer ids. Granules overlapping
+    a time range are found by binary search, for many time ranges at once,
+    if need be.
+
+    The index also keeps track of the time windows for which granules
+    have been queried, so that it can tell which parts of a time range
+    still need to be looked up.
+
+    :param granules: Granules given as tuples of start time, end time and
+        OPeNDAP URL, in any order
+    """
+
+    def __init__(self, granules: Iterable[Tuple[Any, Any, str]] = ()):
+        self._urls: List[str] = []
+        self._url_to_id: Dict[str, int] = {}
+        # disjoint, sorted windows of inclusive start and end times
+        self._queried_starts = np.empty(0, dtype=_TIME_DTYPE)
+        self._queried_ends = np.empty(0, dtype=_TIME_DTYPE)
+        self._set_arrays(np.empty(0, dtype=_TIME_DTYPE),
+                         np.empty(0, dtype=_TIME_DTYPE),
+                         np.empty(0, dtype=np.int32))
+        self.merge(granules)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends
+
+    @property
+    def urls(self) -> List[str]:
+        """The URLs of the granules, in the order of the granules."""
+        return [self._urls[url_id] for url_id in self._url_ids]
+
+    @property
+    def first_start(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._starts[0]) if len(self) > 0 else None
+
+    @property
+    def last_end(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._max_ends[-1]) if len(self) > 0 else None
+
+    def find_range(self, start: Any, end: Any) -> Tuple[int, int]:
+        """
+        Find the granules overlapping the time range from *start*
+        to *end*, both inclusive.
+
+        :return: The index of the first granule and the index behind
+            the last granule
+        """
+        first = int(np.searchsorted(self._max_ends, to_datetime64(start),
+                                    side='left'))
+        last = int(np.searchsorted(self._starts, to_datetime64(end),
+                                   side='right'))
+        return first, max(first, last)
+
+    def find_ranges(self, starts: Sequence[Any], ends: Sequence[Any]) \
+            -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of :meth:`find_range`.
+
+        :return: Two arrays with the indexes of the first granules and the
+            indexes behind the last granules of the given time ranges
+        """
+        starts = to_datetime64_array(starts)
+        ends = to_datetime64_array(ends)
+        firsts = np.searchsorted(self._max_ends, starts, side='left')
+        lasts = np.searchsorted(self._starts, ends, side='right')
+        return firsts, np.maximum(firsts, lasts)
+
+    def find(self, start: Any, end: Any) -> List[Granule]:
+        """Get the granules overlapping the time range."""
+        first, last = self.find_range(start, end)
+        granules = self.get_granules(first, last)
+        if self._ends_are_sorted:
+            return granules
+        # drop short granules lying in between
+        overlaps = self._ends[first:last] >= to_datetime64(start)
+        return [granule for granule, overlap in zip(granules, overlaps)
+                if overlap]
+
+    def find_first_urls(self, starts: Sequence[Any], ends: Sequence[Any]) \
+            -> List[Optional[str]]:
+        """
+        For each of the given time ranges, get the URL of the first
+        granule overlapping it, or None, if there is none.
+        """
+        firsts, lasts = self.find_ranges(starts, ends)
+        return [self._urls[self._url_ids[first]] if first < last else None
+                for first, last in zip(firsts, lasts)]
+
+    def covers(self, starts: Sequence[Any], ends: Sequence[Any]) \
+            -> np.ndarray:
+        """
+        For each of the given time ranges, tell whether there is
+        a granule overlapping it.
+
+        :return: A boolean array
+        """
+        firsts, lasts = self.find_ranges(starts, ends)
+        return firsts < lasts
+
+    def merge(self, granules: Iterable[Tuple[Any, Any, str]]) -> int:
+        """
+        Merge granules into the index. Granules whose URL is already
+        indexed are ignored.
+
+        :return: The number of granules added
+        """
+        starts, ends, url_ids = [], [], []
+        for start, end, url in granules:
+            if url in self._url_to_id:
+                continue
+            starts.append(to_datetime64(start))
+            ends.append(to_datetime64(end))
+            url_ids.append(self._intern(url))
+        if not url_ids:
+            return 0
+        # pages of granules arrive in any order, so only the new granules
+        # are sorted, then inserted into the index, which is sorted already
+        starts = np.array(starts, dtype=_TIME_DTYPE)
+        order = np.argsort(starts, kind='stable')
+        starts = starts[order]
+        positions = np.searchsorted(self._starts, starts, side='right')
+        self._set_sorted_arrays(
+            np.insert(self._starts, positions, starts),
+            np.insert(self._ends, positions,
+                      np.array(ends, dtype=_TIME_DTYPE)[order]),
+            np.insert(self._url_ids, positions,
+                      np.array(url_ids, dtype=np.int32)[order])
+        )
+        return len(url_ids)
+
+    @property
+    def queried_windows(self) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        return list(zip(pd.to_datetime(self._queried_starts),
+                        pd.to_datetime(self._queried_ends)))
+
+    def add_queried_window(self, start: Any, end: Any):
+        """
+        Record that all granules overlapping the time range from *start*
+        to *end*, both inclusive, have been merged into the index.
+        """
+        start = to_datetime64(start)
+        end = to_datetime64(end)
+        if end < start:
+            return
+        one_second = np.timedelta64(1, 's')
+        # windows touching the new one are joined with it
+        first = int(np.searchsorted(self._queried_ends, start - one_second,
+                                    side='left'))
+        last = int(np.searchsorted(self._queried_starts, end + one_second,
+                                   side='right'))
+        if first < last:
+            start = min(start, self._queried_starts[first])
+            end = max(end, self._queried_ends[last - 1])
+        self._queried_starts = np.concatenate([
+            self._queried_starts[:first],
+            np.array([start], dtype=_TIME_DTYPE),
+            self._queried_starts[last:]
+        ])
+        self._queried_ends = np.concatenate([
+            self._queried_ends[:first],
+            np.array([end], dtype=_TIME_DTYPE),
+            self._queried_ends[last:]
+        ])
+
+    def get_missing_windows(self, start: Any, end: Any) \
+            -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        Get the parts of the time range from *start* to *end* which
+        have not been queried yet.
+        """
+        start = to_datetime64(start)
+        end = to_datetime64(end)
+        one_second = np.timedelta64(1, 's')
+        first = int(np.searchsorted(self._queried_ends, start, side='left'))
+        last = int(np.searchsorted(self._queried_starts, end, side='right'))
+        missing_windows = []
+        for queried_start, queried_end in zip(self._queried_starts[first:last],
+                                              self._queried_ends[first:last]):
+            if start < queried_start:
+                missing_windows.append((start, queried_start - one_second))
+            start = queried_end + one_second
+        if start <= end:
+            missing_windows.append((start, end))
+        return [(pd.Timestamp(window_start), pd.Timestamp(window_end))
+                for window_start, window_end in missing_windows]
+
+    def truncate_queried_windows(self, end: Any):
+        """
+        Forget that time windows have been queried after *end*, so that
+        granules added since they were queried are looked up again.
+        """
+        end = to_datetime64(end)
+        last = int(np.searchsorted(self._queried_starts, end, side='right'))
+        self._queried_starts = self._queried_starts[:last]
+        self._queried_ends = np.minimum(self._queried_ends[:last], end)
+
+    def get_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Get the columns of the index as plain arrays, from which
+        :meth:`from_arrays` recreates it.
+        """
+        return dict(starts=self._starts.astype(np.int64),
+                    ends=self._ends.astype(np.int64),
+                    url_ids=self._url_ids,
+                    urls=np.array(self._urls, dtype=str),
+                    queried_starts=self._queried_starts.astype(np.int64),
+                    queried_ends=self._queried_ends.astype(np.int64))
+
+    @classmethod
+    def from_arrays(cls,
+                    starts: np.ndarray,
+                    ends: np.ndarray,
+                    url_ids: np.ndarray,
+                    urls: np.ndarray,
+                    queried_starts: np.ndarray,
+                    queried_ends: np.ndarray) -> 'GranuleIndex':
+        """Recreate an index from the arrays of :meth:`get_arrays`."""
+        index = cls()
+        index._urls = [str(url) for url in urls]
+        index._url_to_id = {url: url_id for url_id, url
+                            in enumerate(index._urls)}
+        index._set_arrays(starts.astype(_TIME_DTYPE),
+                          ends.astype(_TIME_DTYPE),
+                          url_ids.astype(np.int32))
+        index._queried_starts = queried_starts.astype(_TIME_DTYPE)
+        index._queried_ends = queried_ends.astype(_TIME_DTYPE)
+        return index
+
+    def save(self, path: str):
+        """
+        Write the index to a compressed, columnar ``.npz`` file.
+        The file is replaced atomically.
+        """
+        dir_path = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dir_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.npz', dir=dir_path)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                np.savez_compressed(fp,
+                                    version=np.array(_FORMAT_VERSION),
+                                    **self.get_arrays())
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'GranuleIndex':
+        """
+        Read an index written by :meth:`save`.
+
+        :raise ValueError: If the file is not a granule index file
+        """
+        with np.load(path, allow_pickle=False) as data:
+            try:
+                version = int(data['version'])
+                if version != _FORMAT_VERSION:
+                    raise ValueError(f'unsupported granule index file'
+                                     f' version {version}')
+                return cls.from_arrays(data['starts'], data['ends'],
+                                       data['url_ids'], data['urls'],
+                                       data['queried_starts'],
+                                       data['queried_ends'])
+            except KeyError as e:
+                raise ValueError(f'invalid granule index file: {e}') from e
+
+    def get_granules(self, first: int = 0, last: Optional[int] = None) \
+            -> List[Granule]:
+        """Get the granules with indexes from *first* to before *last*."""
+        starts = pd.to_datetime(self._starts[first:last])
+        ends = pd.to_datetime(self._ends[first:last])
+        return [(start, end, self._urls[url_id]) for start, end, url_id
+                in zip(starts, ends, self._url_ids[first:last])]
+
+    def _intern(self, url: str) -> int:
+        url_id = self._url_to_id.get(url)
+        if url_id is None:
+            url_id = len(self._urls)
+            self._urls.append(url)
+            self._url_to_id[url] = url_id
+        return url_id
+
+    def _set_arrays(self,
+                    starts: np.ndarray,
+                    ends: np.ndarray,
+                    url_ids: np.ndarray):
+        order = np.argsort(starts, kind='stable')
+        self._set_sorted_arrays(starts[order], ends[order], url_ids[order])
+
+    def _set_sorted_arrays(self,
+                           starts: np.ndarray,
+                           ends: np.ndarray,
+                           url_ids: np.ndarray):
+        self._starts = starts
+        self._ends = ends
+        self._url_ids = url_ids
+        # granules may end in any order, so granules ending before a given
+        # time are found by means of the running maximum of the end times
+        self._max_ends = np.maximum.accumulate(self._ends) \
+            if len(self._ends) > 0 else self._ends
+        self._ends_are_sorted = bool(np.all(self._max_ends == self._ends))
@@ -0,0 +1,213 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+_LOG = logging.getLogger('xcube')
+
+_FORMAT_VERSION = 1
+
+
+def to_json_value(value: Any) -> Any:
+    """
+    Convert a value that the json module cannot handle, such as numpy
+    values, into one it can. Meant as *default* of ``json.dump()``.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+class MetadataCacheEntry:
+    """
+    A cached value together with the time it was last validated and,
+    for values read from HTTP responses, the validators by which the
+    response can be revalidated.
+    """
+
+    def __init__(self,
+                 value: Any,
+                 validated_at: float,
+                 etag: Optional[str] = None,
+                 last_modified: Optional[str] = None):
+        self.value = value
+        self.validated_at = validated_at
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def get_validation_headers(self) -> Dict[str, str]:
+        """Get the headers of a conditional request for the entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class MetadataCache:
+    """
+    A cache of metadata values, such as parsed documents keyed by their
+    URL or dataset descriptions keyed by DRS id, which is kept on disk so
+    that it is shared across processes.
+
+    Each entry is stored as a JSON file in *directory*. An entry is fresh
+    for *ttl* seconds after it has been stored or revalidated. For another
+    *stale_ttl* seconds it is stale: it may still be used, but should be
+    revalidated. After that, it has expired and is not returned anymore.
+
+    :param directory: The directory of the cache files. If empty or None,
+        entries are kept in memory only.
+    :param ttl: The number of seconds an entry is fresh
+    :param stale_ttl: The number of seconds a stale entry may still be used
+    :param clock: Function returning the current time in seconds
+    """
+
+    def __init__(self,
+                 directory: Optional[str],
+                 ttl: float,
+                 stale_ttl: float,
+                 clock: Callable[[], float] = time.time):
+        self._directory = directory
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: Dict[str, MetadataCacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[MetadataCacheEntry]:
+        """
+        Get the entry for *key*, if it has not expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read(key)
+            if entry is None:
+                return None
+            with self._lock:
+                self._entries[key] = entry
+        if self._get_age(entry) > self._ttl + self._stale_ttl:
+            return None
+        return entry
+
+    def is_fresh(self, entry: MetadataCacheEntry) -> bool:
+        """Tell whether the entry may be used without revalidation."""
+        return self._get_age(entry) <= self._ttl
+
+    def put(self,
+            key: str,
+            value: Any,
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> MetadataCacheEntry:
+        """
+        Store a value. It must be convertible to JSON. Numpy values are
+        converted into plain Python values.
+        """
+        entry = MetadataCacheEntry(value, self._clock(),
+                                   etag=etag, last_modified=last_modified)
+        self._write(key, entry)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def revalidate(self, key: str) -> Optional[MetadataCacheEntry]:
+        """
+        Mark the entry for *key* as validated now, typically after the
+        server has responded that the resource is not modified.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry = MetadataCacheEntry(entry.value, self._clock(),
+                                   etag=entry.etag,
+                                   last_modified=entry.last_modified)
+        self._write(key, entry)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def _get_age(self, entry: MetadataCacheEntry) -> float:
+        return self._clock() - entry.validated_at
+
+    def _get_path(self, key: str) -> Optional[str]:
+        if not self._directory:
+            return None
+        file_name = hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json'
+        return os.path.join(self._directory, file_name)
+
+    def _read(self, key: str) -> Optional[MetadataCacheEntry]:
+        path = self._get_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as fp:
+                document = json.load(fp)
+            if document.get('version') != _FORMAT_VERSION \
+                    or document.get('key') != key:
+                return None
+            return MetadataCacheEntry(document['value'],
+                                      float(document['validated_at']),
+                                      etag=document.get('etag'),
+                                      last_modified=document.get('last_modified'))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            _LOG.warning(f'Could not read cached metadata of {key}: {e}')
+            return None
+
+    def _write(self, key: str, entry: MetadataCacheEntry):
+        path = self._get_path(key)
+        if path is None:
+            return
+        document = dict(version=_FORMAT_VERSION,
+                        key=key,
+                        validated_at=entry.validated_at,
+                        etag=entry.etag,
+                        last_modified=entry.last_modified,
+                        value=entry.value)
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.json',
+                                             dir=self._directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+                    json.dump(document, fp, default=to_json_value)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            _LOG.warning(f'Could not write cached metadata of {key}: {e}')
@@ -0,0 +1,404 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import codecs
+import json
+import math
+from datetime import datetime
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, \
+    Set, Tuple
+
+PROBE_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# a page should take about this long to be answered ...
+TARGET_PAGE_SECONDS = 5.0
+# ... and should not be larger than this
+TARGET_PAGE_BYTES = 32 * 1024 * 1024
+
+# weight of a new observation in the running per-record averages
+_SMOOTHING = 0.3
+
+_ONE_SECOND = timedelta(seconds=1)
+
+# the properties of OpenSearch features that are evaluated
+FEATURE_PROPERTY_NAMES = ('identifier', 'date', 'title', 'links', 'variables')
+
+_WHITESPACE = ' \t\n\r'
+
+_STATE_START = 0
+_STATE_KEY = 1
+_STATE_COLON = 2
+_STATE_VALUE = 3
+_STATE_FEATURES_START = 4
+_STATE_FEATURE = 5
+_STATE_DONE = 6
+
+# fetches the page with the given start page and maximum number of records
+# of a query restricted to a time window and returns the total number of
+# results in the window, or None, if the page could not be fetched
+FetchPage = Callable[[datetime, datetime, int, int], Awaitable[Optional[int]]]
+
+
+class PageSizer:
+    """
+    Chooses the number of records to request per OpenSearch page from
+    the response times and payload sizes observed for earlier pages.
+
+    Page sizes are multiples of *min_size*, so that pages of the chosen
+    size line up with a first page of *min_size* records.
+
+    :param min_size: The smallest page size, also the size of probe pages
+    :param max_size: The largest page size
+    :param target_seconds: The response time aimed for
+    :param target_bytes: The payload size aimed for
+    """
+
+    def __init__(self,
+                 min_size: int = PROBE_PAGE_SIZE,
+                 max_size: int = MAX_PAGE_SIZE,
+                 target_seconds: float = TARGET_PAGE_SECONDS,
+                 target_bytes: int = TARGET_PAGE_BYTES):
+        self._min_size = min_size
+        self._max_size = max(min_size, max_size)
+        self._target_seconds = target_seconds
+        self._target_bytes = target_bytes
+        self._seconds_per_record: Optional[float] = None
+        self._bytes_per_record: Optional[float] = None
+
+    @property
+    def min_size(self) -> int:
+        return self._min_size
+
+    def observe(self, num_records: int, seconds: float, num_bytes: int):
+        """Record the response time and payload size of a page."""
+        if num_records <= 0:
+            return
+        seconds_per_record = seconds / num_records
+        bytes_per_record = num_bytes / num_records
+        if self._seconds_per_record is None:
+            self._seconds_per_record = seconds_per_record
+            self._bytes_per_record = bytes_per_record
+        else:
+            self._seconds_per_record += \
+                _SMOOTHING * (seconds_per_record - self._seconds_per_record)
+            self._bytes_per_record += \
+                _SMOOTHING * (bytes_per_record - self._bytes_per_record)
+
+    def get_page_size(self) -> int:
+        """Get the page size to use for the next pages."""
+        if self._seconds_per_record is None:
+            return self._min_size
+        page_size = self._max_size
+        if self._seconds_per_record > 0:
+            page_size = min(page_size,
+                            self._target_seconds / self._seconds_per_record)
+        if self._bytes_per_record > 0:
+            page_size = min(page_size,
+                            self._target_bytes / self._bytes_per_record)
+        num_min_pages = max(1, int(page_size // self._min_size))
+        return num_min_pages * self._min_size
+
+
+def get_page_plan(total_results: int, first_page_size: int,
+                  page_size: int) -> List[Tuple[int, int]]:
+    """
+    Plan the pages to request after a first page of *first_page_size*
+    records has been read.
+
+    Records up to *page_size* are requested in pages of *first_page_size*,
+    all further records in pages of *page_size*, which must be a multiple
+    of *first_page_size*.
+
+    :return: The pages as pairs of the ``startPage`` and the
+        ``maximumRecords`` parameters
+    """
+    if page_size % first_page_size != 0:
+        raise ValueError(f'page size {page_size} must be a multiple of'
+                         f' {first_page_size}')
+    pages = []
+    num_first_pages = page_size // first_page_size
+    for start_page in range(2, num_first_pages + 1):
+        if (start_page - 1) * first_page_size >= total_results:
+            return pages
+        pages.append((start_page, first_page_size))
+    start_page = 2
+    while (start_page - 1) * page_size < total_results:
+        pages.append((start_page, page_size))
+        start_page += 1
+    return pages
+
+
+def prune_feature(feature: Dict) -> Dict:
+    """
+    Reduce an OpenSearch feature to its id, its bounding box, if given,
+    and the properties that are evaluated, dropping geometries and all
+    other properties.
+    """
+    properties = feature.get('properties', {})
+    pruned_feature = dict(id=feature.get('id'),
+                          properties={name: properties[name]
+                                      for name in FEATURE_PROPERTY_NAMES
+                                      if name in properties})
+    if 'bbox' in feature:
+        pruned_feature['bbox'] = feature['bbox']
+    return pruned_feature
+
+
+class FeatureCollectionParser:
+    """
+    Parses a GeoJSON feature collection while it is received.
+
+    Each feature is decoded as soon as it is complete and is passed through
+    *feature_filter*, so neither the text of the whole collection nor the
+    complete features are kept. All other members of the collection, such
+    as ``totalResults``, are kept as they are.
+
+    :param feature_filter: Reduces a decoded feature to what is needed
+    """
+
+    def __init__(self,
+                 feature_filter: Callable[[Dict], Dict] = prune_feature):
+        self._feature_filter = feature_filter
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._text = ''
+        self._min_text_length = 0
+        self._state = _STATE_START
+        self._key = None
+        self._members: Dict[str, Any] = {}
+        self._features: List[Dict] = []
+
+    @property
+    def members(self) -> Dict[str, Any]:
+        """The members of the collection other than its features."""
+        return self._members
+
+    @property
+    def features(self) -> List[Dict]:
+        return self._features
+
+    @property
+    def total_results(self) -> int:
+        return self._members.get('totalResults', 0)
+
+    def feed(self, data: bytes):
+        self._text += self._text_decoder.decode(data)
+        if len(self._text) >= self._min_text_length:
+            self._parse(final=False)
+
+    def finish(self) -> List[Dict]:
+        """
+        Parse what is left.
+
+        :return: The filtered features
+        :raise ValueError: If the collection is incomplete or invalid
+        """
+        self._text += self._text_decoder.decode(b'', final=True)
+        self._parse(final=True)
+        if self._state != _STATE_DONE:
+            raise ValueError('incomplete feature collection')
+        return self._features
+
+    def _parse(self, final: bool):
+        text = self._text
+        pos = 0
+        try:
+            while self._state != _STATE_DONE:
+                while pos < len(text) and text[pos] in _WHITESPACE:
+                    pos += 1
+                if pos == len(text):
+                    break
+                char = text[pos]
+                if self._state == _STATE_START:
+                    self._expect(char, '{')
+                    pos += 1
+                    self._state = _STATE_KEY
+                elif self._state == _STATE_KEY:
+                    if char == '}':
+                        pos += 1
+                        self._state = _STATE_DONE
+                        continue
+                    if char == ',':
+                        pos += 1
+                        continue
+                    self._key, end = self._decode_value(text, pos, final)
+                    if end < 0:
+                        break
+                    pos = end
+                    self._state = _STATE_COLON
+                elif self._state == _STATE_COLON:
+                    self._expect(char, ':')
+                    pos += 1
+                    self._state = _STATE_FEATURES_START \
+                        if self._key == 'features' else _STATE_VALUE
+                elif self._state == _STATE_FEATURES_START:
+                    self._expect(char, '[')
+                    pos += 1
+                    self._state = _STATE_FEATURE
+                elif self._state == _STATE_FEATURE:
+                    if char == ']':
+                        pos += 1
+                        self._state = _STATE_KEY
+                        continue
+                    if char == ',':
+                        pos += 1
+                        continue
+                    value, end = self._decode_value(text, pos, final)
+                    if end < 0:
+                        break
+                    self._features.append(self._feature_filter(value))
+                    pos = end
+                else:
+                    value, end = self._decode_value(text, pos, final)
+                    if end < 0:
+                        break
+                    self._members[self._key] = value
+                    pos = end
+                    self._state = _STATE_KEY
+        except json.JSONDecodeError as e:
+            raise ValueError(f'invalid feature collection: {e}') from e
+        self._text = text[pos:]
+        # an incomplete value is decoded again once the text
+        # has doubled, which keeps the effort linear
+        self._min_text_length = 2 * len(self._text) \
+            if self._state != _STATE_DONE else 0
+
+    def _decode_value(self, text: str, pos: int, final: bool) \
+            -> Tuple[Any, int]:
+        try:
+            value, end = self._json_decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return None, -1
+        if end == len(text) and not final:
+            # a number might go on in the next block
+            return None, -1
+        return value, end
+
+    @staticmethod
+    def _expect(char: str, expected_char: str):
+        if char != expected_char:
+            raise ValueError(f'invalid feature collection: expected'
+                             f' {expected_char!r}, found {char!r}')
+
+
+def get_feature_key(feature: Dict) -> Optional[Hashable]:
+    """Get a key identifying an OpenSearch feature, if it has any."""
+    key = feature.get('id')
+    if key is None:
+        key = feature.get('properties', {}).get('identifier')
+    return key
+
+
+class FeatureDeduplicator:
+    """
+    Filters OpenSearch features which have been seen before.
+    Features without a key are always passed.
+    """
+
+    def __init__(self):
+        self._keys: Set[Hashable] = set()
+
+    def filter(self, feature_list: List[Dict]) -> List[Dict]:
+        unique_features = []
+        for feature in feature_list:
+            key = get_feature_key(feature)
+            if key is not None:
+                if key in self._keys:
+                    continue
+                self._keys.add(key)
+            unique_features.append(feature)
+        return unique_features
+
+
+async def crawl_time_window(fetch_page: FetchPage,
+                            start: datetime,
+                            end: datetime,
+                            total_results: int,
+                            page_size: int) -> bool:
+    """
+    Fetch all records of a time window which holds more than *page_size*
+    records.
+
+    The window is bisected recursively until its parts hold no more than
+    *page_size* records each, so that every part is read with a single
+    page. Dense parts are split further while sparse parts are read as
+    they are. Parts are read concurrently.
+    Records that overlap a split time are found in both parts, so results
+    need to be deduplicated, e.g., with a :class:`FeatureDeduplicator`.
+
+    :param fetch_page: Fetches a page of the records of a time window
+    :param start: The start of the window, inclusive
+    :param end: The end of the window, inclusive
+    :param total_results: The number of records in the window
+    :param page_size: The maximum number of records to request per page
+    :return: Whether all records have been fetched. Parts whose number of
+        records could not be fetched are not crawled any further.
+    """
+    if end - start < _ONE_SECOND:
+        return await _fetch_all_pages(fetch_page, start, end, total_results,
+                                      page_size)
+    middle = start + timedelta(
+        seconds=(end - start).total_seconds() // 2
+    )
+    windows = [(start, middle), (middle + _ONE_SECOND, end)]
+    # windows expected to exceed a page are counted first
+    maximum_records = 1 if total_results > 2 * page_size else page_size
+    window_totals = await asyncio.gather(*[
+        fetch_page(window_start, window_end, 1, maximum_records)
+        for window_start, window_end in windows
+    ])
+    if any(window_total is None for window_total in window_totals):
+        # a failed count must not be taken for an empty part
+        return False
+    if all(window_total >= total_results for window_total in window_totals):
+        # the records are not told apart by time, for example, because
+        # they do not have one
+        return await _fetch_all_pages(fetch_page, start, end, total_results,
+                                      page_size)
+    tasks = []
+    for (window_start, window_end), window_total \
+            in zip(windows, window_totals):
+        if window_total > page_size:
+            tasks.append(crawl_time_window(fetch_page, window_start,
+                                           window_end, window_total,
+                                           page_size))
+        elif window_total > maximum_records:
+            tasks.append(_fetch_all_pages(fetch_page, window_start,
+                                          window_end, window_total,
+                                          page_size))
+    return all(await asyncio.gather(*tasks))
+
+
+async def _fetch_all_pages(fetch_page: FetchPage,
+                           start: datetime,
+                           end: datetime,
+                           total_results: int,
+                           page_size: int) -> bool:
+    num_pages = math.ceil(total_results / page_size)
+    totals = await asyncio.gather(*[
+        fetch_page(start, end, start_page, page_size)
+        for start_page in range(1, num_pages + 1)
+    ])
+    return all(total is not None for total in totals)
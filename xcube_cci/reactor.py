@@ -0,0 +1,197 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import aiohttp
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+_LOG = logging.getLogger('xcube')
+
+_DEFAULT_CONNECTION_LIMIT = 50
+_CLOSE_TIMEOUT = 10
+
+
+class IoReactor:
+    """
+    Runs a single asyncio event loop in a dedicated daemon thread and keeps
+    one pooled aiohttp session open for the lifetime of the reactor.
+
+    Coroutine functions are submitted thread-safely and receive the shared
+    session as their first argument, so any number of caller threads
+    (e.g., dask workers) reuse the same connections.
+    The loop and the session are created lazily on first use.
+
+    :param headers: Default headers to be sent with every request
+    :param connection_limit: The maximum number of simultaneous connections
+        of the session's connection pool
+    :param name: The name of the I/O thread
+    """
+
+    def __init__(self,
+                 headers: Optional[Dict[str, str]] = None,
+                 connection_limit: int = _DEFAULT_CONNECTION_LIMIT,
+                 name: str = 'xcube-cci-io'):
+        self._headers = headers
+        self._connection_limit = connection_limit
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._closed = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The reactor's event loop. Starts the reactor if necessary."""
+        self._ensure_started()
+        return self._loop
+
+    def in_reactor_thread(self) -> bool:
+        return self._thread is not None \
+               and threading.current_thread() is self._thread
+
+    def submit(self, async_function: Callable, *params) \
+            -> concurrent.futures.Future:
+        """
+        Schedule ``async_function(session, *params)`` on the reactor loop.
+        May be called from any thread.
+
+        :return: A concurrent future holding the coroutine's result
+        """
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(
+            self._call(async_function, *params), self._loop
+        )
+
+    def run(self, async_function: Callable, *params) -> Any:
+        """
+        Run ``async_function(session, *params)`` on the reactor loop and
+        block until its result is available.
+        """
+        if self.in_reactor_thread():
+            raise RuntimeError('Cannot block on the I/O reactor from within '
+                               'its own thread, await the coroutine instead')
+        return self.submit(async_function, *params).result()
+
+    async def run_async(self, async_function: Callable, *params) -> Any:
+        """
+        Await ``async_function(session, *params)`` from any event loop.
+        The coroutine is run on the reactor loop, the caller's loop
+        only awaits its result.
+        """
+        if self.in_reactor_thread():
+            return await self._call(async_function, *params)
+        return await asyncio.wrap_future(self.submit(async_function, *params))
+
+    def close(self):
+        """
+        Close the shared session, stop the loop and join the I/O thread.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            loop = self._loop
+            thread = self._thread
+        if loop is None:
+            return
+        if self.in_reactor_thread():
+            # e.g., a finalizer run by a task of the loop. The loop must
+            # not block on itself, so it is stopped once the session has
+            # been closed, and closed by its thread.
+            loop.create_task(self._shutdown(loop))
+            return
+        if thread.is_alive():
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._close_session(), loop
+                ).result(timeout=_CLOSE_TIMEOUT)
+            except (concurrent.futures.TimeoutError, RuntimeError) as e:
+                _LOG.debug(f'Could not close session gracefully: {e}')
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=_CLOSE_TIMEOUT)
+        if not thread.is_alive() and not loop.is_closed():
+            loop.close()
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            if self._closed:
+                raise RuntimeError('I/O reactor has been closed')
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('I/O reactor has been closed')
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=self._run_loop,
+                                      args=(loop,),
+                                      name=self._name,
+                                      daemon=True)
+            thread.start()
+            self._thread = thread
+            self._loop = loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+        # tasks still pending, such as the one which closed the reactor,
+        # are cancelled rather than destroyed
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True)
+            )
+        loop.close()
+
+    async def _call(self, async_function: Callable, *params):
+        return await async_function(self._get_session(), *params)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # only ever called from within the reactor thread, so no locking
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._connection_limit)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  headers=self._headers)
+        return self._session
+
+    async def _shutdown(self, loop: asyncio.AbstractEventLoop):
+        try:
+            await self._close_session()
+        finally:
+            loop.stop()
+
+    async def _close_session(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            # See https://github.com/aio-libs/aiohttp/blob/master/docs/
+            # client_advanced.rst#graceful-shutdown
+            await asyncio.sleep(.1)
+        self._session = None
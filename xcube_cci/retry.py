@@ -0,0 +1,230 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
+
+from xcube_cci.constants import DEFAULT_REQUESTS_PER_SECOND
+
+_MIN_REQUESTS_PER_SECOND = 0.5
+
+
+def get_backoff_delay(attempt: int,
+                      base_delay: float = 1.0,
+                      max_delay: float = 30.0) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    :param attempt: The number of the failed attempt, starting at 1
+    :param base_delay: The upper bound of the delay after the first attempt,
+        in seconds
+    :param max_delay: The maximum delay, in seconds
+    :return: The delay in seconds
+    """
+    upper = min(max_delay, base_delay * 2 ** max(0, attempt - 1))
+    return random.uniform(0, upper)
+
+
+async def backoff(attempt: int,
+                  base_delay: float = 1.0,
+                  max_delay: float = 30.0):
+    """
+    Awaitable version of :func:`get_backoff_delay`. Only suspends the calling
+    coroutine, other requests on the same loop proceed.
+    """
+    await asyncio.sleep(get_backoff_delay(attempt, base_delay, max_delay))
+
+
+def parse_retry_after(headers: Mapping[str, str],
+                      default: Optional[float] = None) -> Optional[float]:
+    """
+    Parse the value of a 'Retry-After' header, which may be given either
+    in seconds or as HTTP date.
+
+    :return: The delay in seconds, or *default*, if the header is missing
+        or cannot be parsed
+    """
+    value = headers.get('Retry-After')
+    if value is None:
+        return default
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_date.tzinfo is None:
+        retry_date = retry_date.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_date - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    A token bucket in the form of the generic cell rate algorithm.
+    Callers reserve their slot without holding any asyncio primitive, so a
+    bucket can be shared by coroutines running on different event loops.
+
+    The rate is adapted multiplicatively down whenever the server throttles
+    and additively up on every success, but never beyond *max_rate*.
+
+    :param max_rate: Maximum number of requests per second
+    :param capacity: Number of requests that may be issued in a burst
+    """
+
+    def __init__(self, max_rate: float, capacity: Optional[int] = None):
+        self._max_rate = float(max_rate)
+        self._rate = float(max_rate)
+        self._capacity = max(1, int(capacity if capacity else max_rate))
+        self._tat = time.monotonic()
+        # no tokens are handed out before this time, whatever the burst
+        self._blocked_until = self._tat
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def reserve(self) -> float:
+        """
+        Take one token.
+
+        :return: The number of seconds the caller has to wait before
+            it may issue its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self._rate
+            tolerance = (self._capacity - 1) * interval
+            slot = max(now, self._tat - tolerance, self._blocked_until)
+            self._tat = max(self._tat, now) + interval
+            return slot - now
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def defer(self, delay: float):
+        """
+        Do not hand out any tokens within the next *delay* seconds
+        and halve the rate. The bucket is empty afterwards, so requests
+        are not resumed in a burst.
+        """
+        with self._lock:
+            self._rate = max(_MIN_REQUESTS_PER_SECOND, self._rate / 2)
+            self._blocked_until = max(self._blocked_until,
+                                      time.monotonic() + delay)
+            tolerance = (self._capacity - 1) / self._rate
+            self._tat = max(self._tat, self._blocked_until + tolerance)
+
+    def on_success(self):
+        with self._lock:
+            if self._rate < self._max_rate:
+                self._rate = min(self._max_rate, self._rate + 1.0 / self._rate)
+
+
+class HostRateLimiter:
+    """
+    Maintains one :class:`TokenBucket` per host.
+
+    :param max_rate: Maximum number of requests per second and host
+    """
+
+    def __init__(self, max_rate: float = DEFAULT_REQUESTS_PER_SECOND):
+        self._max_rate = max_rate
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self._max_rate)
+            return self._buckets[host]
+
+    async def acquire(self, url: str):
+        await self.get_bucket(url).acquire()
+
+    def defer(self, url: str, delay: float):
+        self.get_bucket(url).defer(delay)
+
+    def on_success(self, url: str):
+        self.get_bucket(url).on_success()
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of the requests made, so that a failing
+    server is not flooded with retries. Each request deposits *ratio*
+    tokens, each retry withdraws one. A small number of retries per second
+    is always granted, so that retries remain possible at low traffic.
+
+    :param ratio: Number of retries allowed per request
+    :param min_retries_per_second: Number of retries granted per second
+        regardless of the traffic
+    :param max_balance: Maximum number of tokens that can be saved up
+    """
+
+    def __init__(self,
+                 ratio: float = 0.2,
+                 min_retries_per_second: float = 1.0,
+                 max_balance: float = 100.0):
+        self._ratio = ratio
+        self._min_retries_per_second = min_retries_per_second
+        self._max_balance = max_balance
+        self._balance = max_balance
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._balance
+
+    def deposit(self):
+        with self._lock:
+            self._balance = min(self._max_balance, self._balance + self._ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+    def _refill(self):
+        now = time.monotonic()
+        self._balance = min(self._max_balance,
+                            self._balance
+                            + (now - self._last_refill)
+                            * self._min_retries_per_second)
+        self._last_refill = now
@@ -0,0 +1,288 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import math
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, \
+    Set, Tuple
+
+import numpy as np
+
+from xcube_cci.granuleindex import to_datetime64
+
+BBox = Tuple[float, float, float, float]
+
+_TIME_DTYPE = 'datetime64[s]'
+
+DEFAULT_GRID_SIZE = 30.0
+
+
+class _FacetIndex:
+    """Posting sets of names by facet and value."""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Set[str]]] = {}
+        self._facets: Dict[str, Dict[str, str]] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._facets
+
+    def put(self, name: str, facets: Mapping[str, Any]):
+        self.remove(name)
+        facets = {facet: value for facet, value in facets.items()
+                  if value is not None}
+        self._facets[name] = facets
+        for facet, value in facets.items():
+            self._postings.setdefault(facet, {}) \
+                .setdefault(value, set()).add(name)
+
+    def remove(self, name: str):
+        facets = self._facets.pop(name, None)
+        if facets is None:
+            return
+        for facet, value in facets.items():
+            names = self._postings[facet][value]
+            names.discard(name)
+            if not names:
+                del self._postings[facet][value]
+
+    def find(self, facets: Mapping[str, Any]) -> Optional[Set[str]]:
+        # None stands for all names
+        result = None
+        # the smallest posting set is intersected first
+        posting_sets = sorted(
+            (self._postings.get(facet, {}).get(value, set())
+             for facet, value in facets.items()),
+            key=len
+        )
+        for names in posting_sets:
+            result = set(names) if result is None else result & names
+            if not result:
+                return set()
+        return result
+
+
+class SearchIndex:
+    """
+    An in-memory index of datasets for searching them by facets,
+    temporal coverage and bounding box.
+
+    Datasets are known by name first. Facets given with the names,
+    such as the ones encoded in DRS ids, are kept in inverted posting
+    sets. Once the description of a dataset is known, its details are
+    added: further facets, its temporal coverage, which is kept in an
+    interval index sorted by start time, and its bounding box, which is
+    registered in the cells of a regular grid.
+
+    All parts are updated incrementally. The interval index is re-sorted
+    on the first search after it has been changed.
+
+    :param grid_size: The size of the cells of the bounding box grid
+        in degrees
+    """
+
+    def __init__(self, grid_size: float = DEFAULT_GRID_SIZE):
+        self._grid_size = grid_size
+        self._num_cols = int(math.ceil(360.0 / grid_size))
+        self._num_rows = int(math.ceil(180.0 / grid_size))
+        self._names: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._name_facets = _FacetIndex()
+        self._detail_facets = _FacetIndex()
+        self._time_ranges: Dict[str, Tuple[np.datetime64,
+                                           np.datetime64]] = {}
+        self._interval_names: List[str] = []
+        self._interval_starts = np.empty(0, dtype=_TIME_DTYPE)
+        self._interval_ends = np.empty(0, dtype=_TIME_DTYPE)
+        self._intervals_changed = False
+        self._bboxes: Dict[str, BBox] = {}
+        self._grid: Dict[Tuple[int, int], Set[str]] = {}
+        self._bbox_cells: Dict[str, List[Tuple[int, int]]] = {}
+        # boxes which cannot be placed in the grid, such as ones
+        # with NaN coordinates or crossing the antimeridian, are checked
+        # on every search
+        self._unplaced_bboxes: Set[str] = set()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def set_names(self,
+                  names: Iterable[str],
+                  get_facets: Callable[[str], Mapping[str, Any]]):
+        """
+        Set the names of the datasets, in the order in which they are
+        found. Facets are determined for new names only. Details are kept
+        for names which are not given anymore, as they may come back.
+        """
+        names = list(names)
+        for name in set(self._names).difference(names):
+            self._name_facets.remove(name)
+        for name in names:
+            if name not in self._name_facets:
+                self._name_facets.put(name, get_facets(name))
+        self._names = names
+        self._positions = {name: position
+                           for position, name in enumerate(names)}
+
+    def has_details(self, name: str) -> bool:
+        return name in self._detail_facets
+
+    def set_details(self,
+                    name: str,
+                    facets: Mapping[str, Any],
+                    time_range: Optional[Tuple[Any, Any]] = None,
+                    bbox: Optional[BBox] = None):
+        """
+        Set the details of a dataset, replacing former ones.
+
+        :param name: The name of the dataset
+        :param facets: Further facets of the dataset
+        :param time_range: The start and end of the temporal coverage
+        :param bbox: The bounding box as minimum x, minimum y,
+            maximum x and maximum y
+        """
+        self.remove_details(name)
+        self._detail_facets.put(name, facets)
+        if time_range is not None:
+            self._time_ranges[name] = (to_datetime64(time_range[0]),
+                                       to_datetime64(time_range[1]))
+            self._intervals_changed = True
+        if bbox is not None:
+            bbox = tuple(float(value) for value in bbox)
+            self._bboxes[name] = bbox
+            cells = self._get_cells(bbox)
+            if cells is None:
+                self._unplaced_bboxes.add(name)
+            else:
+                self._bbox_cells[name] = cells
+                for cell in cells:
+                    self._grid.setdefault(cell, set()).add(name)
+
+    def remove_details(self, name: str):
+        self._detail_facets.remove(name)
+        if self._time_ranges.pop(name, None) is not None:
+            self._intervals_changed = True
+        self._bboxes.pop(name, None)
+        self._unplaced_bboxes.discard(name)
+        for cell in self._bbox_cells.pop(name, []):
+            names = self._grid[cell]
+            names.discard(name)
+            if not names:
+                del self._grid[cell]
+
+    def find(self, facets: Mapping[str, Any]) -> List[str]:
+        """
+        Find the names with the given facets, in the order of the names.
+        """
+        names = self._name_facets.find(facets)
+        if names is None:
+            return list(self._names)
+        return self._sort(names)
+
+    def filter(self,
+               names: List[str],
+               facets: Mapping[str, Any],
+               start: Any = None,
+               end: Any = None,
+               bbox: Optional[BBox] = None) -> List[str]:
+        """
+        Select the names whose details match: they have the given
+        facets, their temporal coverage ends not before *start* and
+        starts not after *end*, and their bounding box intersects
+        *bbox*. Names without details are not selected.
+        """
+        matches = self._detail_facets.find(facets)
+        if start is not None or end is not None:
+            matches = _intersect(matches, self._find_in_time(start, end))
+        if bbox is not None:
+            matches = _intersect(matches, self._find_in_bbox(bbox))
+        return [name for name in names if self.has_details(name)
+                and (matches is None or name in matches)]
+
+    def _find_in_time(self, start: Any, end: Any) -> Set[str]:
+        if self._intervals_changed:
+            self._sort_intervals()
+        num_candidates = len(self._interval_starts)
+        if end is not None:
+            num_candidates = int(np.searchsorted(self._interval_starts,
+                                                 to_datetime64(end),
+                                                 side='right'))
+        if start is None:
+            return set(self._interval_names[:num_candidates])
+        ends = self._interval_ends[:num_candidates]
+        return {self._interval_names[i]
+                for i in np.nonzero(ends >= to_datetime64(start))[0]}
+
+    def _sort_intervals(self):
+        names = list(self._time_ranges.keys())
+        starts = np.array([self._time_ranges[name][0] for name in names],
+                          dtype=_TIME_DTYPE)
+        ends = np.array([self._time_ranges[name][1] for name in names],
+                        dtype=_TIME_DTYPE)
+        order = np.argsort(starts, kind='stable')
+        self._interval_names = [names[i] for i in order]
+        self._interval_starts = starts[order]
+        self._interval_ends = ends[order]
+        self._intervals_changed = False
+
+    def _find_in_bbox(self, bbox: BBox) -> Set[str]:
+        cells = self._get_cells(tuple(float(value) for value in bbox))
+        if cells is None:
+            candidates = self._bboxes.keys()
+        else:
+            candidates = set(self._unplaced_bboxes)
+            for cell in cells:
+                candidates.update(self._grid.get(cell, ()))
+        min_x, min_y, max_x, max_y = bbox
+        result = set()
+        for name in candidates:
+            ds_min_x, ds_min_y, ds_max_x, ds_max_y = self._bboxes[name]
+            # comparisons with NaN coordinates never exclude a dataset
+            if ds_min_x > max_x or ds_max_x < min_x \
+                    or ds_min_y > max_y or ds_max_y < min_y:
+                continue
+            result.add(name)
+        return result
+
+    def _get_cells(self, bbox: BBox) -> Optional[List[Tuple[int, int]]]:
+        if not all(math.isfinite(value) for value in bbox):
+            return None
+        min_x, min_y, max_x, max_y = bbox
+        if min_x > max_x or min_y > max_y:
+            return None
+        first_col = self._get_cell_index(min_x + 180.0, self._num_cols)
+        last_col = self._get_cell_index(max_x + 180.0, self._num_cols)
+        first_row = self._get_cell_index(min_y + 90.0, self._num_rows)
+        last_row = self._get_cell_index(max_y + 90.0, self._num_rows)
+        return [(col, row)
+                for col in range(first_col, last_col + 1)
+                for row in range(first_row, last_row + 1)]
+
+    def _get_cell_index(self, offset: float, num_cells: int) -> int:
+        return min(max(int(offset // self._grid_size), 0), num_cells - 1)
+
+    def _sort(self, names: Set[str]) -> List[str]:
+        return sorted(names, key=self._positions.__getitem__)
+
+
+def _intersect(names: Optional[Set[str]], other_names: Set[str]) \
+        -> Set[str]:
+    return other_names if names is None else names & other_names
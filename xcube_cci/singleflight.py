@@ -0,0 +1,83 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in flight,
+    further calls with the same key do not start their own work but wait for
+    the result of the first one. Once that call has finished, the next call
+    with the key starts anew.
+
+    The work of a call is run as a task of its own, so it is not
+    affected if any of its waiters is cancelled.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._num_calls = 0
+        self._num_saved = 0
+
+    @property
+    def num_calls(self) -> int:
+        """The number of calls made."""
+        return self._num_calls
+
+    @property
+    def num_saved(self) -> int:
+        """The number of calls that were served by a call in flight."""
+        return self._num_saved
+
+    @property
+    def num_in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, async_function: Callable, *params) \
+            -> Tuple[Any, bool]:
+        """
+        Await ``async_function(*params)``, unless a call with the same *key*
+        is in flight already, in which case its result is awaited instead.
+        Exceptions are passed on to all waiters.
+
+        :return: A tuple of the result and whether the result has been
+            shared with a call that was in flight already
+        """
+        self._num_calls += 1
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self._num_saved += 1
+        else:
+            task = asyncio.ensure_future(async_function(*params))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(calls=self._num_calls, saved=self._num_saved)
@@ -0,0 +1,116 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import gzip
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from xcube_cci.metadatacache import to_json_value
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'data', 'catalogue_snapshot.json.gz')
+
+_FORMAT_VERSION = 1
+
+
+class CatalogueSnapshot:
+    """
+    A snapshot of the catalogue of the ODP: the DRS ids of all datasets
+    and the descriptions of the datasets, as kept by ``CciOdp``.
+    These include the dataset UUIDs, dimensions, variable infos,
+    bounding box and temporal coverage.
+
+    Snapshots are written as gzipped JSON at build time, so that the
+    catalogue is known without any request.
+
+    :param endpoint_url: The URL of the OpenSearch service the snapshot
+        has been taken from
+    :param drs_ids: The DRS ids of all datasets
+    :param data_sources: The descriptions of the datasets by DRS id
+    :param created: The time the snapshot has been taken, in seconds
+        since the epoch. Defaults to now.
+    """
+
+    def __init__(self,
+                 endpoint_url: str,
+                 drs_ids: List[str],
+                 data_sources: Dict[str, dict],
+                 created: Optional[float] = None):
+        self.endpoint_url = endpoint_url
+        self.drs_ids = list(drs_ids)
+        self.data_sources = dict(data_sources)
+        self.created = time.time() if created is None else created
+
+    def get_age(self) -> float:
+        """Get the number of seconds since the snapshot has been taken."""
+        return time.time() - self.created
+
+    def save(self, path: str):
+        """
+        Write the snapshot to a gzipped JSON file.
+        The file is replaced atomically.
+        """
+        document = dict(version=_FORMAT_VERSION,
+                        created=self.created,
+                        endpoint_url=self.endpoint_url,
+                        drs_ids=self.drs_ids,
+                        data_sources=self.data_sources)
+        dir_path = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dir_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.json.gz', dir=dir_path)
+        try:
+            with os.fdopen(fd, 'wb') as raw_fp, \
+                    gzip.open(raw_fp, 'wt', encoding='utf-8') as fp:
+                json.dump(document, fp, default=to_json_value,
+                          separators=(',', ':'))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'CatalogueSnapshot':
+        """
+        Read a snapshot written by :meth:`save`.
+
+        :raise ValueError: If the file is not a catalogue snapshot
+        """
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as fp:
+                document = json.load(fp)
+        except (OSError, EOFError) as e:
+            raise ValueError(f'cannot read catalogue snapshot: {e}') from e
+        if not isinstance(document, dict):
+            raise ValueError('not a catalogue snapshot')
+        version = document.get('version')
+        if version != _FORMAT_VERSION:
+            raise ValueError(f'unsupported catalogue snapshot'
+                             f' version {version!r}')
+        try:
+            return cls(document['endpoint_url'],
+                       document['drs_ids'],
+                       document['data_sources'],
+                       created=float(document['created']))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'invalid catalogue snapshot: {e}') from e
@@ -0,0 +1,206 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from xcube_cci.dods import DatasetTemplate
+from xcube_cci.dods import VariableTemplate
+from xcube_cci.granuleindex import GranuleIndex
+from xcube_cci.metadatacache import to_json_value
+
+_FORMAT_VERSION = 1
+
+_GRANULE_COLUMNS = ('starts', 'ends', 'url_ids')
+_WINDOW_COLUMNS = ('queried_starts', 'queried_ends')
+
+
+class OdpState:
+    """
+    The state ``CciOdp`` builds up while it is used: the descriptions of
+    datasets, the granule indexes, the DDS and DAS of granules and the
+    dataset templates parsed from them.
+
+    States are written to uncompressed ``.npz`` files. The granules of all
+    indexes are kept in shared columns, everything else is kept as one
+    JSON document, so that a state is read in a few milliseconds.
+
+    :param endpoint_url: The URL of the OpenSearch service the state
+        has been built from
+    :param drs_ids: The DRS ids of all datasets, if known
+    :param data_sources: The descriptions of the datasets by DRS id
+    :param granule_indexes: The granule indexes by dataset id
+    :param dataset_templates: The dataset templates by DRS id
+    :param result_dicts: The DDS and DAS by granule URL
+    :param created: The time the state has been saved, in seconds
+        since the epoch. Defaults to now.
+    """
+
+    def __init__(self,
+                 endpoint_url: str,
+                 drs_ids: Optional[List[str]],
+                 data_sources: Dict[str, dict],
+                 granule_indexes: Dict[str, GranuleIndex],
+                 dataset_templates: Dict[str, DatasetTemplate],
+                 result_dicts: Dict[str, Dict[str, str]],
+                 created: Optional[float] = None):
+        self.endpoint_url = endpoint_url
+        self.drs_ids = list(drs_ids) if drs_ids is not None else None
+        self.data_sources = dict(data_sources)
+        self.granule_indexes = dict(granule_indexes)
+        self.dataset_templates = dict(dataset_templates)
+        self.result_dicts = dict(result_dicts)
+        self.created = time.time() if created is None else created
+
+    def save(self, path: str):
+        """
+        Write the state to an ``.npz`` file.
+        The file is replaced atomically.
+        """
+        ds_ids = list(self.granule_indexes.keys())
+        index_arrays = [self.granule_indexes[ds_id].get_arrays()
+                        for ds_id in ds_ids]
+        document = dict(created=self.created,
+                        endpoint_url=self.endpoint_url,
+                        drs_ids=self.drs_ids,
+                        data_sources=self.data_sources,
+                        granule_indexes=ds_ids,
+                        dataset_templates={
+                            drs_id: _template_to_dict(template)
+                            for drs_id, template
+                            in self.dataset_templates.items()
+                        },
+                        result_dicts=self.result_dicts)
+        document = json.dumps(document, default=to_json_value,
+                              separators=(',', ':'))
+        arrays = dict(version=np.array(_FORMAT_VERSION),
+                      document=np.frombuffer(document.encode('utf-8'),
+                                             dtype=np.uint8))
+        for column in _GRANULE_COLUMNS + _WINDOW_COLUMNS + ('urls',):
+            arrays[column] = _concat([a[column] for a in index_arrays])
+        arrays['granule_offsets'] = _get_offsets(
+            [len(a['starts']) for a in index_arrays]
+        )
+        arrays['url_offsets'] = _get_offsets(
+            [len(a['urls']) for a in index_arrays]
+        )
+        arrays['window_offsets'] = _get_offsets(
+            [len(a['queried_starts']) for a in index_arrays]
+        )
+        dir_path = os.path.dirname(os.path.abspath(path))
+        os.makedirs(dir_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.npz', dir=dir_path)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                np.savez(fp, **arrays)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'OdpState':
+        """
+        Read a state written by :meth:`save`.
+
+        :raise ValueError: If the file is not a state file
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                version = int(data['version'])
+                if version != _FORMAT_VERSION:
+                    raise ValueError(f'unsupported state file'
+                                     f' version {version}')
+                arrays = {name: data[name] for name in data.files}
+        except (OSError, KeyError) as e:
+            raise ValueError(f'cannot read state file: {e}') from e
+        try:
+            document = json.loads(arrays['document'].tobytes()
+                                  .decode('utf-8'))
+            granule_indexes = {}
+            for i, ds_id in enumerate(document['granule_indexes']):
+                columns = {}
+                for column in _GRANULE_COLUMNS:
+                    columns[column] = _get_part(arrays, column,
+                                                'granule_offsets', i)
+                for column in _WINDOW_COLUMNS:
+                    columns[column] = _get_part(arrays, column,
+                                                'window_offsets', i)
+                columns['urls'] = _get_part(arrays, 'urls', 'url_offsets', i)
+                granule_indexes[ds_id] = GranuleIndex.from_arrays(**columns)
+            dataset_templates = {
+                drs_id: _template_from_dict(template)
+                for drs_id, template in document['dataset_templates'].items()
+            }
+            return cls(document['endpoint_url'],
+                       document['drs_ids'],
+                       document['data_sources'],
+                       granule_indexes,
+                       dataset_templates,
+                       document['result_dicts'],
+                       created=float(document['created']))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise ValueError(f'invalid state file: {e}') from e
+
+
+def _concat(arrays: List[np.ndarray]) -> np.ndarray:
+    if not arrays:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(arrays)
+
+
+def _get_offsets(sizes: List[int]) -> np.ndarray:
+    return np.concatenate([[0], np.cumsum(sizes, dtype=np.int64)]) \
+        .astype(np.int64)
+
+
+def _get_part(arrays: Dict[str, np.ndarray], column: str,
+              offsets: str, i: int) -> np.ndarray:
+    start, stop = arrays[offsets][i], arrays[offsets][i + 1]
+    return arrays[column][start:stop]
+
+
+def _template_to_dict(template: DatasetTemplate) -> dict:
+    variables = {}
+    for var_name in template.variable_names:
+        variable = template.get_variable(var_name)
+        variables[var_name] = dict(
+            id=variable.id,
+            shape=list(variable.shape),
+            slice=[[s.start, s.stop, s.step] for s in variable.slice]
+        )
+    return dict(fingerprint=template.fingerprint, variables=variables)
+
+
+def _template_from_dict(template: dict) -> DatasetTemplate:
+    variables = {}
+    for var_name, variable in template['variables'].items():
+        variables[var_name] = VariableTemplate(
+            variable['id'],
+            tuple(variable['shape']),
+            tuple(slice(*s) for s in variable['slice'])
+        )
+    return DatasetTemplate(template['fingerprint'], variables)
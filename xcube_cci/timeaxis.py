@@ -0,0 +1,162 @@
+# The MIT License (MIT)
+# Copyright (c) 2023 by the xcube development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import Any, Iterable, Iterator, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from xcube_cci.granuleindex import to_datetime64_array
+
+_TIME_DTYPE = 'datetime64[s]'
+
+# the units of numpy date ranges for regular time periods
+_PERIOD_UNITS = {
+    'day': 'D',
+    'month': 'M',
+    'mon': 'M',
+    'year': 'Y',
+    'yr': 'Y'
+}
+
+# climatologies have one time step per month of no particular year
+_CLIMATOLOGY_YEAR = 1970
+
+
+def get_month_timestamp(month: int) -> pd.Timestamp:
+    """
+    Get the time stamp standing for a month of a climatology.
+
+    :param month: The month, from 1 to 12
+    """
+    return pd.Timestamp(year=_CLIMATOLOGY_YEAR, month=month, day=1)
+
+
+class TimeAxis:
+    """
+    A time axis given as arrays of the start and end times of its steps.
+
+    Steps are accessed like a list of pairs of start and end time,
+    slicing gives a new time axis.
+
+    :param starts: The start times of the steps, in ascending order
+    :param ends: The end times of the steps
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        if len(starts) != len(ends):
+            raise ValueError('starts and ends must have the same length')
+        self._starts = np.asarray(starts, dtype=_TIME_DTYPE)
+        self._ends = np.asarray(ends, dtype=_TIME_DTYPE)
+
+    @classmethod
+    def from_ranges(cls, time_ranges: Iterable[Tuple[Any, Any]]) \
+            -> 'TimeAxis':
+        """Create a time axis from pairs of start and end time."""
+        time_ranges = list(time_ranges)
+        return cls(to_datetime64_array([start for start, _ in time_ranges]),
+                   to_datetime64_array([end for _, end in time_ranges]))
+
+    @classmethod
+    def regular(cls, start: Any, end: Any, period: str) -> 'TimeAxis':
+        """
+        Create a time axis of consecutive days, months or years.
+        Each step ends where the next one starts.
+
+        :param start: A time within the first step
+        :param end: A time within the last step
+        :param period: One of 'day', 'month' or 'year'
+        """
+        unit = _PERIOD_UNITS.get(period)
+        if unit is None:
+            raise ValueError(f'unsupported time period {period!r}')
+        first, last = to_datetime64_array((start, end)) \
+            .astype(f'datetime64[{unit}]')
+        steps = np.arange(first, last + 1)
+        return cls(steps.astype(_TIME_DTYPE),
+                   (steps + 1).astype(_TIME_DTYPE))
+
+    @classmethod
+    def climatology(cls) -> 'TimeAxis':
+        """Create a time axis of the twelve months of a climatology."""
+        months = np.arange(np.datetime64(f'{_CLIMATOLOGY_YEAR}-01', 'M'),
+                           np.datetime64(f'{_CLIMATOLOGY_YEAR + 1}-01', 'M'))
+        months = months.astype(_TIME_DTYPE)
+        return cls(months, months)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends
+
+    @property
+    def centers(self) -> np.ndarray:
+        """The times halfway between start and end of each step."""
+        return self._starts + (self._ends - self._starts) // 2
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """The start and end times as array of shape (n, 2)."""
+        return np.stack([self._starts, self._ends], axis=1)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __iter__(self) -> Iterator[Tuple[pd.Timestamp, pd.Timestamp]]:
+        return zip(pd.to_datetime(self._starts), pd.to_datetime(self._ends))
+
+    def __getitem__(self, item: Union[int, slice, np.ndarray]) \
+            -> Union[Tuple[pd.Timestamp, pd.Timestamp], 'TimeAxis']:
+        if isinstance(item, (slice, np.ndarray)):
+            return TimeAxis(self._starts[item], self._ends[item])
+        return pd.Timestamp(self._starts[item]), pd.Timestamp(self._ends[item])
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, TimeAxis) \
+            and np.array_equal(self._starts, other._starts) \
+            and np.array_equal(self._ends, other._ends)
+
+    def get_chunk_axis(self, chunk_size: int) -> 'TimeAxis':
+        """
+        Get the time axis of the time chunks, each spanning *chunk_size*
+        consecutive steps. A last incomplete chunk is left out.
+        """
+        num_chunks = len(self) // chunk_size
+        return TimeAxis(self._starts[:num_chunks * chunk_size:chunk_size],
+                        self._ends[chunk_size - 1:num_chunks * chunk_size:
+                                   chunk_size])
+
+    def index(self, time_range: Tuple[Any, Any]) -> int:
+        """
+        Get the index of the step with the given start and end time.
+
+        :raise ValueError: If there is no such step
+        """
+        start, end = to_datetime64_array(time_range)
+        first = int(np.searchsorted(self._starts, start, side='left'))
+        last = int(np.searchsorted(self._starts, start, side='right'))
+        for index in range(first, last):
+            if self._ends[index] == end:
+                return index
+        raise ValueError(f'{time_range!r} is not in time axis')